@@ -1,17 +1,45 @@
-import time
 import json
 import os
-from utils_facture import read_file, extract_text_from_pdf, extract_text_with_pixtral
-from groq import Groq
+from utils_facture import read_file, extract_text_from_pdf, extract_text_from_images
+from llm_gateway import groq_chat
 from recup_mail import recup_mail
-from config_facture import CONTEXT_FILE, PROMPT_FILE, GROQ_API_KEY, MODEL_NAME_analyse, MISTRAL_API_KEY, MODEL_NAME_extract
+from config_facture import CONTEXT_FILE, PROMPT_FILE, GROQ_API_KEY, MODEL_NAME_analyse, MISTRAL_API_KEY, MODEL_NAME_extract, MAIL_AFTER, MAIL_BEFORE
 from send_to_backend import send_invoice_to_backend
+from extraction_cache import cached_extraction, content_hash, get_cached_text
+from image_preprocess import PREPROCESS_VERSION, preprocess_image, preprocess_async
+
+# Versions des extracteurs (à incrémenter si l'extraction change, invalide le cache)
+PDF_EXTRACTOR_VERSION = "pdfplumber-1"
+OCR_EXTRACTOR_VERSION = f"pixtral-{MODEL_NAME_extract}-{PREPROCESS_VERSION}"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".heic", ".heif", ".webp", ".bmp")
+
+
+# Contenu des fichiers de prompt gardé en mémoire : chemin -> (mtime, contenu)
+_prompt_files = {}
+
+
+def read_prompt_file(path: str) -> str | None:
+    """Lit un fichier de prompt une seule fois ; relu seulement s'il a été modifié."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return read_file(path)
+
+    cached = _prompt_files.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    content = read_file(path)
+    if content:
+        _prompt_files[path] = (mtime, content)
+    return content
 
 
 def load_prompt_and_context(invoice: str) -> tuple[str, str]:
     """Charge le contexte et remplace le placeholder dans le prompt."""
-    context = read_file(CONTEXT_FILE)
-    prompt_template = read_file(PROMPT_FILE)
+    context = read_prompt_file(CONTEXT_FILE)
+    prompt_template = read_prompt_file(PROMPT_FILE)
 
     if not context or not prompt_template:
         raise ValueError("Impossible de charger context.txt ou prompt.txt")
@@ -21,30 +49,41 @@ def load_prompt_and_context(invoice: str) -> tuple[str, str]:
 
 
 def prepare_invoice_text(attachement) -> str:
-    """Prépare le texte de la facture pour l'analyse."""
-    
-    # Création du dossier temp si inexistant
-    os.makedirs("temp", exist_ok=True)
+    """Prépare le texte de la facture pour l'analyse (en mémoire, sans fichier temporaire)."""
 
     filename = attachement["filename"].lower()
-    path = f"temp/{attachement['filename']}"
 
     if filename.endswith(".pdf"):
         # Extraction du texte depuis le PDF
-        with open(path, "wb") as f:
-            f.write(attachement["data"])
-        text = extract_text_from_pdf(path)
+        text = cached_extraction(
+            attachement["data"], PDF_EXTRACTOR_VERSION,
+            lambda: extract_text_from_pdf(attachement["data"])
+        )
 
     else:
-        # Extraction du texte depuis l'image via Pixtral
-        with open(path, "wb") as f:
-            f.write(attachement["data"])
-        text = extract_text_with_pixtral(path, MISTRAL_API_KEY, MODEL_NAME_extract)
+        # Extraction du texte depuis l'image via Pixtral, après prétraitement
+        # (lancé à l'avance dans le pool si possible, voir prefetch_images)
+        def ocr():
+            pending = attachement.get("preprocessed")
+            pages = pending.result() if pending else preprocess_image(attachement["data"])
+            return extract_text_from_images(pages, MISTRAL_API_KEY, MODEL_NAME_extract)
+
+        text = cached_extraction(attachement["data"], OCR_EXTRACTOR_VERSION, ocr)
 
     return text.strip()
 
         
 
+def prefetch_images(attachments) -> None:
+    """Lance le prétraitement des images dans le pool pendant le traitement des précédentes."""
+    for att in attachments:
+        if not att["filename"].lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        # Texte déjà en cache : pas d'OCR, donc pas de prétraitement
+        if get_cached_text(content_hash(att["data"]), OCR_EXTRACTOR_VERSION) is None:
+            att["preprocessed"] = preprocess_async(att["data"])
+
+
 def analyze_text(invoice: str) -> dict | None:
     """Appelle l'API GROQ pour analyser le code Python."""
     if not GROQ_API_KEY:
@@ -53,10 +92,9 @@ def analyze_text(invoice: str) -> dict | None:
 
     context, prompt = load_prompt_and_context(invoice)
 
-    client = Groq(api_key=GROQ_API_KEY)
-
     try:
-        response = client.chat.completions.create(
+        response = groq_chat(
+            GROQ_API_KEY,
             model=MODEL_NAME_analyse,
             messages=[
                 {"role": "system", "content": context},
@@ -141,12 +179,25 @@ if __name__ == "__main__":
         print("    L'agent va analyser les factures mais ne les enverra pas au backend.")
         print("    Pour activer l'envoi, ajoutez USER_TOKEN=votre_token dans .env\n")
     
-    mails = recup_mail("inbox")
+    # Les mails arrivent un par un (générateur) : seul le mail courant est en mémoire.
+    # Seuls les mails avec pièces jointes PDF/images sont listés (filtre Gmail).
+    mails = recup_mail("inbox", after=MAIL_AFTER, before=MAIL_BEFORE)
+    seen_hashes = set()  # Empreintes SHA-256 des pièces jointes déjà traitées
     for mail in mails:
         print(f"\nMail de {mail['from']} reçu le {mail['date']}")
+        prefetch_images(mail["attachments"])
         for att in mail["attachments"]:
             print(f"  - Pièce jointe : {att['filename']}")
             
+            # Même fichier reçu plusieurs fois (transfert, copie) : on ne le traite qu'une fois
+            digest = content_hash(att["data"])
+            if digest in seen_hashes:
+                print("    [SKIP] Doublon deja traite")
+                att["data"] = None
+                att.pop("preprocessed", None)
+                continue
+            seen_hashes.add(digest)
+            
             # Préparer le texte de la facture
             invoice_text = prepare_invoice_text(att)
             print("    Analyse en cours...")
@@ -161,9 +212,9 @@ if __name__ == "__main__":
                 
                 # Envoyer au backend si token disponible
                 if USER_TOKEN:
-                    pdf_path = f"temp/{att['filename']}"
                     result = send_invoice_to_backend(
-                        pdf_path=pdf_path,
+                        pdf_data=att["data"],
+                        filename=att["filename"],
                         analysis_data=analysis,
                         email_id=mail['id'],
                         email_subject=mail['subject'],
@@ -172,17 +223,13 @@ if __name__ == "__main__":
                     
                     if result:
                         print(f"       [UPLOAD] Envoyee au backend (ID: {result.get('id')})")
-                    
-                    # Nettoyer le fichier temp après envoi
-                    try:
-                        os.remove(pdf_path)
-                        print(f"       [CLEAN] Fichier temp supprime")
-                    except:
-                        pass
                 else:
                     print("       [WARNING] Non envoyee (pas de token)")
             else:
                 print("    [ERROR] Analyse echouee")
-            
-            time.sleep(2)  # Pour éviter de surcharger l'API
+
+            # Libère le contenu de la pièce jointe (et son prétraitement) dès qu'il n'est plus utile
+            att["data"] = None
+            att.pop("preprocessed", None)
+
         
\ No newline at end of file
@@ -17,3 +17,12 @@ MODEL_NAME_analyse = os.getenv("MODEL_NAME_analyse")
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 MODEL_NAME_extract = os.getenv("MODEL_NAME_extract")
 
+# Prétraitement des images avant OCR
+OCR_MAX_SIDE_PX = int(os.getenv("OCR_MAX_SIDE_PX", "2000"))  # ~170 DPI sur une page A4
+OCR_MAX_IMAGE_BYTES = int(os.getenv("OCR_MAX_IMAGE_KB", "1024")) * 1024
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "5"))  # TIFF multi-pages
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "2"))
+
+# Fenêtre de recherche Gmail (YYYY-MM-DD, vide = pas de borne)
+MAIL_AFTER = os.getenv("MAIL_AFTER") or None
+MAIL_BEFORE = os.getenv("MAIL_BEFORE") or None
@@ -0,0 +1,101 @@
+"""
+Cache disque du texte extrait des pièces jointes (pdfplumber / Pixtral)
+
+Clé : empreinte SHA-256 du fichier + version de l'extracteur.
+Valeur : texte compressé (gzip). Taille totale bornée, éviction des
+entrées les moins récemment utilisées. La taille est tenue à jour à chaque
+écriture : le dossier n'est parcouru qu'une fois, puis lors des évictions.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("EXTRACTION_CACHE_DIR", "cache/extraction"))
+CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+_size_lock = threading.Lock()
+_cache_size: int | None = None  # Taille totale des entrées, calculée au premier besoin
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_path(digest: str, extractor: str) -> Path:
+    return CACHE_DIR / digest[:2] / f"{digest}.{extractor}.txt.gz"
+
+
+def get_cached_text(digest: str, extractor: str) -> str | None:
+    path = _entry_path(digest, extractor)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARNING] Cache illisible {path.name} : {e}")
+        return None
+
+    os.utime(path)  # Entrée récemment utilisée
+    return text
+
+
+def set_cached_text(digest: str, extractor: str, text: str) -> None:
+    path = _entry_path(digest, extractor)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        f.write(text)
+
+    global _cache_size
+    with _size_lock:
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        if _cache_size is None:
+            _cache_size = sum(p.stat().st_size for p in CACHE_DIR.glob("*/*.txt.gz"))
+        else:
+            _cache_size += path.stat().st_size - replaced
+
+        if _cache_size > CACHE_MAX_BYTES:
+            _cache_size = _evict(CACHE_MAX_BYTES)
+
+
+def _evict(max_bytes: int) -> int:
+    """Supprime les entrées les plus anciennes jusqu'à 90% de la limite ; retourne la taille restante."""
+    entries = []
+    for path in CACHE_DIR.glob("*/*.txt.gz"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    target = int(max_bytes * 0.9)
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    return total
+
+
+def cached_extraction(data: bytes, extractor: str, extract) -> str:
+    """Retourne le texte en cache pour ce contenu, sinon appelle extract() et le met en cache."""
+    digest = content_hash(data)
+
+    text = get_cached_text(digest, extractor)
+    if text is not None:
+        return text
+
+    text = extract()
+    if text and text.strip():
+        set_cached_text(digest, extractor, text)
+    return text
@@ -0,0 +1,125 @@
+"""
+Préparation des images de factures avant l'OCR Pixtral.
+
+Les photos de téléphone font souvent 4000 px et plusieurs Mo : envoyées
+telles quelles en base64, elles alourdissent la requête et finissent en
+timeout. Chaque image est ici redressée (EXIF), passée en niveaux de gris,
+recadrée sur le contenu, réduite à une résolution suffisante pour l'OCR
+puis recompressée en JPEG sous une taille maximale. Les TIFF multi-pages
+donnent une image par page ; le HEIC est lu si pillow-heif est installé.
+
+Le travail est fait dans un pool de threads (Pillow libère le GIL pendant
+le décodage, le redimensionnement et l'encodage) : les images suivantes
+sont préparées pendant que l'OCR de la précédente est en cours.
+"""
+import io
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config_facture import OCR_MAX_SIDE_PX, OCR_MAX_IMAGE_BYTES, OCR_MAX_PAGES, PREPROCESS_WORKERS
+
+try:
+    from PIL import Image, ImageChops, ImageOps, ImageSequence
+except ImportError:  # Pillow absent : les images sont envoyées sans traitement
+    Image = None
+
+if Image is not None:
+    try:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+    except ImportError:
+        pass
+    # Refuse les images démesurées (bombes de décompression) plutôt que de saturer la mémoire
+    Image.MAX_IMAGE_PIXELS = 100_000_000
+
+
+# Version du prétraitement (intégrée à la clé du cache d'extraction)
+PREPROCESS_VERSION = "gray-jpeg-1" if Image is not None else "raw"
+
+# Qualités JPEG essayées successivement pour rester sous OCR_MAX_IMAGE_BYTES
+JPEG_QUALITIES = (85, 75, 65, 50)
+
+_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="preprocess")
+
+
+def sniff_mime(data: bytes) -> str:
+    """Type MIME d'après la signature du fichier."""
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return "image/jpeg"
+
+
+def _crop_margins(image):
+    """Retire les marges quasi blanches autour du contenu."""
+    background = Image.new("L", image.size, 255)
+    diff = ImageChops.difference(image, background).point(lambda p: 255 if p > 40 else 0)
+    bbox = diff.getbbox()
+    if not bbox:
+        return image
+
+    pad = int(max(image.size) * 0.02)
+    left, top, right, bottom = bbox
+    bbox = (max(0, left - pad), max(0, top - pad), min(image.width, right + pad), min(image.height, bottom + pad))
+    return image.crop(bbox)
+
+
+def _encode(image) -> bytes:
+    """JPEG sous OCR_MAX_IMAGE_BYTES (qualité puis résolution réduites si besoin)."""
+    while True:
+        for quality in JPEG_QUALITIES:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= OCR_MAX_IMAGE_BYTES:
+                return buffer.getvalue()
+        if max(image.size) < 800:
+            return buffer.getvalue()
+        image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.LANCZOS)
+
+
+def _prepare_page(page) -> bytes:
+    page = ImageOps.exif_transpose(page)
+    page = page.convert("L")
+    page = _crop_margins(page)
+    # Réduction à la résolution utile à l'OCR (les petites images ne sont pas agrandies)
+    page.thumbnail((OCR_MAX_SIDE_PX, OCR_MAX_SIDE_PX), Image.LANCZOS)
+    return _encode(page)
+
+
+def preprocess_image(data: bytes) -> list[tuple[bytes, str]]:
+    """
+    Prépare une pièce jointe image pour l'OCR.
+
+    Returns:
+        list: (contenu, type MIME) par page, au plus OCR_MAX_PAGES pages
+    """
+    if Image is None:
+        return [(data, sniff_mime(data))]
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Les JPEG très grands sont décodés directement à une résolution réduite
+            if image.format == "JPEG":
+                image.draft("L", (OCR_MAX_SIDE_PX, OCR_MAX_SIDE_PX))
+            pages = []
+            for page in ImageSequence.Iterator(image):
+                pages.append((_prepare_page(page.copy()), "image/jpeg"))
+                if len(pages) >= OCR_MAX_PAGES:
+                    break
+            return pages
+    except Image.DecompressionBombError:
+        raise ValueError("Image trop grande pour être traitée (limite de pixels dépassée)")
+    except Exception as e:
+        print(f"[WARNING] Pretraitement image impossible ({e}), envoi du fichier brut")
+        return [(data, sniff_mime(data))]
+
+
+def preprocess_async(data: bytes) -> Future:
+    """Lance le prétraitement dans le pool ; le résultat est lu avec .result()."""
+    return _pool.submit(preprocess_image, data)
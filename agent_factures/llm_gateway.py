@@ -0,0 +1,148 @@
+"""
+Passerelle LLM de l'agent factures (Groq + Mistral)
+
+- un client par fournisseur, partagé par tous les appels (keep-alive HTTP)
+- limitation de débit par seau à jetons (requêtes/min et tokens/min)
+- nouvelles tentatives (429, 5xx, coupures réseau) avec délai exponentiel
+  + gigue, en respectant l'en-tête retry-after
+"""
+import os
+import random
+import threading
+import time
+
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "12000"))
+MISTRAL_REQUESTS_PER_MINUTE = int(os.getenv("MISTRAL_REQUESTS_PER_MINUTE", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+COMPLETION_TOKENS_ESTIMATE = 800
+
+
+class TokenBucket:
+    """Seau à jetons rempli en continu (per_minute jetons par minute)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                self._cond.wait((amount - self.level) / self.rate)
+
+    def adjust(self, delta: float):
+        """Corrige la consommation réelle (le niveau peut devenir négatif)."""
+        with self._cond:
+            self._refill()
+            self.level -= delta
+            self._cond.notify_all()
+
+
+_groq_requests = TokenBucket(GROQ_REQUESTS_PER_MINUTE)
+_groq_tokens = TokenBucket(GROQ_TOKENS_PER_MINUTE)
+_mistral_requests = TokenBucket(MISTRAL_REQUESTS_PER_MINUTE)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_groq_client(api_key: str):
+    with _clients_lock:
+        if ("groq", api_key) not in _clients:
+            from groq import Groq
+            _clients[("groq", api_key)] = Groq(api_key=api_key, max_retries=0)
+        return _clients[("groq", api_key)]
+
+
+def get_mistral_client(api_key: str):
+    with _clients_lock:
+        if ("mistral", api_key) not in _clients:
+            from mistralai import Mistral
+            _clients[("mistral", api_key)] = Mistral(api_key=api_key)
+        return _clients[("mistral", api_key)]
+
+
+def _status_code(error: Exception):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Pas de code HTTP : erreur réseau / timeout
+    name = type(error).__name__
+    return "Connection" in name or "Timeout" in name
+
+
+def _retry_after(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _call_with_retry(call, label: str):
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = random.uniform(0, min(60.0, 2 ** attempt))
+            attempt += 1
+            print(f"[WARNING] {label} : {type(e).__name__}, nouvel essai {attempt}/{LLM_MAX_RETRIES} dans {delay:.1f}s")
+            time.sleep(delay)
+
+
+def groq_chat(api_key: str, model: str, messages: list, **kwargs):
+    """Appel chat-completion Groq, limité en débit et retenté si besoin."""
+    client = get_groq_client(api_key)
+    estimated = sum(len(str(m.get("content", ""))) for m in messages) // 4 + COMPLETION_TOKENS_ESTIMATE
+
+    def call():
+        _groq_requests.acquire(1)
+        _groq_tokens.acquire(estimated)
+        return client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+    response = _call_with_retry(call, "Groq")
+
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None):
+        _groq_tokens.adjust(usage.total_tokens - estimated)
+    return response
+
+
+def mistral_chat(api_key: str, model: str, messages: list, **kwargs):
+    """Appel chat Mistral (OCR Pixtral), limité en débit et retenté si besoin."""
+    client = get_mistral_client(api_key)
+
+    def call():
+        _mistral_requests.acquire(1)
+        return client.chat.complete(model=model, messages=messages, **kwargs)
+
+    return _call_with_retry(call, "Mistral")
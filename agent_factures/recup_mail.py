@@ -1,6 +1,7 @@
 from __future__ import print_function
 import os
 import base64
+from datetime import date, datetime
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -9,19 +10,19 @@ from utils_facture import extract_text_from_pdf
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
 
-def recup_mail(folder):
-    """
-    Récupère tous les emails INBOX ou SENT avec pièces jointes.
-    Gère la pagination (nextPageToken) pour dépasser la limite des 100 mails.
-    """
-    import os, base64
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from google.auth.transport.requests import Request
-    from googleapiclient.discovery import build
+# Types de pièces jointes traités par l'agent -> extensions (filtre Gmail "filename:")
+INVOICE_MIME_TYPES = {
+    "application/pdf": ("pdf",),
+    "image/jpeg": ("jpg", "jpeg"),
+    "image/png": ("png",),
+    "image/tiff": ("tif", "tiff"),
+    "image/webp": ("webp",),
+    "image/heic": ("heic",),
+}
 
-    SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+def get_gmail_service():
+    """Connexion à l'API Gmail (token.json, sinon flux OAuth via credentials.json)."""
     creds = None
 
     # Chargement du token OAuth existant
@@ -41,36 +42,92 @@ def recup_mail(folder):
         with open('token.json', 'w') as token:
             token.write(creds.to_json())
 
-    # Connexion à Gmail
-    service = build('gmail', 'v1', credentials=creds)
+    return build('gmail', 'v1', credentials=creds)
 
-    # Label cible
-    label = "INBOX" if folder == "inbox" else "SENT"
 
-    # --- Récupération de tous les messages avec pagination ---
-    all_messages = []
+def _gmail_date(value) -> str:
+    """date/datetime ou chaîne 'YYYY-MM-DD' -> format Gmail 'YYYY/MM/DD'."""
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y/%m/%d")
+    return str(value).replace("-", "/")
+
+
+def build_query(has_attachment=True, after=None, before=None, mime_types=None) -> str:
+    """
+    Requête de recherche Gmail, appliquée côté serveur.
+
+    Exemple : 'has:attachment after:2024/01/01 {filename:pdf filename:jpg}'
+    """
+    terms = []
+    if has_attachment:
+        terms.append("has:attachment")
+    if after:
+        terms.append(f"after:{_gmail_date(after)}")
+    if before:
+        terms.append(f"before:{_gmail_date(before)}")
+    if mime_types:
+        extensions = [ext for mime in mime_types for ext in INVOICE_MIME_TYPES.get(mime, ())]
+        if extensions:
+            terms.append("{" + " ".join(f"filename:{ext}" for ext in extensions) + "}")
+    return " ".join(terms)
+
+
+def _wanted(part, mime_types) -> bool:
+    """Pièce jointe à télécharger ? (type MIME, ou extension si le type est générique)."""
+    if not mime_types:
+        return True
+    if part.get("mimeType") in mime_types:
+        return True
+    extension = part.get("filename", "").rsplit(".", 1)[-1].lower()
+    return any(extension in INVOICE_MIME_TYPES.get(mime, ()) for mime in mime_types)
+
+
+def iter_message_ids(service, label, query="", page_size=100):
+    """Identifiants des messages, page par page (nextPageToken) : une seule page en mémoire."""
     next_page = None
 
     while True:
-        query = service.users().messages().list(
+        page = service.users().messages().list(
             userId='me',
             labelIds=[label],
+            q=query or None,
             pageToken=next_page,
-            maxResults=100
+            maxResults=page_size
         ).execute()
 
-        msgs = query.get('messages', [])
-        all_messages.extend(msgs)
+        for msg in page.get('messages', []):
+            yield msg["id"]
 
-        next_page = query.get('nextPageToken')
+        next_page = page.get('nextPageToken')
         if not next_page:
             break
 
-    mails = []
 
-    for msg in all_messages:
-        msg_id = msg["id"]
+def recup_mail(folder, has_attachment=True, after=None, before=None,
+               mime_types=tuple(INVOICE_MIME_TYPES), page_size=100, service=None):
+    """
+    Récupère les emails INBOX ou SENT avec leurs pièces jointes.
+
+    Générateur paresseux : les messages sont listés page par page et chaque
+    mail est téléchargé puis rendu à l'appelant avant le suivant. Le filtrage
+    (pièces jointes, dates, types de fichiers) est fait par la recherche Gmail,
+    les mails sans intérêt ne sont donc jamais téléchargés.
+
+    Args:
+        folder: "inbox" ou "sent"
+        has_attachment: Uniquement les mails avec pièces jointes
+        after / before: Bornes de date (date, datetime ou 'YYYY-MM-DD')
+        mime_types: Types de pièces jointes à télécharger (None = toutes)
+        page_size: Nombre de messages listés par page (max 500)
+        service: Client Gmail existant (sinon connexion via get_gmail_service)
+    """
+    service = service or get_gmail_service()
 
+    # Label cible
+    label = "INBOX" if folder == "inbox" else "SENT"
+    query = build_query(has_attachment, after, before, mime_types)
+
+    for msg_id in iter_message_ids(service, label, query, page_size):
         # Récupération du message complet
         data = service.users().messages().get(
             userId='me', id=msg_id, format="full"
@@ -91,7 +148,7 @@ def recup_mail(folder):
         def explore_parts(parts_list):
             for part in parts_list:
                 filename = part.get("filename")
-                if filename:
+                if filename and _wanted(part, mime_types):
                     body = part.get("body", {})
                     att_id = body.get("attachmentId")
                     if att_id:
@@ -113,15 +170,13 @@ def recup_mail(folder):
         if payload.get("parts"):
             explore_parts(payload["parts"])
 
-        mails.append({
+        yield {
             "id": msg_id,
             "from": get_header("From"),
             "subject": subject,
             "date": get_header("Date"),
             "attachments": attachments
-        })
-
-    return mails
+        }
 
 
 
@@ -145,8 +200,8 @@ def lire_pieces_jointes_pdf(mail, output_folder="pdfs"):
                 f.write(att["data"])
             print(f"\t📁 PDF enregistré : {path}")
 
-            # Lecture du PDF
-            texte = extract_text_from_pdf(path)
+            # Lecture du PDF (depuis la mémoire, sans relire le fichier)
+            texte = extract_text_from_pdf(att["data"])
             textes_pdf.append((filename, texte))
 
             # Affichage
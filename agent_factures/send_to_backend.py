@@ -1,13 +1,16 @@
 """
 Module pour envoyer les factures au backend
 """
-import requests
+import io
 import json
+
+import requests
 from pathlib import Path
 
 
 def send_invoice_to_backend(
-    pdf_path: str,
+    pdf_data: bytes,
+    filename: str,
     analysis_data: dict,
     email_id: str,
     email_subject: str,
@@ -18,7 +21,8 @@ def send_invoice_to_backend(
     Envoie une facture PDF + données JSON au backend
     
     Args:
-        pdf_path: Chemin vers le PDF
+        pdf_data: Contenu du PDF (en mémoire, aucun fichier temporaire)
+        filename: Nom du fichier transmis au backend
         analysis_data: Dictionnaire JSON de l'analyse
         email_id: ID de l'email Gmail
         email_subject: Sujet de l'email
@@ -33,10 +37,10 @@ def send_invoice_to_backend(
     analysis_data["email_subject"] = email_subject
     
     try:
-        # Ouvrir le PDF
-        with open(pdf_path, 'rb') as pdf_file:
+        # Le PDF est lu depuis un tampon mémoire
+        with io.BytesIO(pdf_data) as pdf_file:
             files = {
-                'file': (Path(pdf_path).name, pdf_file, 'application/pdf')
+                'file': (Path(filename).name, pdf_file, 'application/pdf')
             }
             
             data = {
@@ -1,9 +1,11 @@
+import io
 import json
 from pathlib import Path
 import pdfplumber
 import os
 import base64
-from mistralai import Mistral
+from llm_gateway import mistral_chat
+from image_preprocess import preprocess_image
 
 def read_file(path: str | Path) -> str | None:
     try:
@@ -16,9 +18,12 @@ def read_file(path: str | Path) -> str | None:
 #############################
 #LIRE LES PIECES JOINTES PDF#
 #############################
-def extract_text_from_pdf(path):
+def extract_text_from_pdf(source):
+    """Texte d'un PDF ; source = chemin ou contenu en mémoire (bytes)."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
     text = ""
-    with pdfplumber.open(path) as pdf:
+    with pdfplumber.open(source) as pdf:
         for page in pdf.pages:
             text += page.extract_text() or ""
     return text
@@ -27,37 +32,31 @@ def extract_text_from_pdf(path):
 ##########################
 #LIRE LE TEXT DANS IMAGES#
 ##########################
-def encode_image_to_base64(path):
-    with open(path, "rb") as f:
-        data = f.read()
+def encode_image_to_base64(data: bytes) -> str:
     return base64.b64encode(data).decode("utf-8")
 
-def extract_text_with_pixtral(image_path, api_key, model):
+def extract_text_from_images(pages, api_key, model):
+    """OCR Pixtral de pages déjà préparées : liste de (contenu, type MIME)."""
 
     if not api_key:
         raise ValueError("Mettez votre MISTRAL_API_KEY dans l'environnement")
-    client = Mistral(api_key=api_key)
-
 
-    b64 = encode_image_to_base64(image_path)
-    image_payload = f"data:image/jpeg;base64,{b64}"
-    messages = [
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": "Extract all text from this image:"},
-                {"type": "image_url", "image_url": image_payload}
-            ]
-        }
-    ]
+    content = [{"type": "text", "text": "Extract all text from this image:"}]
+    for data, mime in pages:
+        content.append({
+            "type": "image_url",
+            "image_url": f"data:{mime};base64,{encode_image_to_base64(data)}"
+        })
+    messages = [{"role": "user", "content": content}]
 
-    response = client.chat.complete(
-        model=model,
-        messages=messages,
-    )
+    response = mistral_chat(api_key, model=model, messages=messages)
 
     return response.choices[0].message.content
 
+def extract_text_with_pixtral(image_path, api_key, model):
+    with open(image_path, "rb") as f:
+        data = f.read()
+    return extract_text_from_images(preprocess_image(data), api_key, model)
 
 
 if __name__ == "__main__":
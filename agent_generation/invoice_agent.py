@@ -1,9 +1,15 @@
-from groq import Groq
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from pathlib import Path
 import random
 import os
 import json
+import sys
+
+# Passerelle LLM partagée avec l'agent factures (débit limité, nouvelles tentatives)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "agent_factures"))
+from llm_gateway import groq_chat
+
 load_dotenv()
 
 def read_file(file_path):
@@ -17,7 +23,6 @@ if not groq_key:
         "GROQ_KEY n'est pas définie. Veuillez créer un fichier .env dans ce répertoire avec: GROQ_KEY=votre_cle_api"
     )
 
-client = Groq(api_key=groq_key)
 
 ALTEVIA_SIRET = "123 456 789 00012"
 ALTEVIA_VAT = "FR12 345678900"
@@ -123,7 +128,8 @@ def generate_invoice_mail(is_seller_mode=False, template_rules=None, template_na
                 extra += f"- Consigne détaillée : {suffix}\n"
             prompt_text += extra
 
-    response = client.chat.completions.create(
+    response = groq_chat(
+        groq_key,
         messages=[
             {
                 "role": "system",
@@ -3,17 +3,19 @@ Routes d'authentification
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.principal_cache import principal_cache
 from app.core.security import (
-    verify_password, 
-    get_password_hash, 
+    verify_and_update_password,
+    hash_password,
     create_access_token,
     decode_access_token
 )
 from app.models.user import User
+from app.repositories import UserRepository
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
 
 router = APIRouter()
@@ -21,26 +23,34 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Récupérer un utilisateur par email"""
-    return db.query(User).filter(User.email == email).first()
+    return await UserRepository(db).get_by_email(email)
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    """Authentifier un utilisateur"""
-    user = get_user_by_email(db, email)
-    if not user:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """Authentifier un utilisateur (hash recalculé si les paramètres de coût ont changé)"""
+    user = await get_user_by_email(db, email)
+    if not user or not user.is_active:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        user = await UserRepository(db).update(user, hashed_password=new_hash)
     return user
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
-    """Récupérer l'utilisateur courant depuis le token"""
+    """
+    Récupérer l'utilisateur courant depuis le token
+
+    L'utilisateur est servi par le cache du principal quand c'est possible
+    (détaché de la session, lecture seule) ; sinon lu en base puis mis en cache.
+    """
     payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(
@@ -57,11 +67,21 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = get_user_by_email(db, email=email)
+    user = await principal_cache.get(email)
     if user is None:
+        user = await get_user_by_email(db, email=email)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        await principal_cache.set(email, user)
+    
+    if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail="Inactive user",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
@@ -69,12 +89,12 @@ async def get_current_user(
 
 
 @router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Créer un nouveau compte utilisateur
     """
     # Vérifier si l'email existe déjà
-    existing_user = get_user_by_email(db, user_data.email)
+    existing_user = await get_user_by_email(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -82,17 +102,13 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Créer le nouvel utilisateur
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(
+    hashed_password = await hash_password(user_data.password)
+    new_user = await UserRepository(db).create(
         email=user_data.email,
         hashed_password=hashed_password,
         full_name=user_data.full_name
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
     # Créer le token
     access_token = create_access_token(data={"sub": new_user.email})
     
@@ -104,11 +120,11 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Connexion utilisateur
     """
-    user = authenticate_user(db, user_data.email, user_data.password)
+    user = await authenticate_user(db, user_data.email, user_data.password)
     
     if not user:
         raise HTTPException(
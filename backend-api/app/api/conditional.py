@@ -0,0 +1,89 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified / 304) sur les lectures
+
+Les listes et statistiques d'un utilisateur ne changent que lorsque ses
+factures ou transactions sont modifiées (users.data_version, voir
+app.models.data_version). La dépendance data_version_validators compare
+la version courante aux en-têtes If-None-Match / If-Modified-Since du
+client : si rien n'a changé, la requête s'arrête en 304 avant les requêtes
+de la route et la sérialisation.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.auth import get_current_user
+from app.core.database import get_async_db
+from app.models.user import User
+from app.repositories import UserRepository
+
+
+def _etag(request: Request, user_id: int, version: int) -> str:
+    """ETag faible : version des données + représentation demandée (chemin, paramètres)"""
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{user_id}:{version}:{request.url.path}?{query}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite rend des datetimes naïfs (écrits en UTC)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Comparaison faible : W/"x" et "x" sont équivalents
+    return "*" in candidates or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
+
+
+def _not_modified_since(if_modified_since: str, updated_at: Optional[datetime]) -> bool:
+    if updated_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified est à la seconde près
+    return _as_utc(updated_at).replace(microsecond=0) <= _as_utc(since)
+
+
+async def data_version_validators(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, str]:
+    """
+    En-têtes de validation (ETag, Last-Modified) de la réponse ; lève 304 si
+    la version connue du client est à jour.
+
+    Les en-têtes sont posés sur la réponse de la route ; les routes qui
+    construisent leur propre Response doivent les y ajouter.
+    """
+    version, updated_at = await UserRepository(db).data_version(current_user.id)
+
+    headers = {
+        "ETag": _etag(request, current_user.id, version),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(updated_at), usegmt=True)
+
+    # If-None-Match prime sur If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, updated_at)
+
+    if not_modified:
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return headers
@@ -1,26 +1,42 @@
 """
 Routes API pour les factures
+
+Les lectures passent par la session asynchrone (app.repositories) ; les
+routes qui utilisent la session synchrone sont déclarées en def et
+exécutées dans le pool de threads de FastAPI.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional
+from datetime import date
+import io
 import json
 from pathlib import Path
 
-from app.core.database import get_db
-from app.core.storage import save_invoice_pdf, delete_invoice_pdf
+from app.core.database import AsyncSessionLocal, get_async_db, get_db
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.core.serialization import FastJSONResponse, parse_fields
+from app.core.storage import save_invoice_pdf, delete_invoice_pdf, compute_content_hash
 from app.api.auth import get_current_user
+from app.api.conditional import data_version_validators
 from app.models.user import User
 from app.models.invoice import Invoice
-from app.schemas.invoice import InvoiceResponse
-from app.services.invoice_scanner import InvoiceScanner
+from app.models.job import Job
+from app.repositories import InvoiceRepository
+from app.schemas.invoice import INVOICE_LIST_FIELDS, InvoiceListItem, InvoiceResponse, ReanalysisRequest
+from app.schemas.job import JobResponse
+from app.schemas.scan import ScanSpec
+from app.services.exports import EXPORT_FORMATS, encode_export, parquet_available
+from app.services.job_queue import enqueue_job
 
 router = APIRouter()
 
 
 @router.post("/upload", response_model=InvoiceResponse, status_code=status.HTTP_201_CREATED)
-async def upload_invoice(
+def upload_invoice(
     file: UploadFile = File(...),
     extracted_data: str = Form(...),
     current_user: User = Depends(get_current_user),
@@ -48,11 +64,25 @@ async def upload_invoice(
             detail="Invalid JSON in extracted_data"
         )
     
+    # Déduplication par contenu : un PDF déjà reçu n'est pas stocké une seconde fois
+    file_data = file.file.read()
+    content_hash = compute_content_hash(file_data)
+    
+    def find_existing() -> Optional[Invoice]:
+        return db.query(Invoice).filter(
+            Invoice.user_id == current_user.id,
+            Invoice.content_hash == content_hash
+        ).first()
+    
+    existing = find_existing()
+    if existing:
+        return existing
+    
     # Sauvegarder le PDF
     file_info = save_invoice_pdf(
         user_id=current_user.id,
         filename=file.filename,
-        file_content=file.file
+        file_content=io.BytesIO(file_data)
     )
     
     # Créer l'entrée en base
@@ -69,46 +99,150 @@ async def upload_invoice(
         confidence_global=data.get("confidence_global", 0.0),
         file_path=file_info["file_path"],
         file_name=file_info["file_name"],
+        content_hash=content_hash,
         email_id=data.get("email_id"),
         email_subject=data.get("email_subject"),
         invoice_type="entrante"
     )
     
-    db.add(new_invoice)
-    db.commit()
+    try:
+        db.add(new_invoice)
+        db.commit()
+    except IntegrityError:
+        # Même PDF envoyé en parallèle : la facture enregistrée par l'autre requête est renvoyée
+        db.rollback()
+        delete_invoice_pdf(file_info["file_path"])
+        existing = find_existing()
+        if existing is None:
+            raise
+        return existing
+    except Exception:
+        db.rollback()
+        delete_invoice_pdf(file_info["file_path"])
+        raise
     db.refresh(new_invoice)
     
     return new_invoice
 
 
-@router.get("/", response_model=List[InvoiceResponse])
+def invoice_filters(
+    supplier: Optional[str] = None,
+    siret: Optional[str] = None,
+    min_ttc: Optional[float] = None,
+    max_ttc: Optional[float] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    invoice_type: Optional[str] = Query(None, pattern="^(entrante|sortante)$"),
+    reconciled: Optional[bool] = None
+) -> dict:
+    """
+    Filtres communs à la liste et à l'export
+
+    - **supplier**: nom exact du fournisseur
+    - **siret**: SIRET du fournisseur
+    - **min_ttc** / **max_ttc**: bornes du montant TTC
+    - **date_from** / **date_to**: bornes de la date de facture
+    - **invoice_type**: entrante / sortante
+    - **reconciled**: rapprochée (ou non) avec une transaction
+    """
+    return {
+        "supplier": supplier,
+        "siret": siret,
+        "min_ttc": min_ttc,
+        "max_ttc": max_ttc,
+        "date_from": date_from,
+        "date_to": date_to,
+        "invoice_type": invoice_type,
+        "reconciled": reconciled,
+    }
+
+
+@router.get("/", response_model=List[InvoiceListItem], response_class=FastJSONResponse)
 async def get_invoices(
+    filters: dict = Depends(invoice_filters),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    validators: Dict[str, str] = Depends(data_version_validators),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Récupérer toutes les factures de l'utilisateur
+    Récupérer les factures de l'utilisateur, plus récentes d'abord
+
+    - **supplier**, **siret**, **min_ttc** / **max_ttc**, **date_from** / **date_to**,
+      **invoice_type**, **reconciled**: filtres (voir invoice_filters)
+    - **cursor** / **limit**: pagination ; le curseur de la page suivante
+      est renvoyé dans l'en-tête X-Next-Cursor (absent sur la dernière page)
+    - **fields**: champs renvoyés, séparés par des virgules (ex. id,invoice_date,amount_ttc) ;
+      par défaut les champs de liste, sans les documents volumineux
+
+    Réponse 304 si les données n'ont pas changé (If-None-Match / If-Modified-Since).
     """
-    invoices = db.query(Invoice).filter(
-        Invoice.user_id == current_user.id
-    ).order_by(Invoice.created_at.desc()).all()
-    
-    return invoices
+    try:
+        selected = parse_fields(fields, InvoiceListItem.model_fields, INVOICE_LIST_FIELDS)
+        invoices, next_cursor = await InvoiceRepository(db).list_for_user(
+            current_user.id,
+            cursor=cursor,
+            limit=limit,
+            fields=selected,
+            **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Réponse construite directement : pas de validation Pydantic ligne par ligne
+    headers = {**validators, NEXT_CURSOR_HEADER: next_cursor} if next_cursor else validators
+    return FastJSONResponse(invoices, headers=headers)
+
+
+@router.get("/export")
+async def export_invoices(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    fields: Optional[str] = None,
+    filters: dict = Depends(invoice_filters),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Exporter les factures filtrées (CSV, NDJSON ou Parquet), en flux
+
+    Mêmes filtres et même sélection de champs (**fields**) que la liste ;
+    toutes les factures correspondantes sont exportées, sans pagination.
+    """
+    try:
+        selected = parse_fields(fields, InvoiceResponse.model_fields, INVOICE_LIST_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Export Parquet indisponible (pyarrow non installé)"
+        )
+
+    # Session propre au flux : celle de la dépendance est fermée avant l'envoi de la réponse
+    async def batches():
+        async with AsyncSessionLocal() as db:
+            async for rows in InvoiceRepository(db).stream_for_user(current_user.id, fields=selected, **filters):
+                yield rows
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        encode_export(export_format, batches(), Invoice, selected),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="factures-{date.today()}.{extension}"'}
+    )
 
 
 @router.get("/{invoice_id}", response_model=InvoiceResponse)
 async def get_invoice(
     invoice_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupérer une facture spécifique
     """
-    invoice = db.query(Invoice).filter(
-        Invoice.id == invoice_id,
-        Invoice.user_id == current_user.id
-    ).first()
+    invoice = await InvoiceRepository(db).get_for_user(current_user.id, invoice_id)
     
     if not invoice:
         raise HTTPException(
@@ -120,7 +254,7 @@ async def get_invoice(
 
 
 @router.get("/{invoice_id}/pdf")
-async def download_invoice_pdf(
+def download_invoice_pdf(
     invoice_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -155,7 +289,7 @@ async def download_invoice_pdf(
 
 
 @router.delete("/{invoice_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_invoice(
+def delete_invoice(
     invoice_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -184,32 +318,85 @@ async def delete_invoice(
     return None
 
 
-def _scan_invoices_task(user_id: int, db: Session):
-    """Tâche de scan en arrière-plan"""
-    try:
-        scanner = InvoiceScanner(user_id=user_id, db=db)
-        stats = scanner.scan_and_process(max_emails=50)
-    except Exception:
-        pass
-    finally:
-        db.close()
-
-
 @router.post("/scan")
-async def scan_gmail_invoices(
-    background_tasks: BackgroundTasks,
+def scan_gmail_invoices(
+    spec: Optional[ScanSpec] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Lance le scan Gmail pour extraire les factures
-    Le scan s'exécute en arrière-plan pour ne pas bloquer le serveur
+    Le scan est placé dans la file de tâches et exécuté par un worker
+    Un seul scan actif par utilisateur : un scan déjà en attente est réutilisé
+    
+    Corps optionnel (ScanSpec) : filtres (dates, expéditeurs, libellés,
+    fichiers), budget du passage et curseur de reprise (result.next_cursor
+    de la tâche précédente).
     """
-    # Lancer le scan en arrière-plan
-    background_tasks.add_task(_scan_invoices_task, current_user.id, db)
+    spec = spec or ScanSpec()
+    job = enqueue_job(db, current_user.id, "gmail_scan", spec.model_dump(mode="json", exclude_none=True))
     
     return {
         "message": "Scan Gmail lancé en arrière-plan. Les factures apparaîtront progressivement.",
-        "status": "processing"
+        "status": job.status,
+        "job_id": job.id
     }
 
+
+@router.get("/scan/jobs", response_model=List[JobResponse])
+def list_scan_jobs(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Récupérer les dernières tâches (scans, ré-analyses) de l'utilisateur
+    """
+    return db.query(Job).filter(
+        Job.user_id == current_user.id
+    ).order_by(Job.created_at.desc(), Job.id.desc()).limit(min(limit, 100)).all()
+
+
+@router.get("/scan/jobs/{job_id}", response_model=JobResponse)
+def get_scan_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Récupérer l'état d'une tâche
+    """
+    job = db.query(Job).filter(
+        Job.id == job_id,
+        Job.user_id == current_user.id
+    ).first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job
+
+
+@router.post("/reanalyze")
+def reanalyze_invoices(
+    params: ReanalysisRequest = ReanalysisRequest(),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ré-analyse les factures déjà stockées avec le prompt et le modèle actuels
+    Aucun accès Gmail : les PDF stockés sont relus localement
+    """
+    job = enqueue_job(db, current_user.id, "invoice_reanalysis", {
+        "invoice_ids": params.invoice_ids,
+        "include_validated": params.include_validated
+    })
+    
+    return {
+        "message": "Ré-analyse lancée en arrière-plan. Les factures seront mises à jour progressivement.",
+        "status": job.status,
+        "job_id": job.id
+    }
@@ -2,18 +2,22 @@
 Routes API pour l'optimisation fiscale et l'analyse comptable
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.api.auth import get_current_user
+from app.api.conditional import data_version_validators
 from app.models.user import User
-from app.services.optimisation_service import OptimisationService
+from app.repositories import InvoiceRepository, TransactionRepository
+from app.services.optimisation_service import optimisation_service
 
 router = APIRouter()
 
 
+# def : l'appel LLM (plusieurs secondes) s'exécute dans le pool de threads
 @router.get("/analyze")
-async def get_analysis(
+def get_analysis(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -27,8 +31,7 @@ async def get_analysis(
     - Recommandations d'optimisation
     - Résumé
     """
-    service = OptimisationService()
-    result = service.analyze(user_id=current_user.id, db=db)
+    result = optimisation_service.analyze(user_id=current_user.id, db=db)
     
     if not result:
         raise HTTPException(
@@ -42,7 +45,8 @@ async def get_analysis(
 @router.get("/tva")
 async def get_tva_analysis(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    _validators: dict = Depends(data_version_validators),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyse spécifique de la TVA
@@ -52,54 +56,43 @@ async def get_tva_analysis(
     - TVA déductible (sur achats)
     - TVA à payer
     - Conseils
+    
+    Réponse 304 si les factures n'ont pas changé (If-None-Match / If-Modified-Since).
     """
-    service = OptimisationService()
-    result = service.get_tva_analysis(user_id=current_user.id, db=db)
+    try:
+        totals = await InvoiceRepository(db).tva_totals(current_user.id)
+    except Exception:
+        return optimisation_service.tva_error()
     
-    return result
+    return optimisation_service.tva_summary(
+        tva_collectee=totals.get("sortante", 0.0),
+        tva_deductible=totals.get("entrante", 0.0)
+    )
 
 
 @router.get("/stats")
 async def get_quick_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    _validators: dict = Depends(data_version_validators),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Statistiques rapides sans analyse LLM
-    """
-    from app.models.invoice import Invoice
-    from app.models.transaction import Transaction
     
-    # Compter les factures
-    total_invoices = db.query(Invoice).filter(Invoice.user_id == current_user.id).count()
-    invoices_received = db.query(Invoice).filter(
-        Invoice.user_id == current_user.id,
-        Invoice.invoice_type == "entrante"
-    ).count()
-    invoices_sent = db.query(Invoice).filter(
-        Invoice.user_id == current_user.id,
-        Invoice.invoice_type == "sortante"
-    ).count()
+    Réponse 304 si les données n'ont pas changé (If-None-Match / If-Modified-Since).
+    """
+    # Comptes et montants calculés par la base (une requête par table)
+    invoices = await InvoiceRepository(db).stats_for_user(current_user.id)
+    transactions = await TransactionRepository(db).stats_for_user(current_user.id)
     
-    # Compter les transactions
-    total_transactions = db.query(Transaction).filter(Transaction.user_id == current_user.id).count()
-    reconciled_transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id,
-        Transaction.is_reconciled == True
-    ).count()
-    
-    # Calculer les montants
-    invoices = db.query(Invoice).filter(Invoice.user_id == current_user.id).all()
-    total_amount = sum(
-        inv.amounts.get('ttc', 0) if isinstance(inv.amounts, dict) else 0
-        for inv in invoices
-    )
+    total_transactions = transactions["total"]
+    reconciled_transactions = transactions["reconciled"]
     
     return {
         "factures": {
-            "total": total_invoices,
-            "reçues": invoices_received,
-            "envoyées": invoices_sent
+            "total": invoices["total"],
+            "reçues": invoices["received"],
+            "envoyées": invoices["sent"]
         },
         "transactions": {
             "total": total_transactions,
@@ -107,7 +100,6 @@ async def get_quick_stats(
             "taux_rapprochement": round(reconciled_transactions / total_transactions * 100, 1) if total_transactions > 0 else 0
         },
         "montants": {
-            "total_factures": round(total_amount, 2)
+            "total_factures": round(invoices["total_ttc"], 2)
         }
     }
-
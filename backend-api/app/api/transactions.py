@@ -1,28 +1,40 @@
 """
 Routes API pour les transactions bancaires
+
+Les lectures passent par la session asynchrone (app.repositories) ; les
+routes qui utilisent la session synchrone ou appellent le LLM sont
+déclarées en def et exécutées dans le pool de threads de FastAPI, pour ne
+pas bloquer la boucle d'événements.
 """
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 import pandas as pd
 import io
 import json
-from datetime import datetime
+from datetime import date, datetime
 import uuid
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_async_db, get_db
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.core.serialization import FastJSONResponse, parse_fields
 from app.api.auth import get_current_user
+from app.api.conditional import data_version_validators
 from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.invoice import Invoice
-from app.schemas.transaction import TransactionResponse, ReconciliationResult
-from app.services.bank_reconciliation import BankReconciliationService
+from app.repositories import TransactionRepository
+from app.schemas.transaction import TRANSACTION_LIST_FIELDS, TransactionListItem, TransactionResponse, ReconciliationResult
+from app.services.bank_reconciliation import bank_reconciliation_service
+from app.services.exports import EXPORT_FORMATS, encode_export, parquet_available
 
 router = APIRouter()
 
 
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
-async def upload_transactions(
+def upload_transactions(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -38,7 +50,7 @@ async def upload_transactions(
     """
     try:
         # Lire le fichier
-        contents = await file.read()
+        contents = file.file.read()
         
         # Déterminer le type de fichier
         if file.filename.endswith('.csv'):
@@ -120,39 +132,120 @@ async def upload_transactions(
         )
 
 
-@router.get("/", response_model=List[TransactionResponse])
+def transaction_filters(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    vendor: Optional[str] = None,
+    reconciled: Optional[bool] = None,
+    reconciled_only: bool = False
+) -> dict:
+    """
+    Filtres communs à la liste et à l'export
+
+    - **date_from** / **date_to**: bornes de la date de transaction
+    - **min_amount** / **max_amount**: bornes du montant (négatif = dépense)
+    - **vendor**: fournisseur / client exact
+    - **reconciled**: rapprochées (true) ou à rapprocher (false) ;
+      reconciled_only=true reste accepté (équivaut à reconciled=true)
+    """
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+        "vendor": vendor,
+        "reconciled": True if reconciled_only else reconciled,
+    }
+
+
+@router.get("/", response_model=List[TransactionListItem], response_class=FastJSONResponse)
 async def get_transactions(
+    filters: dict = Depends(transaction_filters),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    reconciled_only: bool = False
+    validators: Dict[str, str] = Depends(data_version_validators),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Récupérer les transactions de l'utilisateur
+    Récupérer les transactions de l'utilisateur, plus récentes d'abord
+
+    - **date_from** / **date_to**, **min_amount** / **max_amount**, **vendor**,
+      **reconciled**: filtres (voir transaction_filters)
+    - **cursor** / **limit**: pagination ; le curseur de la page suivante
+      est renvoyé dans l'en-tête X-Next-Cursor (absent sur la dernière page)
+    - **fields**: champs renvoyés, séparés par des virgules (ex. id,date,amount) ;
+      par défaut les champs de liste, sans les documents volumineux
+
+    Réponse 304 si les données n'ont pas changé (If-None-Match / If-Modified-Since).
     """
-    query = db.query(Transaction).filter(Transaction.user_id == current_user.id)
-    
-    if reconciled_only:
-        query = query.filter(Transaction.is_reconciled == True)
-    
-    transactions = query.order_by(Transaction.date.desc()).offset(skip).limit(limit).all()
-    return transactions
+    try:
+        selected = parse_fields(fields, TransactionListItem.model_fields, TRANSACTION_LIST_FIELDS)
+        transactions, next_cursor = await TransactionRepository(db).list_for_user(
+            current_user.id,
+            cursor=cursor,
+            limit=limit,
+            fields=selected,
+            **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Réponse construite directement : pas de validation Pydantic ligne par ligne
+    headers = {**validators, NEXT_CURSOR_HEADER: next_cursor} if next_cursor else validators
+    return FastJSONResponse(transactions, headers=headers)
+
+
+@router.get("/export")
+async def export_transactions(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    fields: Optional[str] = None,
+    filters: dict = Depends(transaction_filters),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Exporter les transactions filtrées (CSV, NDJSON ou Parquet), en flux
+
+    Mêmes filtres et même sélection de champs (**fields**) que la liste ;
+    toutes les transactions correspondantes sont exportées, sans pagination.
+    """
+    try:
+        selected = parse_fields(fields, TransactionResponse.model_fields, TRANSACTION_LIST_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Export Parquet indisponible (pyarrow non installé)"
+        )
+
+    # Session propre au flux : celle de la dépendance est fermée avant l'envoi de la réponse
+    async def batches():
+        async with AsyncSessionLocal() as db:
+            async for rows in TransactionRepository(db).stream_for_user(current_user.id, fields=selected, **filters):
+                yield rows
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        encode_export(export_format, batches(), Transaction, selected),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions-{date.today()}.{extension}"'}
+    )
 
 
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 async def get_transaction(
     transaction_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupérer une transaction spécifique
     """
-    transaction = db.query(Transaction).filter(
-        Transaction.id == transaction_id,
-        Transaction.user_id == current_user.id
-    ).first()
+    transaction = await TransactionRepository(db).get_for_user(current_user.id, transaction_id)
     
     if not transaction:
         raise HTTPException(
@@ -164,7 +257,7 @@ async def get_transaction(
 
 
 @router.post("/reconcile-all")
-async def reconcile_all_invoices(
+def reconcile_all_invoices(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -197,7 +290,6 @@ async def reconcile_all_invoices(
         )
     
     
-    service = BankReconciliationService()
     results = []
     stats = {
         "total_invoices": len(invoices),
@@ -223,8 +315,8 @@ async def reconcile_all_invoices(
         
         # Préparer les données
         invoice_data = {
-            "fournisseur": invoice.supplier.get('name') if isinstance(invoice.supplier, dict) else str(invoice.supplier),
-            "montant_ttc": invoice.amounts.get('ttc') if isinstance(invoice.amounts, dict) else 0,
+            "fournisseur": invoice.supplier_name,
+            "montant_ttc": invoice.amount_ttc or 0,
             "date": str(invoice.invoice_date),
             "invoice_number": invoice.invoice_number
         }
@@ -250,7 +342,7 @@ async def reconcile_all_invoices(
         ]
         
         # Effectuer le rapprochement
-        result = service.reconcile(
+        result = bank_reconciliation_service.reconcile(
             invoice_data=invoice_data,
             bank_transactions=bank_transactions,
             invoice_type="reception" if invoice.invoice_type == "entrante" else "envoi"
@@ -321,7 +413,7 @@ async def reconcile_all_invoices(
 
 
 @router.post("/reconcile/{invoice_id}")
-async def reconcile_invoice(
+def reconcile_invoice(
     invoice_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -361,8 +453,8 @@ async def reconcile_invoice(
     
     # Préparer les données pour le rapprochement
     invoice_data = {
-        "fournisseur": invoice.supplier.get('name') if isinstance(invoice.supplier, dict) else str(invoice.supplier),
-        "montant_ttc": invoice.amounts.get('ttc') if isinstance(invoice.amounts, dict) else 0,
+        "fournisseur": invoice.supplier_name,
+        "montant_ttc": invoice.amount_ttc or 0,
         "date": str(invoice.invoice_date),
         "invoice_number": invoice.invoice_number
     }
@@ -379,8 +471,7 @@ async def reconcile_invoice(
     ]
     
     # Effectuer le rapprochement
-    service = BankReconciliationService()
-    result = service.reconcile(
+    result = bank_reconciliation_service.reconcile(
         invoice_data=invoice_data,
         bank_transactions=bank_transactions,
         invoice_type="reception" if invoice.invoice_type == "entrante" else "envoi"
@@ -456,7 +547,7 @@ async def reconcile_invoice(
 
 
 @router.post("/reconcile/{invoice_id}/confirm/{transaction_id}")
-async def confirm_reconciliation(
+def confirm_reconciliation(
     invoice_id: int,
     transaction_id: int,
     confidence: float = 1.0,
@@ -499,8 +590,8 @@ async def confirm_reconciliation(
     reconciliation_details = {
         "invoice_number": invoice.invoice_number,
         "invoice_date": str(invoice.invoice_date),
-        "supplier": invoice.supplier.get('name') if isinstance(invoice.supplier, dict) else str(invoice.supplier),
-        "amount_invoice": invoice.amounts.get('ttc') if isinstance(invoice.amounts, dict) else 0,
+        "supplier": invoice.supplier_name,
+        "amount_invoice": invoice.amount_ttc or 0,
         "amount_transaction": transaction.amount,
         "confirmed_at": str(datetime.now()),
         "confirmed_by": "user"
@@ -526,7 +617,7 @@ async def confirm_reconciliation(
 
 
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_transaction(
+def delete_transaction(
     transaction_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1,6 +1,8 @@
 """
 Configuration de l'application - Toutes les variables viennent du .env
 """
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -12,11 +14,36 @@ class Settings(BaseSettings):
     
     # Database PostgreSQL
     DATABASE_URL: str
+    AUTO_MIGRATE: bool = False  # alembic upgrade head au démarrage de l'API (un seul processus, dev)
+    ASYNC_DATABASE_URL: Optional[str] = None  # Défaut : DATABASE_URL avec asyncpg / aiosqlite
+    DB_POOL_SIZE: int = 5  # Connexions permanentes par moteur et par processus
+    DB_MAX_OVERFLOW: int = 10  # Connexions supplémentaires en pointe
+    DB_POOL_TIMEOUT: int = 30  # Attente max d'une connexion libre (secondes)
+    DB_POOL_RECYCLE: int = 1800  # Renouvellement des connexions (secondes, < timeout serveur)
+    DB_POOL_PRE_PING: bool = False  # SELECT 1 à chaque emprunt (réseau instable)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # statement_timeout PostgreSQL (0 = aucun)
+    DB_ECHO: bool = False  # Journaliser chaque requête SQL (indépendant de DEBUG)
+    
+    # Points d'observation internes (/metrics, /health/db) : désactivés (404) sans
+    # jeton, sinon accessibles avec Authorization: Bearer <METRICS_TOKEN>
+    METRICS_TOKEN: Optional[str] = None
+    
+    # Compression des réponses HTTP
+    COMPRESSION_MIN_SIZE: int = 1024  # Octets ; en dessous, réponse envoyée telle quelle
+    GZIP_LEVEL: int = 6  # 1 (rapide) à 9 (compact)
+    BROTLI_QUALITY: int = 4  # Si brotli-asgi est installé (0 à 11)
     
     # JWT Authentication
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # Hachage des mots de passe (bcrypt)
+    BCRYPT_ROUNDS: int = 12  # Modifié : les hash existants sont recalculés à la connexion
+    PASSWORD_HASH_WORKERS: int = 2  # Calculs bcrypt simultanés par processus
+    # Cache de l'utilisateur authentifié (évite une requête par appel API)
+    AUTH_CACHE_TTL_SECONDS: int = 30  # 0 = désactivé
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_REDIS_URL: Optional[str] = None  # ex. redis://localhost:6379/0 (partagé entre processus)
     
     # Supabase
     SUPABASE_URL: str
@@ -26,6 +53,39 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     MODEL_NAME_analyse: str
     
+    # Limites et politique de nouvelle tentative des appels LLM
+    LLM_REQUESTS_PER_MINUTE: int = 30
+    LLM_TOKENS_PER_MINUTE: int = 12000
+    LLM_COMPLETION_TOKENS_ESTIMATE: int = 800
+    LLM_MAX_RETRIES: int = 5
+    LLM_RETRY_BASE_SECONDS: float = 1.0
+    LLM_RETRY_MAX_SECONDS: float = 60.0
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    # Tarifs pour l'estimation des coûts (USD par million de tokens)
+    LLM_PRICE_INPUT_PER_MTOK: float = 0.59
+    LLM_PRICE_OUTPUT_PER_MTOK: float = 0.79
+    
+    # Cache du texte extrait (PDF / OCR)
+    EXTRACTION_CACHE_DIR: str = "./cache/extraction"
+    EXTRACTION_CACHE_MAX_MB: int = 512
+    
+    # Extraction locale par règles : le LLM n'est appelé qu'en dessous de ce seuil
+    LOCAL_EXTRACTION_MIN_CONFIDENCE: float = 0.85  # > 1 pour toujours appeler le LLM
+    
+    # File de tâches (scans Gmail, ré-analyses)
+    SCAN_WORKERS: int = 2  # Tâches simultanées par processus worker
+    WORKER_POLL_SECONDS: float = 2.0
+    RUN_EMBEDDED_WORKER: bool = False  # Exécuter les tâches dans le processus API (dev)
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: int = 30
+    JOB_RETRY_MAX_SECONDS: int = 900
+    JOB_LOCK_TIMEOUT_SECONDS: int = 1800
+    JOB_HEARTBEAT_SECONDS: int = 60  # Prolongation du verrou d'une tâche en cours (< JOB_LOCK_TIMEOUT_SECONDS)
+    
+    # Budget par défaut d'un scan Gmail (au-delà : tranche suivante via curseur)
+    SCAN_MAX_EMAILS: int = 50
+    SCAN_MAX_SECONDS: int = 600
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
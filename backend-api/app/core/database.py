@@ -1,24 +1,148 @@
 """
 Configuration de la base de données PostgreSQL
+
+Deux moteurs partagent la même base :
+- engine / SessionLocal (synchrone) : worker, services, routes exécutées
+  dans le pool de threads de FastAPI (def) ;
+- get_async_engine() / AsyncSessionLocal (asyncpg, aiosqlite) : routes async
+  via app.repositories, sans bloquer la boucle d'événements. Le moteur est
+  créé à la première session : le worker et Alembic, qui n'utilisent que
+  le moteur synchrone, n'ont pas besoin du pilote asynchrone.
 """
-from sqlalchemy import create_engine
+import threading
+import time
+from functools import wraps
+from typing import Any, AsyncIterator, Dict, Optional
+
+from sqlalchemy import JSON, create_engine, exc
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.core.config import settings
+from app.core.metrics import db_pool_checkout_wait_seconds, db_pool_connections, db_pool_timeouts_total, registry
+
+# Pilote asynchrone par défaut selon le SGBD
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, sinon DATABASE_URL avec le pilote asynchrone"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+
+def time_checkouts(engine: Engine, name: str) -> None:
+    """
+    Mesure l'attente de chaque demande de connexion au pool (saturation)
+
+    Les sessions (synchrones, et asynchrones via AsyncEngine.sync_engine)
+    obtiennent leurs connexions par Engine.connect() : l'appel est chronométré,
+    et un TimeoutError (pool saturé pendant DB_POOL_TIMEOUT) compté.
+    """
+    connect = engine.connect
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG,
-    connect_args={
-        "connect_timeout": 5  # Timeout de 5 secondes
+    @wraps(connect)
+    def timed_connect(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return connect(*args, **kwargs)
+        except exc.TimeoutError:
+            db_pool_timeouts_total.inc(engine=name)
+            raise
+        finally:
+            db_pool_checkout_wait_seconds.observe(time.perf_counter() - start, engine=name)
+
+    engine.connect = timed_connect
+
+
+def engine_options(url: URL, name: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Options du moteur : pool, vérification des connexions, timeouts
+
+    Sans pre-ping (DB_POOL_PRE_PING=False), les connexions sont renouvelées
+    avant le délai d'inactivité du serveur (DB_POOL_RECYCLE) ; une connexion
+    coupée invalide le pool et la requête suivante repart sur du neuf.
+    """
+    options: Dict[str, Any] = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
     }
-)
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        pool_logging_name=name,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_use_lifo=True,  # Les connexions en trop restent inactives et sont recyclées
+    )
+
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if url.get_backend_name() == "postgresql":
+        if is_async:
+            # asyncpg : timeout de connexion et paramètres de session
+            connect_args = {"timeout": 5}
+            if timeout_ms:
+                connect_args["server_settings"] = {"statement_timeout": str(timeout_ms)}
+        else:
+            connect_args = {"connect_timeout": 5}  # Timeout de 5 secondes
+            if timeout_ms:
+                connect_args["options"] = f"-c statement_timeout={timeout_ms}"
+        options["connect_args"] = connect_args
+
+    return options
+
+
+_sync_url = make_url(settings.DATABASE_URL)
+engine = create_engine(_sync_url, **engine_options(_sync_url, "sync"))
+time_checkouts(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_lock = threading.Lock()
+
+
+class _LazyAsyncSessionmaker(async_sessionmaker):
+    """async_sessionmaker dont le moteur est créé à la première session"""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        get_async_engine()
+        return super().__call__(**local_kw)
+
+
+# expire_on_commit=False : les objets restent lisibles après la fin de la session
+AsyncSessionLocal = _LazyAsyncSessionmaker(expire_on_commit=False, autoflush=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Moteur asynchrone, créé au premier appel (pilote asyncpg / aiosqlite importé à ce moment)"""
+    global _async_engine
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                url = make_url(async_database_url())
+                async_engine = create_async_engine(url, **engine_options(url, "async", is_async=True))
+                time_checkouts(async_engine.sync_engine, "async")
+                AsyncSessionLocal.configure(bind=async_engine)
+                _async_engine = async_engine
+    return _async_engine
+
 Base = declarative_base()
 
+# Documents JSON : JSONB sous PostgreSQL (indexable en GIN), JSON ailleurs
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 
 def get_db():
     """
@@ -30,3 +154,39 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency pour obtenir une session asynchrone (routes async)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_status() -> Dict[str, Dict[str, int]]:
+    """Occupation des pools (connexions prêtées, inactives, en surplus)"""
+    status = {}
+    engines = {"sync": engine}
+    if _async_engine is not None:
+        engines["async"] = _async_engine
+    for name, bound in engines.items():
+        pool = bound.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+        }
+    return status
+
+
+def _refresh_pool_metrics() -> None:
+    for name, stats in pool_status().items():
+        for state in ("size", "checked_out", "idle", "overflow"):
+            db_pool_connections.set(stats[state], engine=name, state=state)
+
+
+registry.on_render(_refresh_pool_metrics)
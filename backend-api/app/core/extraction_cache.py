@@ -0,0 +1,116 @@
+"""
+Cache disque du texte extrait des factures (PDF / OCR)
+
+Le texte est indexé par l'empreinte SHA-256 du fichier et la version de
+l'extracteur, puis stocké compressé (gzip). La taille totale est bornée :
+les entrées les moins récemment utilisées sont supprimées en premier.
+"""
+import gzip
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import extraction_cache_requests_total
+
+
+class ExtractionCache:
+    """Cache LRU sur disque, borné en taille"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # Calculée au premier besoin
+
+    def _entry_path(self, content_hash: str, extractor: str) -> Path:
+        """Chemin d'une entrée : <dir>/<2 premiers car.>/<hash>.<extracteur>.txt.gz"""
+        return self.cache_dir / content_hash[:2] / f"{content_hash}.{extractor}.txt.gz"
+
+    def _entries(self):
+        return self.cache_dir.glob("*/*.txt.gz")
+
+    def get(self, content_hash: str, extractor: str) -> Optional[str]:
+        """Retourne le texte en cache ou None"""
+        path = self._entry_path(content_hash, extractor)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrée de cache illisible {path.name}: {e}")
+            return None
+
+        # Marquer l'entrée comme récemment utilisée (ordre d'éviction)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def set(self, content_hash: str, extractor: str, text: str) -> None:
+        """Enregistre le texte extrait (écriture atomique)"""
+        path = self._entry_path(content_hash, extractor)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Écriture du cache d'extraction impossible: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._size += path.stat().st_size
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_or_extract(self, content_hash: str, extractor: str, extract: Callable[[], str]) -> str:
+        """Retourne le texte en cache, sinon l'extrait et le met en cache"""
+        text = self.get(content_hash, extractor)
+        if text is not None:
+            extraction_cache_requests_total.inc(extractor=extractor, result="hit")
+            return text
+
+        extraction_cache_requests_total.inc(extractor=extractor, result="miss")
+        text = extract()
+        if text:
+            self.set(content_hash, extractor, text)
+        return text
+
+    def _evict(self) -> None:
+        """Supprime les entrées les plus anciennes jusqu'à 90% de la taille max"""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+        self._size = total
+
+
+# Cache global
+extraction_cache = ExtractionCache(
+    cache_dir=Path(settings.EXTRACTION_CACHE_DIR),
+    max_bytes=settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024
+)
@@ -0,0 +1,237 @@
+"""
+Passerelle LLM partagée (Groq)
+
+Tous les appels chat-completion du backend passent par ici :
+- un seul client Groq par processus (connexions HTTP keep-alive réutilisées)
+- limitation de débit par seau à jetons (requêtes/min et tokens/min)
+- nouvelles tentatives avec délai exponentiel + gigue, en respectant retry-after
+- instrumentation : latence, tokens, coût, tentatives (métriques + logs structurés)
+"""
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from groq import Groq, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from app.core.config import settings
+from app.core.logger import logger, log_event
+from app.core.metrics import (
+    current_endpoint,
+    llm_requests_total,
+    llm_retries_total,
+    llm_tokens_total,
+    llm_cost_usd_total,
+    llm_latency_seconds,
+)
+
+
+class TokenBucket:
+    """
+    Seau à jetons rempli en continu (capacity jetons par minute)
+
+    Le niveau peut devenir négatif (dette) quand la consommation réelle
+    dépasse l'estimation : les appels suivants attendent en conséquence.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount: float) -> None:
+        """Attend que amount jetons soient disponibles puis les consomme"""
+        amount = min(amount, self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                self._cond.wait((amount - self.level) / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """Corrige la consommation après coup (delta > 0 : consommé en plus)"""
+        with self._cond:
+            self._refill()
+            self.level -= delta
+            self._cond.notify_all()
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Estimation grossière : ~4 caractères par token"""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + settings.LLM_COMPLETION_TOKENS_ESTIMATE
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Délai demandé par l'API (en-têtes retry-after / retry-after-ms)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+class LLMGateway:
+    """Point d'entrée unique pour les appels chat-completion"""
+
+    def __init__(self):
+        self._client: Optional[Groq] = None
+        self._client_lock = threading.Lock()
+        self.requests = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(settings.LLM_TOKENS_PER_MINUTE)
+
+    @property
+    def client(self) -> Groq:
+        """Client Groq partagé (créé au premier appel)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = Groq(
+                        api_key=settings.GROQ_API_KEY,
+                        max_retries=0,  # Les tentatives sont gérées ici
+                        http_client=httpx.Client(
+                            timeout=settings.LLM_TIMEOUT_SECONDS,
+                            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+                        )
+                    )
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        """Délai exponentiel avec gigue complète, plafonné"""
+        delay = min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    def chat_completion(
+        self,
+        messages: List[Dict],
+        model: Optional[str] = None,
+        agent: str = "backend",
+        **kwargs
+    ):
+        """
+        Appel chat-completion limité en débit et retenté si nécessaire
+
+        Args:
+            messages: Messages (system / user)
+            model: Modèle (MODEL_NAME_analyse par défaut)
+            agent: Nom de l'agent appelant (métriques, logs)
+            **kwargs: Paramètres transmis à l'API (response_format, ...)
+
+        Returns:
+            Réponse brute de l'API
+        """
+        model = model or settings.MODEL_NAME_analyse
+        estimated = estimate_tokens(messages)
+        labels = {"agent": agent, "endpoint": current_endpoint.get(), "model": model}
+        started = time.monotonic()
+
+        attempt = 0
+        while True:
+            self.requests.acquire(1)
+            self.tokens.acquire(estimated)
+
+            try:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **kwargs
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt >= settings.LLM_MAX_RETRIES:
+                    self._record_failure(labels, started, attempt, e)
+                    raise
+
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                attempt += 1
+
+                llm_retries_total.inc(reason=type(e).__name__, **labels)
+                logger.warning(
+                    f"LLM call ({agent}) failed with {type(e).__name__}, "
+                    f"retry {attempt}/{settings.LLM_MAX_RETRIES} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+            except Exception as e:
+                self._record_failure(labels, started, attempt, e)
+                raise
+
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                self.tokens.adjust(usage.total_tokens - estimated)
+
+            self._record_success(labels, started, attempt, usage)
+            return response
+
+    def _record_success(self, labels: Dict, started: float, retries: int, usage) -> None:
+        """Métriques et log structuré d'un appel réussi"""
+        latency = time.monotonic() - started
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        cost = (
+            prompt_tokens * settings.LLM_PRICE_INPUT_PER_MTOK
+            + completion_tokens * settings.LLM_PRICE_OUTPUT_PER_MTOK
+        ) / 1_000_000
+
+        llm_requests_total.inc(status="ok", **labels)
+        llm_latency_seconds.observe(latency, **labels)
+        llm_tokens_total.inc(prompt_tokens, kind="prompt", **labels)
+        llm_tokens_total.inc(completion_tokens, kind="completion", **labels)
+        llm_tokens_total.inc(cached_tokens, kind="cached", **labels)
+        llm_cost_usd_total.inc(cost, **labels)
+
+        log_event(
+            "llm_call",
+            status="ok",
+            latency_ms=round(latency * 1000),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            retries=retries,
+            cost_usd=round(cost, 6),
+            **labels
+        )
+
+    def _record_failure(self, labels: Dict, started: float, retries: int, error: Exception) -> None:
+        """Métriques et log structuré d'un appel en échec"""
+        latency = time.monotonic() - started
+        llm_requests_total.inc(status="error", **labels)
+        llm_latency_seconds.observe(latency, **labels)
+        log_event(
+            "llm_call",
+            level=logging.WARNING,
+            status="error",
+            error=type(error).__name__,
+            latency_ms=round(latency * 1000),
+            retries=retries,
+            **labels
+        )
+
+
+# Passerelle globale
+llm_gateway = LLMGateway()
@@ -1,6 +1,7 @@
 """
 Configuration du système de logging
 """
+import json
 import logging
 import sys
 from pathlib import Path
@@ -50,3 +51,15 @@ def setup_logger(name: str = "billz") -> logging.Logger:
 # Logger global
 logger = setup_logger()
 
+
+
+def log_event(event: str, level: int = logging.INFO, **fields) -> None:
+    """
+    Log structuré : une ligne JSON {"event": ..., champs...}
+    
+    Args:
+        event: Nom de l'événement (ex: "llm_call")
+        level: Niveau de log
+        **fields: Champs additionnels (sérialisables en JSON)
+    """
+    logger.log(level, json.dumps({"event": event, **fields}, ensure_ascii=False, default=str))
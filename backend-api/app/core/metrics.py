@@ -0,0 +1,187 @@
+"""
+Métriques au format Prometheus (exposition texte) et contexte d'appel
+
+Registre minimal en mémoire (compteurs, jauges, histogrammes avec labels),
+exposé par GET /metrics. Le contexte d'appel (endpoint HTTP ou tâche de
+fond) est propagé par une ContextVar pour attribuer les coûts LLM.
+"""
+import threading
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Tuple
+
+
+# Endpoint ou tâche à l'origine de l'appel en cours (ex: "POST /api/transactions/reconcile-all")
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="-")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # clé -> (compteurs par bucket, somme, nombre)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(c), s, n)) for key, (c, s, n) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {bucket_count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exposées"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._refreshers: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def on_render(self, refresher: Callable[[], None]) -> None:
+        """Fonction appelée avant chaque rendu (jauges lues à la demande)"""
+        self._refreshers.append(refresher)
+
+    def render(self) -> str:
+        for refresher in self._refreshers:
+            refresher()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# --- Appels LLM ---
+LLM_LABELS = ("agent", "endpoint", "model")
+
+llm_requests_total = registry.register(Counter(
+    "billz_llm_requests_total", "Appels chat-completion", LLM_LABELS + ("status",)
+))
+llm_retries_total = registry.register(Counter(
+    "billz_llm_retries_total", "Nouvelles tentatives d'appels LLM", LLM_LABELS + ("reason",)
+))
+llm_tokens_total = registry.register(Counter(
+    "billz_llm_tokens_total", "Tokens consommés", LLM_LABELS + ("kind",)
+))
+llm_cost_usd_total = registry.register(Counter(
+    "billz_llm_cost_usd_total", "Coût estimé des appels LLM (USD)", LLM_LABELS
+))
+llm_latency_seconds = registry.register(Histogram(
+    "billz_llm_latency_seconds", "Durée des appels LLM (tentatives comprises)", LLM_LABELS
+))
+llm_structured_output_total = registry.register(Counter(
+    "billz_llm_structured_output_total",
+    "Sorties JSON des agents (ok, repaired, reasked, degraded, failed)",
+    ("agent", "outcome")
+))
+
+# --- Cache d'extraction ---
+extraction_cache_requests_total = registry.register(Counter(
+    "billz_extraction_cache_requests_total", "Accès au cache d'extraction", ("extractor", "result")
+))
+
+# --- Cache de l'utilisateur authentifié ---
+auth_cache_requests_total = registry.register(Counter(
+    "billz_auth_cache_requests_total", "Accès au cache de l'utilisateur authentifié", ("result",)
+))
+
+# --- Extraction locale par règles ---
+local_extraction_total = registry.register(Counter(
+    "billz_local_extraction_total", "Factures extraites sans LLM (accepted, profile) ou transmises au LLM (fallback)", ("result",)
+))
+
+# --- Pool de connexions à la base ---
+db_pool_connections = registry.register(Gauge(
+    "billz_db_pool_connections", "Connexions du pool (checked_out, idle, overflow) et taille configurée (size)", ("engine", "state")
+))
+db_pool_checkout_wait_seconds = registry.register(Histogram(
+    "billz_db_pool_checkout_wait_seconds", "Attente pour obtenir une connexion du pool (ouverture comprise)", ("engine",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+))
+db_pool_timeouts_total = registry.register(Counter(
+    "billz_db_pool_timeouts_total", "Demandes de connexion abandonnées (pool saturé)", ("engine",)
+))
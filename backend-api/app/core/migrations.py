@@ -0,0 +1,51 @@
+"""
+Migrations du schéma (Alembic)
+
+Remplace Base.metadata.create_all : le schéma est versionné dans
+backend-api/migrations/versions et appliqué au déploiement, avant le
+lancement de l'API et des workers, depuis backend-api/ : alembic upgrade head.
+AUTO_MIGRATE=True l'applique au démarrage de l'API (développement, un seul
+processus : chaque worker uvicorn/gunicorn exécuterait sinon le DDL).
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from app.core.logger import logger
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Révision correspondant au schéma créé par create_all avant les migrations
+BASELINE_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    return config
+
+
+def upgrade_database(engine: Engine) -> None:
+    """
+    Met la base au niveau de la dernière révision
+
+    Une base créée par create_all (tables présentes, pas de table
+    alembic_version) est d'abord marquée à la révision initiale.
+    """
+    config = alembic_config()
+
+    with engine.connect() as connection:
+        tables = inspect(connection).get_table_names()
+
+    # Connexion sans transaction ouverte : Alembic gère une transaction par migration
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+
+        if "alembic_version" not in tables and "users" in tables:
+            logger.info(f"Existing schema without migrations: stamping revision {BASELINE_REVISION}")
+            command.stamp(config, BASELINE_REVISION)
+
+        command.upgrade(config, "head")
@@ -0,0 +1,69 @@
+"""
+Pagination par curseur (keyset)
+
+Les listes sont triées sur une clé unique (colonne de tri, id) décroissante.
+Le curseur encode la clé de la dernière ligne renvoyée ; la page suivante
+reprend avec WHERE (tri, id) < (valeur, id), servi par un index
+(user_id, tri, id) : le coût d'une page ne dépend pas de sa profondeur,
+contrairement à OFFSET.
+
+Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor
+(absent sur la dernière page) ; le corps reste la liste des éléments.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Taille des lots lus par curseur côté serveur (exports)
+STREAM_BATCH_SIZE = 1000
+
+
+def encode_cursor(*values: Any) -> str:
+    """Curseur opaque à partir de la clé de tri (dates en ISO 8601)"""
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> Tuple:
+    """
+    Décode un curseur ; chaque valeur passe par le parser correspondant
+    (ex. date.fromisoformat, int). ValueError si le curseur est invalide.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except Exception:
+        raise ValueError("Curseur de pagination invalide")
+
+
+def keyset_page(query: Select, sort_column, id_column, after: Optional[Tuple], limit: int) -> Select:
+    """
+    Page suivante d'une requête triée par (sort_column, id_column) décroissants
+
+    Une ligne de plus que limit est demandée pour savoir s'il reste une page.
+    """
+    if after is not None:
+        query = query.where(tuple_(sort_column, id_column) < tuple_(*after))
+    return query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int, key: Callable[[Any], Tuple]) -> Tuple[List, Optional[str]]:
+    """Retire la ligne de contrôle et calcule le curseur de la page suivante"""
+    items = list(rows[:limit])
+    if len(rows) <= limit:
+        return items, None
+    return items, encode_cursor(*key(items[-1]))
@@ -0,0 +1,151 @@
+"""
+Cache de l'utilisateur authentifié (principal)
+
+get_current_user chargeait l'utilisateur en base à chaque requête
+authentifiée. Les champs utiles (id, email, nom, is_active, création) sont
+gardés quelques secondes, indexés par le sujet du token (email) : les
+tableaux de bord qui interrogent l'API en boucle n'ont plus cette requête.
+
+Par défaut le cache est local au processus ; avec AUTH_CACHE_REDIS_URL il
+est partagé par tous les processus (paquet redis requis), et une
+invalidation (modification, désactivation) s'applique partout
+immédiatement. Sans Redis, les autres processus voient le changement au
+plus tard après AUTH_CACHE_TTL_SECONDS.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import auth_cache_requests_total
+from app.models.user import User
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # redis absent : cache local uniquement
+    redis_asyncio = None
+
+# Champs du principal (ceux de UserResponse)
+PRINCIPAL_FIELDS = ("id", "email", "full_name", "is_active", "created_at")
+
+
+def principal_from_user(user: User) -> Dict:
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "is_active": user.is_active,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+def user_from_principal(principal: Dict) -> User:
+    """User détaché (hors session) reconstruit depuis le cache, en lecture seule"""
+    created_at = principal.get("created_at")
+    return User(
+        **{field: principal.get(field) for field in PRINCIPAL_FIELDS if field != "created_at"},
+        created_at=datetime.fromisoformat(created_at) if created_at else None
+    )
+
+
+class _LocalBackend:
+    """Dict LRU borné, expiration à la lecture"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    async def set(self, key: str, principal: Dict, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class _RedisBackend:
+    """Entrées JSON avec expiration Redis (SETEX)"""
+
+    PREFIX = "billz:principal:"
+
+    def __init__(self, url: str):
+        self._client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        raw = await self._client.get(self.PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, principal: Dict, ttl: int) -> None:
+        await self._client.setex(self.PREFIX + key, ttl, json.dumps(principal))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self.PREFIX + key)
+
+
+class PrincipalCache:
+    """Cache du principal par sujet de token ; TTL à 0 = désactivé"""
+
+    def __init__(self, ttl: int, max_entries: int, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        if redis_url and redis_asyncio is None:
+            logger.warning("AUTH_CACHE_REDIS_URL défini mais le paquet redis est absent : cache local")
+        self.backend = (
+            _RedisBackend(redis_url) if redis_url and redis_asyncio is not None
+            else _LocalBackend(max_entries)
+        )
+
+    async def get(self, subject: str) -> Optional[User]:
+        if self.ttl <= 0:
+            return None
+        try:
+            principal = await self.backend.get(subject)
+        except Exception as e:
+            # Cache indisponible : on retombe sur la base
+            logger.warning(f"Cache des utilisateurs indisponible: {e}")
+            principal = None
+
+        auth_cache_requests_total.inc(result="hit" if principal else "miss")
+        return user_from_principal(principal) if principal else None
+
+    async def set(self, subject: str, user: User) -> None:
+        if self.ttl <= 0:
+            return
+        try:
+            await self.backend.set(subject, principal_from_user(user), self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache des utilisateurs indisponible: {e}")
+
+    async def invalidate(self, subject: str) -> None:
+        """À appeler après toute modification ou désactivation de l'utilisateur"""
+        try:
+            await self.backend.delete(subject)
+        except Exception as e:
+            logger.error(f"Invalidation du cache utilisateur impossible ({subject}): {e}")
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    redis_url=settings.AUTH_CACHE_REDIS_URL
+)
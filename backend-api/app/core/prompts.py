@@ -0,0 +1,74 @@
+"""
+Templates de prompts et contextes des agents, préchargés en mémoire
+
+Les fichiers (Agent_banque/prompt.txt, agent_factures/context.txt, ...)
+sont lus une seule fois puis gardés en mémoire. Leur date de modification
+est revérifiée au plus toutes les RELOAD_CHECK_SECONDS : un fichier
+modifié est rechargé sans redémarrer l'API.
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+from app.core.logger import logger
+
+
+# Racine du dépôt (contient Agent_banque/, agent_factures/, Agent_optimisation/)
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+RELOAD_CHECK_SECONDS = 2.0
+
+
+class PromptStore:
+    """Cache des fichiers texte des agents, rechargés à chaud"""
+
+    def __init__(self, root: Path = PROJECT_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+        # chemin relatif -> (contenu, mtime, dernière vérification)
+        self._entries: Dict[str, Tuple[str, float, float]] = {}
+
+    def get(self, relative_path: str, default: str) -> str:
+        """
+        Retourne le contenu du fichier (ou default s'il est illisible)
+
+        Args:
+            relative_path: Chemin depuis la racine du dépôt
+            default: Valeur de repli
+        """
+        now = time.monotonic()
+        entry = self._entries.get(relative_path)
+        if entry and now - entry[2] < RELOAD_CHECK_SECONDS:
+            return entry[0]
+
+        with self._lock:
+            path = self.root / relative_path
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                return default
+
+            entry = self._entries.get(relative_path)
+            if entry and entry[1] == mtime:
+                self._entries[relative_path] = (entry[0], mtime, now)
+                return entry[0]
+
+            try:
+                content = path.read_text(encoding='utf-8')
+            except Exception:
+                return entry[0] if entry else default
+
+            if entry:
+                logger.info(f"Prompt reloaded: {relative_path}")
+            self._entries[relative_path] = (content, mtime, now)
+            return content
+
+    def preload(self, *relative_paths: str) -> None:
+        """Charge les fichiers à l'avance (au démarrage)"""
+        for relative_path in relative_paths:
+            self.get(relative_path, default="")
+
+
+# Store global
+prompt_store = PromptStore()
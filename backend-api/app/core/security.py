@@ -1,14 +1,26 @@
 """
 Sécurité : JWT, hashing passwords
+
+bcrypt est volontairement lent (~100-300 ms par calcul) : le hachage et la
+vérification tournent dans un pool de threads dédié (bcrypt libère le GIL),
+borné à PASSWORD_HASH_WORKERS calculs simultanés. Une rafale de connexions
+attend dans ce pool sans bloquer la boucle d'événements ni le pool de
+threads partagé des routes def.
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-# Context pour hasher les mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Context pour hasher les mots de passe. Un hash créé avec un autre coût
+# (BCRYPT_ROUNDS modifié) ou un schéma obsolète est signalé par
+# verify_and_update, pour être recalculé à la connexion suivante.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -21,6 +33,23 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifier un mot de passe dans le pool de hachage
+
+    Returns:
+        (valide, nouveau hash à enregistrer si les paramètres de coût ont changé, sinon None)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    """Hasher un mot de passe dans le pool de hachage"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_pool, pwd_context.hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Créer un token JWT"""
     to_encode = data.copy()
@@ -0,0 +1,62 @@
+"""
+Sérialisation JSON rapide des listes
+
+Les listes de factures et de transactions ne passent pas par les modèles
+Pydantic : les colonnes demandées sont lues en tuples, converties en dict
+et encodées directement. orjson est utilisé s'il est installé (dates et
+datetimes gérés nativement) ; sinon repli sur json.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Optional, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson absent : module json de la bibliothèque standard
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type non sérialisable en JSON : {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON encodée par orjson (ou json en repli)
+
+    Sous-classe de JSONResponse : le schéma de response_model reste publié
+    dans OpenAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str], default: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Champs demandés par ?fields=a,b,c (défaut si absent)
+
+    Raises:
+        ValueError: champ inconnu
+    """
+    if not fields:
+        return tuple(default)
+
+    requested = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in allowed]
+    if unknown or not requested:
+        raise ValueError(f"Champs inconnus : {', '.join(unknown) or fields}")
+    return requested
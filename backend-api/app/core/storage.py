@@ -2,7 +2,9 @@
 Gestion du stockage local des fichiers PDF
 """
 from pathlib import Path
+import hashlib
 import shutil
+import uuid
 from typing import BinaryIO
 from datetime import datetime
 
@@ -16,6 +18,16 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 INVOICES_DIR.mkdir(exist_ok=True)
 
 
+def compute_content_hash(data: bytes) -> str:
+    """
+    Calculer l'empreinte SHA-256 du contenu d'un fichier
+    
+    Deux pièces jointes identiques (transférées, en copie, INBOX + SENT)
+    ont la même empreinte, ce qui permet de les dédupliquer.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
 def save_invoice_pdf(user_id: int, filename: str, file_content: BinaryIO) -> dict:
     """
     Sauvegarder un PDF de facture localement
@@ -32,10 +44,11 @@ def save_invoice_pdf(user_id: int, filename: str, file_content: BinaryIO) -> dic
     user_dir = INVOICES_DIR / f"user_{user_id}"
     user_dir.mkdir(parents=True, exist_ok=True)
     
-    # Générer nom unique avec timestamp
+    # Générer nom unique avec timestamp (+ suffixe aléatoire : deux envois du même
+    # fichier dans la même seconde ne partagent pas le chemin, qui peut être supprimé)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     file_extension = Path(filename).suffix
-    safe_filename = f"{Path(filename).stem}_{timestamp}{file_extension}"
+    safe_filename = f"{Path(filename).stem}_{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
     
     # Chemin complet
     file_path = user_dir / safe_filename
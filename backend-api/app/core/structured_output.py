@@ -0,0 +1,227 @@
+"""
+Validation des sorties JSON des agents, avec réparation locale
+
+Étapes, de la moins coûteuse à la plus coûteuse :
+1. json.loads direct
+2. réparation locale : blocs ```json, texte autour de l'objet, virgules
+   finales, littéraux Python (True/None), objet tronqué refermé
+3. validation Pydantic avec coercition des types (app/schemas/llm_output.py)
+4. si des clés obligatoires manquent ou restent invalides : une seule
+   relance ciblée qui ne demande QUE ces clés, fusionnée avec le reste
+
+Le résultat n'est None que si aucun objet JSON n'a pu être obtenu.
+"""
+import json
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.core.logger import logger, log_event
+from app.core.metrics import llm_structured_output_total
+from app.schemas.llm_output import required_fields
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _outside_strings(text: str, transform: Callable[[str], str]) -> str:
+    """Applique transform aux portions de texte hors chaînes JSON"""
+    parts = re.split(r'("(?:\\.|[^"\\])*")', text)
+    return "".join(part if i % 2 else transform(part) for i, part in enumerate(parts))
+
+
+def _close_truncated(text: str) -> str:
+    """Referme une chaîne, des tableaux et des objets laissés ouverts (réponse tronquée)"""
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    # Clé sans valeur en fin de texte ("montant":) -> valeur nulle
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+
+def repair_json(raw: Optional[str]) -> Tuple[Optional[Dict], bool]:
+    """
+    Décode un objet JSON en tolérant les défauts courants des LLM
+
+    Returns:
+        (objet ou None, True si une réparation a été nécessaire)
+    """
+    if not raw or not raw.strip():
+        return None, False
+
+    try:
+        data = json.loads(raw)
+        return (data, False) if isinstance(data, dict) else (None, False)
+    except ValueError:
+        pass
+
+    text = raw.strip()
+    fence = _FENCE_RE.search(text)
+    if fence:
+        text = fence.group(1).strip()
+
+    start = text.find("{")
+    if start == -1:
+        return None, True
+    text = _outside_strings(
+        text[start:],
+        lambda part: re.sub(r"\b(True|False|None)\b", lambda m: _PY_LITERALS[m.group(1)], part)
+    )
+
+    # Objet complet suivi de texte, puis objet tronqué à refermer
+    candidates = []
+    end = text.rfind("}")
+    if end != -1:
+        candidates.append(text[:end + 1])
+    candidates.append(_close_truncated(text))
+
+    for candidate in candidates:
+        candidate = _outside_strings(candidate, lambda part: _TRAILING_COMMA_RE.sub(r"\1", part))
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data, True
+    return None, True
+
+
+def _validate(model: Type[BaseModel], data: Dict) -> Tuple[Dict, List[str]]:
+    """
+    Valide data ; les champs de premier niveau invalides sont retirés
+
+    Returns:
+        (données validées, champs invalides)
+    """
+    invalid: List[str] = []
+    data = dict(data)
+    while True:
+        try:
+            return model.model_validate(data).model_dump(), invalid
+        except ValidationError as e:
+            fields = {str(err["loc"][0]) for err in e.errors() if err["loc"]}
+            fields &= set(data)
+            if not fields:
+                raise
+            for field in fields:
+                data.pop(field)
+            invalid.extend(sorted(fields))
+
+
+def _reask_messages(messages: List[Dict], raw: Optional[str], fields: List[str]) -> List[Dict]:
+    """Messages de relance : même conversation + demande limitée aux clés manquantes"""
+    keys = ", ".join(f'"{field}"' for field in fields)
+    return messages + [
+        {"role": "assistant", "content": raw or ""},
+        {
+            "role": "user",
+            "content": (
+                f"Ta réponse est incomplète ou invalide pour les clés suivantes : {keys}. "
+                f"Renvoie UNIQUEMENT un objet JSON contenant ces clés (null si la donnée est absente), "
+                f"au même format que demandé, sans les autres clés."
+            )
+        }
+    ]
+
+
+def parse_structured(
+    raw: Optional[str],
+    model: Type[BaseModel],
+    agent: str,
+    reask: Optional[Callable[[List[Dict]], Optional[str]]] = None,
+    messages: Optional[List[Dict]] = None
+) -> Optional[Dict]:
+    """
+    Valide la réponse d'un agent contre son schéma
+
+    Args:
+        raw: Contenu brut de la réponse
+        model: Schéma Pydantic attendu
+        agent: Nom de l'agent (métriques, logs)
+        reask: Fonction de relance (messages -> contenu brut), optionnelle
+        messages: Messages de l'appel initial (contexte de la relance)
+
+    Returns:
+        dict validé (champs manquants à leur valeur par défaut) ou None
+    """
+    data, repaired = repair_json(raw)
+    required = required_fields(model)
+
+    invalid: List[str] = []
+    validated: Optional[Dict] = None
+    if data is not None:
+        try:
+            validated, invalid = _validate(model, data)
+        except ValidationError:
+            validated, invalid = None, list(required)
+
+    missing = [field for field in required if data is None or field not in data]
+    to_reask = sorted(set(missing) | set(invalid), key=lambda f: (f not in required, f))
+
+    outcome = "repaired" if repaired else "ok"
+    if to_reask and reask is not None and messages is not None:
+        extra, _ = repair_json(reask(_reask_messages(messages, raw, to_reask)))
+        if extra:
+            merged = {**(data or {}), **{k: v for k, v in extra.items() if k in to_reask}}
+            try:
+                validated, invalid = _validate(model, merged)
+                data = merged
+                outcome = "reasked"
+            except ValidationError:
+                pass
+            missing = [field for field in required if field not in merged]
+
+    if validated is None:
+        llm_structured_output_total.inc(agent=agent, outcome="failed")
+        log_event("llm_structured_output", level=logging.WARNING, agent=agent, outcome="failed")
+        logger.warning(f"Sortie JSON inexploitable ({agent}): {str(raw)[:200]!r}")
+        return None
+
+    if missing or invalid:
+        outcome = "degraded"
+    llm_structured_output_total.inc(agent=agent, outcome=outcome)
+    if outcome != "ok":
+        log_event(
+            "llm_structured_output",
+            agent=agent,
+            outcome=outcome,
+            missing=missing,
+            invalid=invalid
+        )
+    return validated
+
+
+def reask_with(gateway, agent: str, **kwargs) -> Callable[[List[Dict]], Optional[str]]:
+    """Fonction de relance passant par la passerelle LLM (mêmes paramètres d'appel)"""
+    def _reask(messages: List[Dict]) -> Optional[str]:
+        try:
+            response = gateway.chat_completion(agent=agent, messages=messages, **kwargs)
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.warning(f"Relance JSON échouée ({agent}): {e}")
+            return None
+    return _reask
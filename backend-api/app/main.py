@@ -1,22 +1,34 @@
 """
 Point d'entrée principal de l'API FastAPI
 """
-from fastapi import FastAPI
+import hmac
+
+from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, pool_status
+from app.core.migrations import upgrade_database
 from app.core.logger import logger
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.prompts import prompt_store
+from app.core.metrics import registry, current_endpoint
 from app.api import auth, invoices, transactions, optimisation
-from app.models import User, Invoice, Transaction  # Import pour créer les tables
+from app.worker import Worker
 
-# Créer les tables PostgreSQL
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("PostgreSQL database connected and tables created")
-except Exception as e:
-    logger.warning(f"Could not connect to PostgreSQL: {e}")
-    logger.warning("The API will start but database operations will fail")
+# Migrations du schéma : étape de déploiement (alembic upgrade head), ou au
+# démarrage si AUTO_MIGRATE (un seul processus). Un échec arrête le démarrage :
+# l'API ne tourne jamais sur un schéma à moitié migré.
+if settings.AUTO_MIGRATE:
+    try:
+        upgrade_database(engine)
+    except Exception as e:
+        logger.error(f"Database migration failed: {e}")
+        raise
+    logger.info("Database migrations applied")
 
 # Application FastAPI
 app = FastAPI(
@@ -33,8 +45,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Compression des réponses au-delà de COMPRESSION_MIN_SIZE octets (listes,
+# rapprochements, exports en flux) : brotli si brotli-asgi est installé et
+# accepté par le client, gzip sinon
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+if BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware,
+        quality=settings.BROTLI_QUALITY,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_fallback=True
+    )
+else:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        compresslevel=settings.GZIP_LEVEL
+    )
+
+@app.middleware("http")
+async def bind_endpoint_context(request: Request, call_next):
+    """Associe les appels LLM de la requête à son endpoint (gabarit de route)"""
+    endpoint = request.url.path
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            endpoint = getattr(route, "path", endpoint)
+            break
+    
+    token = current_endpoint.set(f"{request.method} {endpoint}")
+    try:
+        return await call_next(request)
+    finally:
+        current_endpoint.reset(token)
+
+
 # Routes
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(invoices.router, prefix="/api/invoices", tags=["Invoices"])
@@ -42,6 +94,38 @@ app.include_router(transactions.router, prefix="/api/transactions", tags=["Trans
 app.include_router(optimisation.router, prefix="/api/optimisation", tags=["Optimisation"])
 
 
+# Worker intégré (développement) : en production, lancer python -m app.worker
+embedded_worker = Worker(
+    concurrency=settings.SCAN_WORKERS,
+    poll_seconds=settings.WORKER_POLL_SECONDS
+)
+
+
+@app.on_event("startup")
+def start_embedded_worker():
+    if settings.RUN_EMBEDDED_WORKER:
+        embedded_worker.start()
+
+
+@app.on_event("startup")
+def preload_prompts():
+    # Prompts et contextes des agents gardés en mémoire (rechargés si modifiés)
+    prompt_store.preload(
+        "agent_factures/context.txt",
+        "agent_factures/prompt.txt",
+        "Agent_banque/context_envoi.txt",
+        "Agent_banque/context_reception.txt",
+        "Agent_banque/prompt.txt",
+        "Agent_optimisation/context.txt",
+        "Agent_optimisation/prompt.txt",
+    )
+
+
+@app.on_event("shutdown")
+def stop_embedded_worker():
+    embedded_worker.request_stop()
+
+
 @app.get("/")
 async def root():
     return {
@@ -55,3 +139,33 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+
+def require_metrics_token(request: Request) -> None:
+    """
+    Points internes (métriques, pools) : jeton METRICS_TOKEN obligatoire
+
+    Sans METRICS_TOKEN configuré, ils n'existent pas (404) ; seul /health
+    (liveness) est public.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+@app.get("/health/db", dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+async def database_pool_status():
+    """Occupation des pools de connexions (dimensionnement face à max_connections)"""
+    return pool_status()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+async def metrics():
+    """Métriques au format Prometheus (appels LLM, cache d'extraction, pool de connexions)"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
@@ -4,6 +4,9 @@ Modèles SQLAlchemy
 from app.models.user import User
 from app.models.invoice import Invoice
 from app.models.transaction import Transaction
+from app.models.job import Job
+from app.models.supplier_profile import SupplierProfile
+from app.models import data_version  # noqa: F401  (écoute des écritures)
 
-__all__ = ["User", "Invoice", "Transaction"]
+__all__ = ["User", "Invoice", "Transaction", "Job", "SupplierProfile"]
 
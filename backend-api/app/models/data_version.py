@@ -0,0 +1,45 @@
+"""
+Version des données de chaque utilisateur
+
+À chaque flush qui crée, modifie ou supprime des factures ou des
+transactions, users.data_version est incrémenté (et data_updated_at mis à
+l'heure) pour les utilisateurs concernés, dans la même transaction. Les
+routes de lecture s'en servent comme ETag / Last-Modified : un tableau de
+bord qui interroge l'API sans que rien n'ait changé reçoit un 304 sans que
+les listes ni les agrégats soient recalculés.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+from app.models.user import User
+
+VERSIONED_MODELS = (Invoice, Transaction)
+
+
+def _changed_user_ids(session: Session) -> set:
+    user_ids = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, VERSIONED_MODELS):
+            user_ids.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj, include_collections=False):
+            user_ids.add(obj.user_id)
+    user_ids.discard(None)
+    return user_ids
+
+
+@event.listens_for(Session, "after_flush")
+def bump_data_version(session: Session, flush_context) -> None:
+    user_ids = _changed_user_ids(session)
+    if not user_ids:
+        return
+
+    session.connection().execute(
+        update(User.__table__)
+        .where(User.__table__.c.id.in_(sorted(user_ids)))
+        .values(data_version=User.__table__.c.data_version + 1, data_updated_at=datetime.now(timezone.utc))
+    )
@@ -1,13 +1,33 @@
 """
 Modèle Invoice pour stocker les factures extraites
 """
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, JSON, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Index, UniqueConstraint, event
 from sqlalchemy.sql import func
-from app.core.database import Base
+from app.core.database import Base, JSONDocument
+from app.schemas.llm_output import coerce_amount
 
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Un même fichier (même contenu) n'est stocké qu'une fois par utilisateur
+        UniqueConstraint("user_id", "content_hash", name="uq_invoices_user_content_hash"),
+        # Filtres par utilisateur les plus fréquents (migration 0002)
+        Index("ix_invoices_user_email", "user_id", "email_id", postgresql_include=["content_hash"]),
+        Index("ix_invoices_user_type", "user_id", "invoice_type"),
+        # Colonnes typées (migration 0003) : filtres par fournisseur et par montant
+        Index("ix_invoices_user_supplier", "user_id", "supplier_name"),
+        Index("ix_invoices_user_ttc", "user_id", "amount_ttc"),
+        # Pagination par curseur sur (created_at, id) (migration 0004)
+        Index("ix_invoices_user_created_id", "user_id", "created_at", "id"),
+        # Recherche par contenu du fournisseur (SIRET, TVA) : GIN, PostgreSQL uniquement
+        Index(
+            "ix_invoices_supplier_gin", "supplier",
+            postgresql_using="gin",
+            postgresql_ops={"supplier": "jsonb_path_ops"},
+            info={"dialect": "postgresql"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -18,19 +38,25 @@ class Invoice(Base):
     due_date = Column(Date, nullable=True)
     
     # Fournisseur (JSON)
-    supplier = Column(JSON, nullable=False)  # {name, siret, vat}
+    supplier = Column(JSONDocument, nullable=False)  # {name, siret, vat}
     
     # Client (JSON)
-    client = Column(JSON, nullable=False)  # {name, siret, vat}
+    client = Column(JSONDocument, nullable=False)  # {name, siret, vat}
     
     # Montants (JSON)
-    amounts = Column(JSON, nullable=False)  # {ht, tva, tva_rate, ttc, currency}
+    amounts = Column(JSONDocument, nullable=False)  # {ht, tva, tva_rate, ttc, currency}
+    
+    # Copies typées de supplier/amounts (tenues à jour à l'enregistrement)
+    supplier_name = Column(String, nullable=True)
+    amount_ttc = Column(Float, nullable=True)
+    amount_tva = Column(Float, nullable=True)
+    currency = Column(String(3), nullable=True)
     
     # Catégorie
     category = Column(String, nullable=True)
     
     # Anomalies détectées (JSON array)
-    anomalies = Column(JSON, nullable=True, default=[])
+    anomalies = Column(JSONDocument, nullable=True, default=[])
     
     # Confiance de l'extraction
     confidence_global = Column(Float, default=0.0)
@@ -38,6 +64,7 @@ class Invoice(Base):
     # Fichier PDF
     file_path = Column(String, nullable=False)  # Chemin relatif du PDF
     file_name = Column(String, nullable=False)  # Nom original
+    content_hash = Column(String(64), nullable=True)  # SHA-256 du fichier (déduplication)
     
     # Email source
     email_id = Column(String, nullable=True)  # ID email Gmail
@@ -54,3 +81,32 @@ class Invoice(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
 
+
+def _amount(value):
+    try:
+        return coerce_amount(value)
+    except ValueError:
+        return None
+
+
+def typed_columns(supplier, amounts) -> dict:
+    """Valeurs des colonnes typées à partir des documents JSON supplier / amounts"""
+    supplier = supplier if isinstance(supplier, dict) else {}
+    amounts = amounts if isinstance(amounts, dict) else {}
+    
+    name = str(supplier.get("name") or "").strip()
+    currency = str(amounts.get("currency") or "EUR").strip().upper().replace("€", "EUR")
+    
+    return {
+        "supplier_name": name or None,
+        "amount_ttc": _amount(amounts.get("ttc")),
+        "amount_tva": _amount(amounts.get("tva")),
+        "currency": currency[:3] or "EUR",
+    }
+
+
+@event.listens_for(Invoice, "before_insert")
+@event.listens_for(Invoice, "before_update")
+def sync_typed_columns(mapper, connection, invoice: Invoice) -> None:
+    for key, value in typed_columns(invoice.supplier, invoice.amounts).items():
+        setattr(invoice, key, value)
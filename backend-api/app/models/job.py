@@ -0,0 +1,52 @@
+"""
+Modèle Job pour la file de tâches persistante (scans Gmail, ré-analyses)
+"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index, text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Un seul job actif (en attente ou en cours) par utilisateur et par type
+        Index(
+            "uq_jobs_active_per_user",
+            "user_id", "kind",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Type de tâche et paramètres
+    kind = Column(String, nullable=False)  # gmail_scan / invoice_reanalysis
+    payload = Column(JSON, nullable=True)
+
+    # État : queued / running / succeeded / failed
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+
+    # Verrou du worker qui exécute la tâche
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Résultat
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
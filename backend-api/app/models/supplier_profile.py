@@ -0,0 +1,37 @@
+"""
+Modèle SupplierProfile : mise en page apprise d'un fournisseur
+
+Construit à partir des factures validées (is_validated) : pour chaque champ,
+le libellé qui précède la valeur dans le texte extrait du PDF. Les factures
+suivantes du même fournisseur sont alors lues sans appel au LLM.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class SupplierProfile(Base):
+    __tablename__ = "supplier_profiles"
+    __table_args__ = (
+        # Un profil par fournisseur (SIRET, sinon TVA intracommunautaire) et par utilisateur
+        UniqueConstraint("user_id", "supplier_key", name="uq_supplier_profiles_user_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Identification du fournisseur
+    supplier_key = Column(String, nullable=False)  # "siret:<14 chiffres>" ou "vat:<FR...>"
+    supplier = Column(JSON, nullable=False)  # {name, siret, vat} validés
+    category = Column(String, nullable=True)
+
+    # Ancres par champ : {champ: {label, next_line, index}}
+    anchors = Column(JSON, nullable=False)
+
+    # Apprentissage
+    source_invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="SET NULL"), nullable=True)
+    samples_count = Column(Integer, nullable=False, default=1)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
@@ -1,13 +1,27 @@
 """
 Modèle Transaction pour stocker les transactions bancaires
 """
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, JSON, Index, text
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Filtres par utilisateur les plus fréquents (migration 0002)
+        Index("ix_transactions_user_reconciled", "user_id", "is_reconciled"),
+        Index("ix_transactions_user_invoice", "user_id", "invoice_id"),
+        # Pagination par curseur sur (date, id) (migration 0004)
+        Index("ix_transactions_user_date_id", "user_id", "date", "id"),
+        # Transactions à rapprocher : index partiel, ne grossit qu'avec le reste à traiter
+        Index(
+            "ix_transactions_user_unreconciled_id",
+            "user_id", "date", "id",
+            postgresql_where=text("is_reconciled = false"),
+            sqlite_where=text("is_reconciled = 0"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
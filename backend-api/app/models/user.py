@@ -16,4 +16,13 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+    
+    # Version des données (factures, transactions), incrémentée à chaque écriture :
+    # sert d'ETag / Last-Modified aux listes et statistiques (app.models.data_version)
+    data_version = Column(Integer, default=0, server_default="0", nullable=False)
+    data_updated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Dernier apprentissage des profils fournisseurs : seules les factures
+    # validées modifiées depuis sont relues (app.services.supplier_profiles)
+    profiles_learned_at = Column(DateTime(timezone=True), nullable=True)
 
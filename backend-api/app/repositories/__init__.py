@@ -0,0 +1,8 @@
+"""
+Accès aux données asynchrone (AsyncSession) pour les routes async
+"""
+from app.repositories.users import UserRepository
+from app.repositories.invoices import InvoiceRepository
+from app.repositories.transactions import TransactionRepository
+
+__all__ = ["UserRepository", "InvoiceRepository", "TransactionRepository"]
@@ -0,0 +1,172 @@
+"""
+Dépôt asynchrone des factures
+"""
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, exists, func, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import DEFAULT_PAGE_SIZE, STREAM_BATCH_SIZE, decode_cursor, keyset_page, split_page
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+from app.schemas.invoice import INVOICE_LIST_FIELDS
+
+
+SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%f"
+
+
+class InvoiceRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _supplier_field_equals(self, field: str, value: str):
+        """Filtre sur un champ du document supplier (containment JSONB indexé en GIN sous PostgreSQL)"""
+        if self.db.bind.dialect.name == "postgresql":
+            return type_coerce(Invoice.supplier, JSONB).contains({field: value})
+        return Invoice.supplier[field].as_string() == value
+
+    def _created_at_key(self):
+        """
+        Clé de tri sur created_at. SQLite garde le texte tel qu'écrit
+        (CURRENT_TIMESTAMP sans fraction de seconde, l'ORM avec microsecondes) :
+        les deux formats sont ramenés au même texte pour que le tri et la
+        comparaison (created_at, id) du curseur concordent.
+        """
+        if self.db.bind.dialect.name == "sqlite":
+            return func.strftime(SQLITE_TIMESTAMP_FORMAT, Invoice.created_at)
+        return Invoice.created_at
+
+    def _created_at_bound(self, created_at: datetime):
+        """Borne du curseur sur created_at, normalisée comme _created_at_key"""
+        if self.db.bind.dialect.name == "sqlite":
+            return func.strftime(SQLITE_TIMESTAMP_FORMAT, created_at.strftime("%Y-%m-%d %H:%M:%S.%f"))
+        return created_at
+
+    def _filtered(
+        self,
+        query,
+        user_id: int,
+        supplier: Optional[str] = None,
+        siret: Optional[str] = None,
+        min_ttc: Optional[float] = None,
+        max_ttc: Optional[float] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        invoice_type: Optional[str] = None,
+        reconciled: Optional[bool] = None
+    ):
+        """Factures de l'utilisateur correspondant aux filtres de liste / d'export"""
+        query = query.where(Invoice.user_id == user_id)
+
+        if supplier:
+            query = query.where(Invoice.supplier_name == supplier)
+        if siret:
+            query = query.where(self._supplier_field_equals("siret", siret))
+        if min_ttc is not None:
+            query = query.where(Invoice.amount_ttc >= min_ttc)
+        if max_ttc is not None:
+            query = query.where(Invoice.amount_ttc <= max_ttc)
+        if date_from:
+            query = query.where(Invoice.invoice_date >= date_from)
+        if date_to:
+            query = query.where(Invoice.invoice_date <= date_to)
+        if invoice_type:
+            query = query.where(Invoice.invoice_type == invoice_type)
+        if reconciled is not None:
+            # Rapprochée = au moins une transaction rapprochée pointe sur la facture
+            matched = exists().where(and_(
+                Transaction.user_id == user_id,
+                Transaction.invoice_id == Invoice.id,
+                Transaction.is_reconciled == True
+            ))
+            query = query.where(matched if reconciled else ~matched)
+        return query
+
+    async def list_for_user(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Sequence[str] = INVOICE_LIST_FIELDS,
+        **filters
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Page de factures de l'utilisateur, plus récentes d'abord (created_at, id)
+
+        Seules les colonnes de fields sont lues, en tuples (pas d'objets ORM).
+        Filtres : supplier, siret, min_ttc, max_ttc, date_from, date_to,
+        invoice_type, reconciled.
+
+        Returns:
+            (factures en dict {champ: valeur}, curseur de la page suivante ou None)
+        Raises:
+            ValueError: curseur invalide
+        """
+        query = self._filtered(
+            select(
+                *(getattr(Invoice, name) for name in fields),
+                Invoice.created_at.label("cursor_created_at"),
+                Invoice.id.label("cursor_id")
+            ),
+            user_id,
+            **filters
+        )
+
+        after = None
+        if cursor:
+            created_at, invoice_id = decode_cursor(cursor, datetime.fromisoformat, int)
+            after = (self._created_at_bound(created_at), invoice_id)
+
+        result = await self.db.execute(
+            keyset_page(query, self._created_at_key(), Invoice.id, after, limit)
+        )
+        rows, next_cursor = split_page(result.all(), limit, lambda row: (row.cursor_created_at, row.cursor_id))
+        return [dict(zip(fields, row)) for row in rows], next_cursor
+
+    async def stream_for_user(
+        self,
+        user_id: int,
+        fields: Sequence[str] = INVOICE_LIST_FIELDS,
+        batch_size: int = STREAM_BATCH_SIZE,
+        **filters
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Toutes les factures filtrées, par lots, lues avec un curseur côté
+        serveur (la mémoire ne dépend pas du nombre de factures)
+        """
+        query = self._filtered(select(*(getattr(Invoice, name) for name in fields)), user_id, **filters)
+        result = await self.db.stream(
+            query.order_by(self._created_at_key().desc(), Invoice.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield [dict(zip(fields, row)) for row in rows]
+
+    async def get_for_user(self, user_id: int, invoice_id: int) -> Optional[Invoice]:
+        result = await self.db.execute(
+            select(Invoice).where(Invoice.id == invoice_id, Invoice.user_id == user_id)
+        )
+        return result.scalars().first()
+
+    async def stats_for_user(self, user_id: int) -> Dict:
+        """Nombre de factures (total, reçues, envoyées) et total TTC, calculés par la base"""
+        total, received, sent, total_ttc = (await self.db.execute(
+            select(
+                func.count(Invoice.id),
+                func.count(case((Invoice.invoice_type == "entrante", 1))),
+                func.count(case((Invoice.invoice_type == "sortante", 1))),
+                func.coalesce(func.sum(Invoice.amount_ttc), 0.0)
+            ).where(Invoice.user_id == user_id)
+        )).one()
+        return {"total": total, "received": received, "sent": sent, "total_ttc": float(total_ttc)}
+
+    async def tva_totals(self, user_id: int) -> Dict[str, float]:
+        """Somme de la TVA par type de facture (entrante / sortante)"""
+        result = await self.db.execute(
+            select(Invoice.invoice_type, func.coalesce(func.sum(Invoice.amount_tva), 0.0))
+            .where(Invoice.user_id == user_id)
+            .group_by(Invoice.invoice_type)
+        )
+        return {invoice_type: float(total) for invoice_type, total in result.all()}
@@ -0,0 +1,117 @@
+"""
+Dépôt asynchrone des transactions bancaires
+"""
+from datetime import date
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import DEFAULT_PAGE_SIZE, STREAM_BATCH_SIZE, decode_cursor, keyset_page, split_page
+from app.models.transaction import Transaction
+from app.schemas.transaction import TRANSACTION_LIST_FIELDS
+
+
+class TransactionRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _filtered(
+        self,
+        query,
+        user_id: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        vendor: Optional[str] = None,
+        reconciled: Optional[bool] = None
+    ):
+        """Transactions de l'utilisateur correspondant aux filtres de liste / d'export"""
+        query = query.where(Transaction.user_id == user_id)
+
+        if date_from:
+            query = query.where(Transaction.date >= date_from)
+        if date_to:
+            query = query.where(Transaction.date <= date_to)
+        if min_amount is not None:
+            query = query.where(Transaction.amount >= min_amount)
+        if max_amount is not None:
+            query = query.where(Transaction.amount <= max_amount)
+        if vendor:
+            query = query.where(Transaction.vendor == vendor)
+        if reconciled is not None:
+            query = query.where(Transaction.is_reconciled == reconciled)
+        return query
+
+    async def list_for_user(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Sequence[str] = TRANSACTION_LIST_FIELDS,
+        **filters
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Page de transactions de l'utilisateur, plus récentes d'abord (date, id)
+
+        Seules les colonnes de fields sont lues, en tuples (pas d'objets ORM).
+        Filtres : date_from, date_to, min_amount, max_amount, vendor, reconciled.
+
+        Returns:
+            (transactions en dict {champ: valeur}, curseur de la page suivante ou None)
+        Raises:
+            ValueError: curseur invalide
+        """
+        query = self._filtered(
+            select(
+                *(getattr(Transaction, name) for name in fields),
+                Transaction.date.label("cursor_date"),
+                Transaction.id.label("cursor_id")
+            ),
+            user_id,
+            **filters
+        )
+
+        after = decode_cursor(cursor, date.fromisoformat, int) if cursor else None
+
+        result = await self.db.execute(
+            keyset_page(query, Transaction.date, Transaction.id, after, limit)
+        )
+        rows, next_cursor = split_page(result.all(), limit, lambda row: (row.cursor_date, row.cursor_id))
+        return [dict(zip(fields, row)) for row in rows], next_cursor
+
+    async def stream_for_user(
+        self,
+        user_id: int,
+        fields: Sequence[str] = TRANSACTION_LIST_FIELDS,
+        batch_size: int = STREAM_BATCH_SIZE,
+        **filters
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Toutes les transactions filtrées, par lots, lues avec un curseur côté
+        serveur (la mémoire ne dépend pas du nombre de transactions)
+        """
+        query = self._filtered(select(*(getattr(Transaction, name) for name in fields)), user_id, **filters)
+        result = await self.db.stream(
+            query.order_by(Transaction.date.desc(), Transaction.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield [dict(zip(fields, row)) for row in rows]
+
+    async def get_for_user(self, user_id: int, transaction_id: int) -> Optional[Transaction]:
+        result = await self.db.execute(
+            select(Transaction).where(Transaction.id == transaction_id, Transaction.user_id == user_id)
+        )
+        return result.scalars().first()
+
+    async def stats_for_user(self, user_id: int) -> Dict:
+        """Nombre de transactions (total, rapprochées), calculé par la base"""
+        total, reconciled = (await self.db.execute(
+            select(
+                func.count(Transaction.id),
+                func.count(case((Transaction.is_reconciled == True, 1)))
+            ).where(Transaction.user_id == user_id)
+        )).one()
+        return {"total": total, "reconciled": reconciled}
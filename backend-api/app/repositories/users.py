@@ -0,0 +1,55 @@
+"""
+Dépôt asynchrone des utilisateurs
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.principal_cache import principal_cache
+from app.models.user import User
+
+
+class UserRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, user_id: int) -> Optional[User]:
+        return await self.db.get(User, user_id)
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    async def data_version(self, user_id: int) -> Tuple[int, Optional[datetime]]:
+        """Version des données de l'utilisateur et date de la dernière écriture (lecture par clé primaire)"""
+        result = await self.db.execute(
+            select(User.data_version, User.data_updated_at).where(User.id == user_id)
+        )
+        row = result.first()
+        return (row.data_version, row.data_updated_at) if row else (0, None)
+
+    async def create(self, email: str, hashed_password: str, full_name: Optional[str] = None) -> User:
+        user = User(email=email, hashed_password=hashed_password, full_name=full_name)
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def update(self, user: User, **changes) -> User:
+        """Modifie l'utilisateur et invalide son entrée du cache d'authentification"""
+        previous_email = user.email
+        for field, value in changes.items():
+            setattr(user, field, value)
+        await self.db.commit()
+        await self.db.refresh(user)
+
+        await principal_cache.invalidate(previous_email)
+        if user.email != previous_email:
+            await principal_cache.invalidate(user.email)
+        return user
+
+    async def deactivate(self, user: User) -> User:
+        """Désactive le compte : refusé dès la requête suivante (cache invalidé)"""
+        return await self.update(user, is_active=False)
@@ -51,11 +51,16 @@ class InvoiceResponse(BaseModel):
     supplier: dict
     client: dict
     amounts: dict
+    supplier_name: Optional[str] = None
+    amount_ttc: Optional[float] = None
+    amount_tva: Optional[float] = None
+    currency: Optional[str] = None
     category: Optional[str]
     anomalies: List[str]
     confidence_global: float
     file_path: str
     file_name: str
+    content_hash: Optional[str] = None
     email_id: Optional[str]
     email_subject: Optional[str]
     invoice_type: str
@@ -66,3 +71,50 @@ class InvoiceResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class InvoiceListItem(BaseModel):
+    """
+    Élément de GET /api/invoices/ : projection des champs demandés par
+    ?fields= (INVOICE_LIST_FIELDS par défaut), chaque champ peut être absent
+    """
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[date] = None
+    due_date: Optional[date] = None
+    supplier: Optional[dict] = None
+    client: Optional[dict] = None
+    amounts: Optional[dict] = None
+    supplier_name: Optional[str] = None
+    amount_ttc: Optional[float] = None
+    amount_tva: Optional[float] = None
+    currency: Optional[str] = None
+    category: Optional[str] = None
+    anomalies: Optional[List[str]] = None
+    confidence_global: Optional[float] = None
+    file_path: Optional[str] = None
+    file_name: Optional[str] = None
+    content_hash: Optional[str] = None
+    email_id: Optional[str] = None
+    email_subject: Optional[str] = None
+    invoice_type: Optional[str] = None
+    is_validated: Optional[bool] = None
+    is_paid: Optional[bool] = None
+    created_at: Optional[datetime] = None
+
+
+# Champs renvoyés par GET /api/invoices/ sans ?fields= (les autres restent
+# disponibles via ?fields= ou sur le détail d'une facture)
+INVOICE_LIST_FIELDS = (
+    "id", "invoice_number", "invoice_date", "due_date", "supplier", "amounts",
+    "supplier_name", "amount_ttc", "amount_tva", "currency", "category", "anomalies",
+    "confidence_global", "invoice_type", "is_validated", "is_paid", "created_at",
+)
+
+
+class ReanalysisRequest(BaseModel):
+    """
+    Paramètres de ré-analyse des factures stockées
+    """
+    invoice_ids: Optional[List[int]] = None  # Toutes les factures par défaut
+    include_validated: bool = False
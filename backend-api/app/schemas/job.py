@@ -0,0 +1,26 @@
+"""
+Schémas Pydantic pour les tâches de fond (scans, ré-analyses)
+"""
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class JobResponse(BaseModel):
+    """
+    État d'une tâche de la file
+    """
+    id: int
+    kind: str
+    status: str  # queued / running / succeeded / failed
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,283 @@
+"""
+Schémas Pydantic des sorties LLM (extraction, rapprochement, optimisation)
+
+Les réponses des agents sont validées ici avant d'être utilisées :
+les écarts de forme courants sont corrigés par coercition (montants
+"1 234,56 €", taux "20 %", dates "15/03/2024", booléens "oui"...) plutôt
+que de rejeter toute la réponse.
+"""
+import re
+from datetime import date, datetime
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%y")
+
+
+def coerce_amount(value: Any) -> Optional[float]:
+    """
+    Convertit un montant LLM en float
+
+    Accepte les nombres, et les chaînes "1 234,56 €", "1.234,56",
+    "1,234.56", "20 %", "-12.5 EUR". Retourne None si vide.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        raise ValueError(f"montant invalide: {value!r}")
+
+    text = re.sub(r"[^\d,.\-]", "", value.replace("−", "-"))
+    if not text or text in {"-", ".", ","}:
+        return None
+
+    # Le dernier séparateur est le séparateur décimal, les autres sont des milliers
+    last_sep = max(text.rfind(","), text.rfind("."))
+    if last_sep != -1:
+        integer = re.sub(r"[,.]", "", text[:last_sep])
+        decimals = text[last_sep + 1:]
+        # "1.234" / "1,234" sans autre séparateur : groupe de milliers
+        # (pas "0.125" : la partie entière doit être un groupe non nul de 1 à 3 chiffres)
+        if len(decimals) == 3 and text.count(",") + text.count(".") == 1 and re.fullmatch(r"-?[1-9]\d{0,2}", integer):
+            text = integer + decimals
+        else:
+            text = f"{integer}.{decimals}"
+
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"montant invalide: {value!r}")
+
+
+def coerce_date(value: Any) -> Optional[str]:
+    """Normalise une date au format YYYY-MM-DD (None si vide)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if not isinstance(value, str):
+        raise ValueError(f"date invalide: {value!r}")
+
+    text = value.strip()
+    # "2024-03-15T00:00:00" -> "2024-03-15"
+    candidate = text[:10] if re.match(r"^\d{4}-\d{2}-\d{2}T", text) else text
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(candidate, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"date invalide: {value!r}")
+
+
+def coerce_confidence(value: Any) -> float:
+    """
+    Confiance ramenée dans [0, 1] (accepte "0.8", 80, "80 %")
+
+    Seuls un entier ou un pourcentage entre 1 et 100 sont lus comme des
+    pourcentages ; toute autre valeur hors de [0, 1] (ex: 1.5) est bornée.
+    """
+    number = coerce_amount(value)
+    if number is None:
+        return 0.0
+    percent = (
+        (isinstance(value, int) and not isinstance(value, bool))
+        or (isinstance(value, str) and ("%" in value or re.fullmatch(r"\s*\d+\s*", value) is not None))
+    )
+    if percent and 1 < number <= 100:
+        number = number / 100
+    return max(0.0, min(1.0, number))
+
+
+def coerce_bool(value: Any) -> bool:
+    """Booléen tolérant ("true", "oui", "1")"""
+    if isinstance(value, str):
+        return value.strip().lower() in {"true", "oui", "yes", "1", "vrai"}
+    return bool(value)
+
+
+def coerce_str_list(value: Any) -> List[str]:
+    """Liste de chaînes (une chaîne seule devient une liste)"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [str(item) for item in value if item not in (None, "")]
+    raise ValueError(f"liste invalide: {value!r}")
+
+
+def _optional_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, str):
+        return value.strip() or None
+    raise ValueError(f"texte invalide: {value!r}")
+
+
+# --- Extraction de facture (agent_factures/context.txt) ---
+
+class ExtractedParty(BaseModel):
+    """Fournisseur ou client extrait"""
+    model_config = ConfigDict(extra="allow")
+
+    name: Optional[str] = None
+    siret: Optional[str] = None
+    vat: Optional[str] = None
+
+    check_fields = field_validator("name", "siret", "vat", mode="before")(_optional_str)
+
+
+class ExtractedAmounts(BaseModel):
+    """Montants extraits"""
+    model_config = ConfigDict(extra="allow")
+
+    ht: Optional[float] = None
+    tva: Optional[float] = None
+    tva_rate: Optional[float] = None
+    ttc: Optional[float] = None
+    currency: str = "EUR"
+
+    check_fields = field_validator("ht", "tva", "tva_rate", "ttc", mode="before")(coerce_amount)
+
+    @field_validator("currency", mode="before")
+    @classmethod
+    def _currency(cls, value: Any) -> str:
+        if not value:
+            return "EUR"
+        value = str(value).strip().upper()
+        return {"€": "EUR", "$": "USD", "£": "GBP"}.get(value, value)
+
+
+class InvoiceExtraction(BaseModel):
+    """Sortie de l'analyse d'une facture"""
+    model_config = ConfigDict(extra="ignore")
+
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[str] = None
+    due_date: Optional[str] = None
+    supplier: ExtractedParty = Field(default_factory=ExtractedParty)
+    client: ExtractedParty = Field(default_factory=ExtractedParty)
+    amounts: ExtractedAmounts = Field(default_factory=ExtractedAmounts)
+    category: Optional[str] = None
+    anomalies: List[str] = []
+    confidence_global: float = 0.0
+
+    # Clés que le LLM doit toujours renvoyer (null autorisé)
+    REQUIRED: ClassVar[Tuple[str, ...]] = (
+        "invoice_number", "invoice_date", "due_date", "supplier",
+        "client", "amounts", "category", "confidence_global",
+    )
+
+    check_number = field_validator("invoice_number", "category", mode="before")(_optional_str)
+    check_dates = field_validator("invoice_date", "due_date", mode="before")(coerce_date)
+    check_anomalies = field_validator("anomalies", mode="before")(coerce_str_list)
+    check_confidence = field_validator("confidence_global", mode="before")(coerce_confidence)
+
+    @field_validator("supplier", "client", mode="before")
+    @classmethod
+    def _party(cls, value: Any) -> Any:
+        # Un nom seul ("OVH") au lieu de l'objet attendu
+        if isinstance(value, str):
+            return {"name": value}
+        return value or {}
+
+    @field_validator("amounts", mode="before")
+    @classmethod
+    def _amounts(cls, value: Any) -> Any:
+        return value or {}
+
+
+# --- Rapprochement bancaire (Agent_banque/context_*.txt) ---
+
+class ReconciliationLine(BaseModel):
+    """Ligne de relevé proposée comme correspondance"""
+    model_config = ConfigDict(extra="allow")
+
+    similarite_fournisseur: Optional[float] = None
+    differences: List[str] = []
+    details_differences: Dict[str, Any] = {}
+    niveau_confiance: float = 0.0
+
+    check_similarity = field_validator("similarite_fournisseur", mode="before")(coerce_amount)
+    check_differences = field_validator("differences", mode="before")(coerce_str_list)
+    check_confidence = field_validator("niveau_confiance", mode="before")(coerce_confidence)
+
+    @field_validator("details_differences", mode="before")
+    @classmethod
+    def _details(cls, value: Any) -> Any:
+        return value or {}
+
+
+class ReconciliationResult(BaseModel):
+    """Sortie du rapprochement d'une facture"""
+    model_config = ConfigDict(extra="allow")
+
+    facture: Dict[str, Any] = {}
+    correspondance_trouvee: bool = False
+    lignes_correspondantes: List[ReconciliationLine] = []
+    conclusion: Optional[str] = None
+
+    REQUIRED: ClassVar[Tuple[str, ...]] = ("correspondance_trouvee", "lignes_correspondantes")
+
+    check_found = field_validator("correspondance_trouvee", mode="before")(coerce_bool)
+    check_conclusion = field_validator("conclusion", mode="before")(_optional_str)
+
+    @field_validator("facture", mode="before")
+    @classmethod
+    def _facture(cls, value: Any) -> Any:
+        return value if isinstance(value, dict) else {}
+
+    @field_validator("lignes_correspondantes", mode="before")
+    @classmethod
+    def _lines(cls, value: Any) -> Any:
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [value]
+        return value
+
+
+# --- Optimisation (Agent_optimisation/context.txt) ---
+
+class OptimisationResult(BaseModel):
+    """Sortie de l'analyse d'optimisation (sous-structures laissées souples)"""
+    model_config = ConfigDict(extra="allow")
+
+    statistiques_globales: Dict[str, Any] = {}
+    rapprochements: Dict[str, Any] = {}
+    analyse_fournisseurs: List[Dict[str, Any]] = []
+    anomalies: List[str] = []
+    optimisations_fiscales: List[Dict[str, Any]] = []
+    actions_prioritaires: Dict[str, Any] = {}
+    conseils_tresorerie: List[Dict[str, Any]] = []
+    optimisations: List[str] = []
+    résumé: Optional[str] = None
+
+    REQUIRED: ClassVar[Tuple[str, ...]] = ("statistiques_globales", "rapprochements", "anomalies", "résumé")
+
+    check_lists = field_validator("anomalies", "optimisations", mode="before")(coerce_str_list)
+    check_summary = field_validator("résumé", mode="before")(_optional_str)
+
+    @field_validator("statistiques_globales", "rapprochements", "actions_prioritaires", mode="before")
+    @classmethod
+    def _dicts(cls, value: Any) -> Any:
+        return value if isinstance(value, dict) else {}
+
+    @field_validator("analyse_fournisseurs", "optimisations_fiscales", "conseils_tresorerie", mode="before")
+    @classmethod
+    def _dict_lists(cls, value: Any) -> Any:
+        if not isinstance(value, list):
+            return []
+        return [item for item in value if isinstance(item, dict)]
+
+
+def required_fields(model: type) -> Tuple[str, ...]:
+    """Clés obligatoires d'un schéma de sortie"""
+    return tuple(getattr(model, "REQUIRED", ()))
@@ -0,0 +1,109 @@
+"""
+Schémas Pydantic pour les scans Gmail
+
+Un ScanSpec décrit la tranche de boîte mail à traiter : filtres de
+recherche (dates, expéditeurs, libellés, fichiers), budget du passage et
+curseur de reprise. Les gros historiques sont ainsi traités en plusieurs
+tâches courtes, des plus récents aux plus anciens.
+"""
+import base64
+import json
+from datetime import date
+from typing import ClassVar, List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+def encode_scan_cursor(before: int, seen_ids: List[str]) -> str:
+    """
+    Curseur opaque : borne 'before:' (secondes epoch, exclue) et messages
+    déjà traités dans la dernière seconde (pour ne pas les reprendre).
+    """
+    raw = json.dumps({"before": before, "seen": seen_ids}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_scan_cursor(cursor: str) -> dict:
+    """Décode un curseur ; ValueError s'il est invalide"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {"before": int(data["before"]), "seen": [str(i) for i in data.get("seen", [])]}
+    except Exception:
+        raise ValueError("Curseur de scan invalide")
+
+
+class ScanSpec(BaseModel):
+    """
+    Paramètres d'un scan Gmail (corps de POST /api/invoices/scan)
+
+    Les messages sont parcourus du plus récent au plus ancien. Quand le
+    budget est atteint, le résultat contient un next_cursor à repasser
+    pour traiter la tranche suivante (automatiquement si auto_continue).
+    """
+    # Seuls les PDF sont analysés par le scanner
+    SUPPORTED_MIME_TYPES: ClassVar[tuple] = ("application/pdf",)
+
+    # Filtres (appliqués par la recherche Gmail)
+    after: Optional[date] = None
+    before: Optional[date] = None
+    senders: List[str] = []  # from:, ex. "factures@edf.fr" ou "@orange.fr"
+    labels: List[str] = ["INBOX", "SENT"]  # SENT = factures émises (sortantes)
+    filenames: List[str] = []  # filename:, ex. "facture" ou "*.pdf"
+    mime_types: List[str] = ["application/pdf"]
+
+    # Budget du passage (None = valeurs SCAN_MAX_EMAILS / SCAN_MAX_SECONDS)
+    max_emails: Optional[int] = Field(default=None, ge=1, le=500)
+    max_seconds: Optional[int] = Field(default=None, ge=10)
+
+    # Reprise
+    cursor: Optional[str] = None
+    auto_continue: bool = False  # Enchaîner les tranches jusqu'à épuisement
+
+    @field_validator("labels")
+    @classmethod
+    def check_labels(cls, value: List[str]) -> List[str]:
+        labels = [label.strip() for label in value if label.strip()]
+        if not labels:
+            raise ValueError("Au moins un libellé est requis")
+        return labels
+
+    @field_validator("mime_types")
+    @classmethod
+    def check_mime_types(cls, value: List[str]) -> List[str]:
+        unsupported = [mime for mime in value if mime not in cls.SUPPORTED_MIME_TYPES]
+        if unsupported or not value:
+            raise ValueError(f"Types supportés : {', '.join(cls.SUPPORTED_MIME_TYPES)}")
+        return value
+
+    @field_validator("cursor")
+    @classmethod
+    def check_cursor(cls, value: Optional[str]) -> Optional[str]:
+        if value:
+            decode_scan_cursor(value)
+        return value or None
+
+    def gmail_query(self, before_epoch: Optional[int] = None) -> str:
+        """
+        Requête de recherche Gmail correspondant aux filtres
+
+        Exemple : '{in:inbox in:sent} has:attachment filename:pdf after:2024/01/01'
+        """
+        scopes = [
+            f"in:{label.lower()}" if label.upper() in ("INBOX", "SENT") else f"label:{label}"
+            for label in self.labels
+        ]
+        terms = ["{" + " ".join(scopes) + "}", "has:attachment", "filename:pdf"]
+
+        if self.senders:
+            terms.append("{" + " ".join(f"from:{sender}" for sender in self.senders) + "}")
+        if self.filenames:
+            terms.append("{" + " ".join(f"filename:{name}" for name in self.filenames) + "}")
+        if self.after:
+            terms.append(f"after:{self.after.strftime('%Y/%m/%d')}")
+        if self.before:
+            terms.append(f"before:{self.before.strftime('%Y/%m/%d')}")
+        if before_epoch is not None:
+            # Borne du curseur (secondes epoch) : combinée avec 'before' (le plus restrictif s'applique)
+            terms.append(f"before:{before_epoch}")
+
+        return " ".join(terms)
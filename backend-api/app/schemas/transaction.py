@@ -4,6 +4,7 @@ Schémas Pydantic pour les transactions bancaires
 from pydantic import BaseModel
 from typing import Optional
 from datetime import date, datetime
+from datetime import date as DateType  # champ nommé date dans TransactionListItem
 
 
 class TransactionBase(BaseModel):
@@ -34,6 +35,35 @@ class TransactionResponse(TransactionBase):
         from_attributes = True
 
 
+class TransactionListItem(BaseModel):
+    """
+    Élément de GET /api/transactions/ : projection des champs demandés par
+    ?fields= (TRANSACTION_LIST_FIELDS par défaut), chaque champ peut être absent
+    """
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    date: Optional[DateType] = None
+    amount: Optional[float] = None
+    vendor: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    is_reconciled: Optional[bool] = None
+    invoice_id: Optional[int] = None
+    reconciliation_confidence: Optional[float] = None
+    reconciliation_details: Optional[dict] = None
+    source_file: Optional[str] = None
+    import_batch_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+# Champs renvoyés par GET /api/transactions/ sans ?fields= (reconciliation_details
+# et les métadonnées d'import restent disponibles via ?fields= ou sur le détail)
+TRANSACTION_LIST_FIELDS = (
+    "id", "date", "amount", "vendor", "description", "category",
+    "is_reconciled", "invoice_id", "reconciliation_confidence", "created_at",
+)
+
 class ReconciliationRequest(BaseModel):
     transaction_id: int
     invoice_id: int
@@ -1,79 +1,55 @@
 """
-Service pour lancer l'agent facture depuis le backend
+Service pour lancer le scan de factures depuis le backend
+
+Le pipeline Gmail → extraction → analyse → base s'exécute dans le
+processus du worker (pas de sous-processus, pas d'aller-retour HTTP
+vers /api/invoices/upload). Les scans sont planifiés via la file de
+tâches (app.services.job_queue) et exécutés par app.worker.
 """
-import subprocess
-import os
-from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Optional
+
+from app.core.database import SessionLocal
+from app.core.logger import logger
+from app.schemas.scan import ScanSpec
+from app.services.invoice_scanner import InvoiceScanner
 
 
-def run_invoice_agent(user_token: str) -> Dict:
+def run_invoice_scan(user_id: int, spec: Optional[ScanSpec] = None) -> Dict:
     """
-    Lance l'agent facture pour scanner Gmail et extraire les factures
-    
+    Scanne Gmail et enregistre les factures de l'utilisateur
+
     Args:
-        user_token: Token JWT de l'utilisateur
-    
+        user_id: ID de l'utilisateur
+        spec: Filtres, budget et curseur du scan (défaut : INBOX + SENT)
+
     Returns:
-        dict: Résultat de l'exécution
+        dict: Résultat structuré du scan (next_cursor si le budget est atteint)
     """
-    # Chemin vers l'agent
-    agent_dir = Path(__file__).resolve().parents[3] / "agent_factures"
-    agent_script = agent_dir / "agent_facture.py"
-    
-    if not agent_script.exists():
-        return {
-            "success": False,
-            "error": "Agent facture non trouvé",
-            "invoices_processed": 0
-        }
-    
+    db = SessionLocal()
     try:
-        # Créer l'environnement avec le token
-        env = os.environ.copy()
-        env["USER_TOKEN"] = user_token
-        
-        # Lancer l'agent en subprocess
-        result = subprocess.run(
-            ["python", str(agent_script)],
-            cwd=str(agent_dir),
-            env=env,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minutes max
-        )
-        
-        # Parser la sortie pour compter les factures
-        output = result.stdout
-        invoices_count = output.count("[OK] Analyse terminee")
-        uploaded_count = output.count("[UPLOAD] Envoyee au backend")
-        
-        # Log pour debug
-        from app.core.logger import logger
-        logger.debug(f"Agent return code: {result.returncode}")
-        if result.stdout:
-            logger.debug(f"Agent stdout: {result.stdout}")
-        if result.stderr:
-            logger.warning(f"Agent stderr: {result.stderr}")
-        
-        return {
-            "success": result.returncode == 0,
-            "invoices_processed": invoices_count,
-            "invoices_uploaded": uploaded_count,
-            "output": output,
-            "error": result.stderr if result.returncode != 0 else None
-        }
-        
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "error": "Timeout: l'agent a pris trop de temps",
-            "invoices_processed": 0
-        }
+        scanner = InvoiceScanner(user_id=user_id, db=db)
+        stats = scanner.scan_and_process(spec or ScanSpec())
     except Exception as e:
+        logger.error(f"Invoice scan failed for user {user_id}: {e}")
         return {
             "success": False,
             "error": str(e),
-            "invoices_processed": 0
+            "invoices_processed": 0,
+            "invoices_uploaded": 0
         }
+    finally:
+        db.close()
+
+    global_errors = [err for err in stats['errors'] if err.startswith("Erreur globale")]
+    # Message illisible : échec (nouvelle tentative différée), next_cursor reprend à ce message
+    if stats.get('interrupted_at'):
+        global_errors.append(f"Scan interrompu au message {stats['interrupted_at']}")
 
+    return {
+        "success": not global_errors,
+        "invoices_processed": stats['invoices_processed'],
+        "invoices_uploaded": stats['invoices_saved'],
+        "stats": stats,
+        "next_cursor": stats.get('next_cursor'),
+        "error": global_errors[0] if global_errors else None
+    }
@@ -3,38 +3,38 @@ Service de rapprochement bancaire intégré
 """
 import json
 from typing import Dict, List, Optional
-from pathlib import Path
-from groq import Groq
-from app.core.config import settings
+from app.core.llm import llm_gateway
+from app.core.prompts import prompt_store
+from app.core.structured_output import parse_structured, reask_with
+from app.schemas.llm_output import ReconciliationResult
 
 
 class BankReconciliationService:
     """Service de rapprochement bancaire intelligent"""
     
-    def __init__(self):
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        
-        self.context_envoi = self._load_context("context_envoi.txt")
-        self.context_reception = self._load_context("context_reception.txt")
-        self.prompt_template = self._load_prompt_template()
+    @property
+    def context_envoi(self) -> str:
+        """Contexte pour les factures émises (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "Agent_banque/context_envoi.txt",
+            default="Tu es un agent de rapprochement bancaire."
+        )
     
-    def _load_context(self, filename: str) -> str:
-        """Charge un fichier de contexte"""
-        context_path = Path(__file__).parent.parent.parent.parent / "Agent_banque" / filename
-        try:
-            with open(context_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            return "Tu es un agent de rapprochement bancaire."
+    @property
+    def context_reception(self) -> str:
+        """Contexte pour les factures reçues (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "Agent_banque/context_reception.txt",
+            default="Tu es un agent de rapprochement bancaire."
+        )
     
-    def _load_prompt_template(self) -> str:
-        """Charge le template de prompt"""
-        prompt_path = Path(__file__).parent.parent.parent.parent / "Agent_banque" / "prompt.txt"
-        try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            return "Facture: {{facture_json}}\n\nRelevé bancaire: {{releve_bancaire}}"
+    @property
+    def prompt_template(self) -> str:
+        """Template de prompt (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "Agent_banque/prompt.txt",
+            default="Facture: {{facture_json}}\n\nRelevé bancaire: {{releve_bancaire}}"
+        )
     
     def reconcile(
         self,
@@ -65,20 +65,25 @@ class BankReconciliationService:
             prompt = self.prompt_template.replace("{{facture_json}}", invoice_json)
             prompt = prompt.replace("{{releve_bancaire}}", releve_json)
             
-            # Appel à Groq
-            response = self.groq_client.chat.completions.create(
-                model=settings.MODEL_NAME_analyse,
-                messages=[
-                    {"role": "system", "content": context},
-                    {"role": "user", "content": prompt}
-                ],
+            # Appel au LLM (passerelle partagée)
+            messages = [
+                {"role": "system", "content": context},
+                {"role": "user", "content": prompt}
+            ]
+            response = llm_gateway.chat_completion(
+                agent="bank_reconciliation",
+                messages=messages,
                 response_format={"type": "json_object"}
             )
             
-            raw_content = response.choices[0].message.content
-            result = json.loads(raw_content)
-            
-            return result
+            # Validation + réparation locale, relance ciblée si des champs manquent
+            return parse_structured(
+                response.choices[0].message.content,
+                ReconciliationResult,
+                agent="bank_reconciliation",
+                reask=reask_with(llm_gateway, "bank_reconciliation", response_format={"type": "json_object"}),
+                messages=messages
+            )
         
         except Exception:
             return None
@@ -117,3 +122,6 @@ class BankReconciliationService:
         
         return None
 
+
+# Service partagé (sans état propre à une requête)
+bank_reconciliation_service = BankReconciliationService()
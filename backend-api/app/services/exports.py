@@ -0,0 +1,130 @@
+"""
+Exports en flux des factures et transactions (CSV, NDJSON, Parquet)
+
+Les lignes arrivent par lots depuis un curseur côté serveur et chaque lot
+est encodé puis envoyé aussitôt : la mémoire de l'API ne dépend pas de la
+taille de l'export. Parquet nécessite pyarrow (un row group par lot).
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, Sequence
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, JSON
+
+from app.core.serialization import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow absent : export Parquet indisponible
+    pa = None
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),  # charset=utf-8 ajouté par Starlette
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _csv_value(value):
+    # Documents JSON (fournisseur, montants, anomalies...) en texte JSON dans la cellule
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def csv_chunks(batches: AsyncIterator[List[Dict]], fields: Sequence[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM : accents corrects à l'ouverture dans Excel
+    buffer.write("\ufeff")
+    writer.writerow(fields)
+
+    async for rows in batches:
+        writer.writerows([_csv_value(row[field]) for field in fields] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def ndjson_chunks(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC") if column_type.timezone else pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    # Chaînes et documents JSON (encodés en texte)
+    return pa.string()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule dont le contenu est vidé après chaque lot"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def parquet_chunks(batches: AsyncIterator[List[Dict]], model, fields: Sequence[str]) -> AsyncIterator[bytes]:
+    columns = model.__table__.columns
+    schema = pa.schema([(field, _arrow_type(columns[field])) for field in fields])
+    json_fields = [field for field in fields if isinstance(columns[field].type, JSON)]
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in batches:
+            for row in rows:
+                for field in json_fields:
+                    if row[field] is not None:
+                        row[field] = json.dumps(row[field], ensure_ascii=False)
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    # Pied de fichier (métadonnées) écrit à la fermeture
+    yield sink.drain()
+
+
+def encode_export(export_format: str, batches: AsyncIterator[List[Dict]], model, fields: Sequence[str]) -> AsyncIterator[bytes]:
+    """Flux d'octets de l'export au format demandé (csv, ndjson, parquet)"""
+    if export_format == "parquet":
+        return parquet_chunks(batches, model, fields)
+    if export_format == "ndjson":
+        return ndjson_chunks(batches)
+    return csv_chunks(batches, fields)
@@ -0,0 +1,180 @@
+"""
+Ré-analyse des factures déjà stockées, sans passer par Gmail
+
+Utile après une modification de agent_factures/prompt.txt ou de
+MODEL_NAME_analyse : les PDF de uploads/invoices/user_X/ sont relus
+(texte pris dans le cache d'extraction si disponible), analysés par le
+LLM en parallèle, puis les factures sont mises à jour par lots.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.logger import logger
+from app.core.storage import get_invoice_pdf_path, compute_content_hash
+from app.models.invoice import Invoice
+from app.services.invoice_scanner import InvoiceScanner
+
+
+# Champs remplacés par la nouvelle analyse
+ANALYSIS_FIELDS = [
+    "invoice_number",
+    "invoice_date",
+    "due_date",
+    "supplier",
+    "client",
+    "amounts",
+    "category",
+    "anomalies",
+    "confidence_global",
+]
+
+
+class InvoiceReanalyzer:
+    """Ré-analyse en lot des factures stockées d'un utilisateur"""
+
+    def __init__(
+        self,
+        user_id: int,
+        db: Session,
+        max_workers: int = 4,
+        batch_size: int = 20,
+        include_validated: bool = False
+    ):
+        self.user_id = user_id
+        self.db = db
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.include_validated = include_validated
+        self.scanner = InvoiceScanner(user_id=user_id, db=db)
+
+    def _analyze(self, file_path: str, content_hash: Optional[str]) -> Tuple[Optional[Dict], str]:
+        """
+        Lecture du PDF, extraction (cache) et analyse LLM, exécutées dans un thread
+
+        Le PDF n'est lu qu'au moment de son analyse : au plus max_workers
+        fichiers sont en mémoire à la fois.
+
+        Returns:
+            tuple: (analyse ou None, empreinte du contenu)
+
+        Raises:
+            OSError: PDF illisible
+        """
+        pdf_data = get_invoice_pdf_path(file_path).read_bytes()
+        content_hash = content_hash or compute_content_hash(pdf_data)
+        invoice_text = self.scanner.extract_text_from_pdf(pdf_data, content_hash)
+        if not invoice_text:
+            return None, content_hash
+        return self.scanner.analyze_invoice_text(invoice_text), content_hash
+
+    def run(self, invoice_ids: Optional[List[int]] = None) -> Dict:
+        """
+        Ré-analyse les factures de l'utilisateur
+
+        Args:
+            invoice_ids: Limiter à ces factures (toutes par défaut)
+
+        Returns:
+            dict: Statistiques de traitement
+        """
+        stats = {
+            'invoices_selected': 0,
+            'invoices_updated': 0,
+            'errors': []
+        }
+
+        query = self.db.query(Invoice).filter(Invoice.user_id == self.user_id)
+        if invoice_ids:
+            query = query.filter(Invoice.id.in_(invoice_ids))
+        if not self.include_validated:
+            query = query.filter(Invoice.is_validated == False)
+
+        # Profils fournisseurs appris et chargés avant les threads d'analyse
+        self.scanner.refresh_supplier_profiles()
+
+        invoices = {invoice.id: invoice for invoice in query.all()}
+        stats['invoices_selected'] = len(invoices)
+
+        # Lecture des PDF et analyses LLM en parallèle, écritures en base par lots
+        pending = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Chaque thread hérite du contexte d'appel (attribution des métriques LLM)
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, self._analyze, invoice.file_path, invoice.content_hash
+                ): invoice_id
+                for invoice_id, invoice in invoices.items()
+            }
+
+            for future in as_completed(futures):
+                invoice = invoices[futures[future]]
+
+                try:
+                    analysis, content_hash = future.result()
+                except OSError as e:
+                    stats['errors'].append(f"{invoice.file_name}: PDF illisible ({e})")
+                    continue
+                except Exception as e:
+                    stats['errors'].append(f"{invoice.file_name}: {str(e)}")
+                    continue
+
+                if not invoice.content_hash:
+                    invoice.content_hash = content_hash
+
+                if not analysis:
+                    stats['errors'].append(f"{invoice.file_name}: Analyse LLM échouée")
+                    continue
+
+                for field in ANALYSIS_FIELDS:
+                    if field in analysis:
+                        setattr(invoice, field, analysis[field])
+
+                stats['invoices_updated'] += 1
+                pending += 1
+
+                if pending >= self.batch_size:
+                    self._commit_batch(stats)
+                    pending = 0
+
+        self._commit_batch(stats)
+        return stats
+
+    def _commit_batch(self, stats: Dict) -> None:
+        """Valide un lot de mises à jour"""
+        try:
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            stats['errors'].append(f"Erreur d'écriture du lot: {str(e)}")
+            logger.error(f"Re-analysis batch commit failed for user {self.user_id}: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.core.database import SessionLocal
+    from app.models.user import User
+
+    parser = argparse.ArgumentParser(description="Ré-analyse des factures stockées")
+    parser.add_argument("--user-id", type=int, help="Utilisateur à traiter (tous par défaut)")
+    parser.add_argument("--workers", type=int, default=4, help="Appels LLM simultanés")
+    parser.add_argument("--batch-size", type=int, default=20, help="Factures par commit")
+    parser.add_argument("--include-validated", action="store_true", help="Inclure les factures validées")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_ids = [args.user_id] if args.user_id else [u.id for u in db.query(User.id).all()]
+        for user_id in user_ids:
+            stats = InvoiceReanalyzer(
+                user_id=user_id,
+                db=db,
+                max_workers=args.workers,
+                batch_size=args.batch_size,
+                include_validated=args.include_validated
+            ).run()
+            logger.info(f"Re-analysis user {user_id}: {stats}")
+    finally:
+        db.close()
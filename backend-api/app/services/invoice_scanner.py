@@ -3,26 +3,42 @@ Service intégré pour scanner Gmail et extraire les factures
 Remplace l'agent externe pour une meilleure intégration
 """
 import os
-import json
 import base64
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime
 
-from groq import Groq
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
 from app.core.config import settings
-from app.core.storage import save_invoice_pdf
+from app.core.llm import llm_gateway
+from app.core.metrics import local_extraction_total
+from app.core.structured_output import parse_structured, reask_with
+from app.core.prompts import prompt_store
+from app.core.storage import save_invoice_pdf, delete_invoice_pdf, compute_content_hash
+from app.core.extraction_cache import extraction_cache
 from app.models.invoice import Invoice
+from app.schemas.llm_output import InvoiceExtraction
+from app.schemas.scan import ScanSpec, decode_scan_cursor, encode_scan_cursor
+from app.services.local_extractor import local_extractor, fill_missing, supplier_identified
+from app.services.supplier_profiles import SupplierProfileLearner, apply_profile, load_profiles, own_keys
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
+# Service Gmail réutilisé d'un scan à l'autre (un par thread worker)
+_gmail_local = threading.local()
+
+# Version de l'extracteur PDF (à incrémenter si l'extraction change)
+PDF_EXTRACTOR_VERSION = "pypdf-1"
+
 
 class InvoiceScanner:
     """Scanner de factures Gmail intégré"""
@@ -30,29 +46,65 @@ class InvoiceScanner:
     def __init__(self, user_id: int, db: Session):
         self.user_id = user_id
         self.db = db
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        self.context = self._load_context()
-        self.prompt_template = self._load_prompt_template()
+        self._supplier_profiles: Optional[Dict[str, Dict]] = None
     
-    def _load_context(self) -> str:
-        """Charge le contexte pour l'analyse"""
-        context_path = Path(__file__).parent.parent.parent.parent / "agent_factures" / "context.txt"
-        try:
-            with open(context_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            return "Tu es un agent spécialisé dans l'analyse de factures."
+    @property
+    def supplier_profiles(self) -> Dict[str, Dict]:
+        """Profils fournisseurs de l'utilisateur (chargés une fois, avant tout thread)"""
+        if self._supplier_profiles is None:
+            self._supplier_profiles = load_profiles(self.db, self.user_id)
+        return self._supplier_profiles
     
-    def _load_prompt_template(self) -> str:
-        """Charge le template de prompt"""
-        prompt_path = Path(__file__).parent.parent.parent.parent / "agent_factures" / "prompt.txt"
+    def refresh_supplier_profiles(self) -> Dict:
+        """Apprend les profils des nouvelles factures validées puis les recharge"""
+        excluded = own_keys(self.db, self.user_id)
         try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            return "Analyse cette facture: {{FACTURE_BRUTE}}"
+            stats = SupplierProfileLearner(self.user_id, self.db, scanner=self, excluded=excluded).run()
+        except Exception as e:
+            self.db.rollback()
+            stats = {"error": str(e)}
+        self._supplier_profiles = load_profiles(self.db, self.user_id, excluded)
+        return stats
+    
+    @property
+    def context(self) -> str:
+        """Contexte pour l'analyse (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "agent_factures/context.txt",
+            default="Tu es un agent spécialisé dans l'analyse de factures."
+        )
+    
+    @property
+    def prompt_template(self) -> str:
+        """Template de prompt (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "agent_factures/prompt.txt",
+            default="Analyse cette facture: {{FACTURE_BRUTE}}"
+        )
     
     def _get_gmail_service(self):
+        """
+        Retourne le service Gmail, réutilisé entre les scans
+        
+        Le client de découverte n'est reconstruit que si les identifiants ne
+        sont plus valides. Un client par thread (httplib2 n'est pas thread-safe).
+        """
+        cached = getattr(_gmail_local, "service", None)
+        creds = getattr(_gmail_local, "creds", None)
+        
+        if cached is not None and creds is not None:
+            if creds.valid:
+                return cached
+            if creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+                return cached
+        
+        service, creds = self._build_gmail_service()
+        _gmail_local.service = service
+        _gmail_local.creds = creds
+        return service
+    
+    def _build_gmail_service(self):
         """Authentifie et retourne le service Gmail"""
         creds = None
         
@@ -91,10 +143,21 @@ class InvoiceScanner:
             with open(save_token_path, 'w') as token:
                 token.write(creds.to_json())
         
-        return build('gmail', 'v1', credentials=creds)
+        return build('gmail', 'v1', credentials=creds, cache_discovery=False), creds
     
-    def _extract_text_from_pdf(self, pdf_data: bytes) -> str:
-        """Extrait le texte d'un PDF"""
+    def extract_text_from_pdf(self, pdf_data: bytes, content_hash: Optional[str] = None) -> str:
+        """Extrait le texte d'un PDF (via le cache d'extraction si possible)"""
+        if content_hash is None:
+            content_hash = compute_content_hash(pdf_data)
+        
+        return extraction_cache.get_or_extract(
+            content_hash,
+            PDF_EXTRACTOR_VERSION,
+            lambda: self._read_pdf_text(pdf_data)
+        )
+    
+    def _read_pdf_text(self, pdf_data: bytes) -> str:
+        """Lit le texte d'un PDF avec pypdf"""
         import io
         try:
             from pypdf import PdfReader
@@ -107,123 +170,103 @@ class InvoiceScanner:
         except Exception:
             return ""
     
-    def _analyze_invoice_text(self, invoice_text: str) -> Optional[Dict]:
-        """Analyse le texte de la facture avec Groq"""
+    def analyze_invoice_text(self, invoice_text: str) -> Optional[Dict]:
+        """
+        Analyse le texte de la facture
+
+        L'extraction locale par règles (complétée par le profil du fournisseur
+        s'il est connu) est tentée d'abord ; le LLM n'est appelé que si sa
+        confiance est sous LOCAL_EXTRACTION_MIN_CONFIDENCE ou si le fournisseur
+        n'est pas identifié (SIRET/TVA et nom libellé, ou profil reconnu).
+        """
         if not invoice_text or not invoice_text.strip():
             return None
         
+        local = apply_profile(invoice_text, local_extractor.extract(invoice_text), self.supplier_profiles)
+        if local["confidence"] >= settings.LOCAL_EXTRACTION_MIN_CONFIDENCE and supplier_identified(local):
+            local_extraction_total.inc(result="profile" if local.get("profile_id") else "accepted")
+            return local["analysis"]
+        local_extraction_total.inc(result="fallback")
+        
         try:
             prompt = self.prompt_template.replace("{{FACTURE_BRUTE}}", invoice_text)
+            messages = [
+                {"role": "system", "content": self.context},
+                {"role": "user", "content": prompt}
+            ]
             
-            response = self.groq_client.chat.completions.create(
-                model=settings.MODEL_NAME_analyse,
-                messages=[
-                    {"role": "system", "content": self.context},
-                    {"role": "user", "content": prompt}
-                ],
+            response = llm_gateway.chat_completion(
+                agent="invoice_scanner",
+                messages=messages,
                 response_format={"type": "json_object"}
             )
             
-            raw_content = response.choices[0].message.content
-            return json.loads(raw_content)
+            # Validation + réparation locale, relance ciblée si des champs manquent
+            analysis = parse_structured(
+                response.choices[0].message.content,
+                InvoiceExtraction,
+                agent="invoice_scanner",
+                reask=reask_with(llm_gateway, "invoice_scanner", response_format={"type": "json_object"}),
+                messages=messages
+            )
+            return fill_missing(analysis, local["analysis"]) if analysis else None
         
         except Exception:
             return None
     
-    def _get_gmail_messages(self, service, max_results: int = 50) -> List[Dict]:
-        """Récupère les messages Gmail avec pièces jointes (INBOX + SENT)"""
-        try:
-            emails = []
-            
-            # Scanner INBOX (factures reçues)
-            inbox_results = service.users().messages().list(
-                userId='me',
-                labelIds=['INBOX'],
-                q='has:attachment',
-                maxResults=max_results
-            ).execute()
-            
-            inbox_messages = inbox_results.get('messages', [])
-            
-            for msg in inbox_messages:
-                msg_id = msg['id']
-                
-                # Récupérer le message complet
-                message = service.users().messages().get(
-                    userId='me',
-                    id=msg_id,
-                    format='full'
-                ).execute()
-                
-                headers = message.get('payload', {}).get('headers', [])
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-                from_email = next((h['value'] for h in headers if h['name'] == 'From'), '')
-                date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
-                
-                # Extraire les pièces jointes
-                attachments = self._extract_attachments(service, msg_id, message.get('payload', {}))
-                
-                if attachments:
-                    emails.append({
-                        'id': msg_id,
-                        'subject': subject,
-                        'from': from_email,
-                        'date': date,
-                        'type': 'entrante',  # Facture reçue
-                        'attachments': attachments
-                    })
-            
-            # Scanner SENT (factures envoyées)
-            sent_results = service.users().messages().list(
+    def _iter_message_ids(self, service, query: str, page_size: int) -> Iterator[str]:
+        """Identifiants des messages correspondant à la requête, page par page (plus récents d'abord)"""
+        page_token = None
+        
+        while True:
+            results = service.users().messages().list(
                 userId='me',
-                labelIds=['SENT'],
-                q='has:attachment',
-                maxResults=max_results
+                q=query,
+                pageToken=page_token,
+                maxResults=page_size
             ).execute()
             
-            sent_messages = sent_results.get('messages', [])
-            
-            for msg in sent_messages:
-                msg_id = msg['id']
-                
-                # Récupérer le message complet
-                message = service.users().messages().get(
-                    userId='me',
-                    id=msg_id,
-                    format='full'
-                ).execute()
-                
-                headers = message.get('payload', {}).get('headers', [])
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-                to_email = next((h['value'] for h in headers if h['name'] == 'To'), '')
-                date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
-                
-                # Extraire les pièces jointes
-                attachments = self._extract_attachments(service, msg_id, message.get('payload', {}))
-                
-                if attachments:
-                    emails.append({
-                        'id': msg_id,
-                        'subject': subject,
-                        'from': to_email,  # Pour les envoyées, le destinataire
-                        'date': date,
-                        'type': 'sortante',  # Facture envoyée
-                        'attachments': attachments
-                    })
+            for msg in results.get('messages', []):
+                yield msg['id']
             
-            return emails
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+    
+    def _fetch_email(self, service, msg_id: str, mime_types=ScanSpec.SUPPORTED_MIME_TYPES) -> Dict:
+        """Récupère un message complet et ses pièces jointes"""
+        message = service.users().messages().get(
+            userId='me',
+            id=msg_id,
+            format='full'
+        ).execute()
         
-        except Exception:
-            return []
+        headers = message.get('payload', {}).get('headers', [])
+        get_header = lambda name: next((h['value'] for h in headers if h['name'] == name), '')
+        
+        # Message envoyé : facture émise, le correspondant est le destinataire
+        sent = 'SENT' in message.get('labelIds', [])
+        
+        return {
+            'id': msg_id,
+            'subject': get_header('Subject'),
+            'from': get_header('To') if sent else get_header('From'),
+            'date': get_header('Date'),
+            'type': 'sortante' if sent else 'entrante',
+            'internal_date': int(message.get('internalDate', 0)) // 1000,  # secondes epoch
+            'attachments': self._extract_attachments(service, msg_id, message.get('payload', {}), mime_types)
+        }
     
-    def _extract_attachments(self, service, msg_id: str, payload: Dict) -> List[Dict]:
-        """Extrait les pièces jointes d'un message"""
+    def _extract_attachments(self, service, msg_id: str, payload: Dict,
+                             mime_types=ScanSpec.SUPPORTED_MIME_TYPES) -> List[Dict]:
+        """Extrait les pièces jointes d'un message (PDF, d'après le type MIME ou l'extension)"""
         attachments = []
         
         def explore_parts(parts):
             for part in parts:
                 filename = part.get('filename', '')
-                if filename and filename.lower().endswith('.pdf'):
+                wanted = part.get('mimeType') in mime_types or filename.lower().endswith('.pdf')
+                if filename and wanted:
                     body = part.get('body', {})
                     att_id = body.get('attachmentId')
                     
@@ -251,101 +294,189 @@ class InvoiceScanner:
         
         return attachments
     
-    def scan_and_process(self, max_emails: int = 50) -> Dict:
+    def find_invoice_by_hash(self, content_hash: str) -> Optional[Invoice]:
+        """Retourne la facture déjà analysée pour ce contenu, s'il y en a une"""
+        return self.db.query(Invoice).filter(
+            Invoice.user_id == self.user_id,
+            Invoice.content_hash == content_hash
+        ).first()
+    
+    def _is_duplicate(self, content_hash: str, email_id: str) -> bool:
+        """Vérifie si la pièce jointe a déjà été traitée"""
+        if self.find_invoice_by_hash(content_hash):
+            return True
+        
+        # Factures enregistrées avant l'ajout de l'empreinte : dédup par email_id
+        legacy = self.db.query(Invoice.id).filter(
+            Invoice.user_id == self.user_id,
+            Invoice.email_id == email_id,
+            Invoice.content_hash.is_(None)
+        ).first()
+        return legacy is not None
+    
+    def scan_and_process(self, spec: Optional[ScanSpec] = None, max_emails: Optional[int] = None) -> Dict:
         """
         Scanne Gmail et traite les factures
         
+        Les messages correspondant au ScanSpec sont traités du plus récent au
+        plus ancien, dans la limite du budget (nombre d'emails, durée). Si le
+        budget est atteint, stats['next_cursor'] permet de reprendre la suite.
+        Un message illisible arrête la tranche (stats['interrupted_at']) :
+        next_cursor reprend à ce message.
+        
+        Args:
+            spec: Filtres, budget et curseur du scan (défaut : INBOX + SENT)
+            max_emails: Raccourci pour ScanSpec(max_emails=...)
+        
         Returns:
             dict: Statistiques de traitement
         """
+        spec = spec or ScanSpec(max_emails=max_emails)
         stats = {
             'emails_scanned': 0,
             'invoices_found': 0,
             'invoices_processed': 0,
             'invoices_saved': 0,
-            'errors': []
+            'duplicates_skipped': 0,
+            'errors': [],
+            'next_cursor': None,
+            'interrupted_at': None
         }
         
         try:
+            # Reprise : messages antérieurs à la borne du curseur
+            cursor = decode_scan_cursor(spec.cursor) if spec.cursor else None
+            seen = set(cursor['seen']) if cursor else set()
+            
+            budget = spec.max_emails or settings.SCAN_MAX_EMAILS
+            deadline = time.monotonic() + (spec.max_seconds or settings.SCAN_MAX_SECONDS)
+            
+            # Profils fournisseurs à jour avant de lire les nouvelles factures
+            self.refresh_supplier_profiles()
+            
             service = self._get_gmail_service()
-            emails = self._get_gmail_messages(service, max_results=max_emails)
-            stats['emails_scanned'] = len(emails)
+            query = spec.gmail_query(cursor['before'] if cursor else None)
             
-            # Traiter chaque email
-            for email in emails:
-                for attachment in email['attachments']:
-                    stats['invoices_found'] += 1
-                    filename = attachment['filename']
-                    
-                    try:
-                        # Vérifier si déjà traité (via email_id)
-                        existing = self.db.query(Invoice).filter(
-                            Invoice.user_id == self.user_id,
-                            Invoice.email_id == email['id']
-                        ).first()
-                        
-                        if existing:
-                            continue
-                        
-                        # Extraire le texte
-                        invoice_text = self._extract_text_from_pdf(attachment['data'])
-                        
-                        if not invoice_text:
-                            stats['errors'].append(f"{filename}: Extraction texte échouée")
-                            continue
-                        
-                        # Analyser avec LLM
-                        analysis = self._analyze_invoice_text(invoice_text)
-                        
-                        if not analysis:
-                            stats['errors'].append(f"{filename}: Analyse LLM échouée")
-                            continue
-                        
-                        stats['invoices_processed'] += 1
-                        
-                        # Sauvegarder le PDF
-                        import io
-                        file_info = save_invoice_pdf(
-                            user_id=self.user_id,
-                            filename=filename,
-                            file_content=io.BytesIO(attachment['data'])
-                        )
-                        
-                        # Créer l'entrée en base
-                        invoice_type = email.get('type', 'entrante')
-                        
-                        new_invoice = Invoice(
-                            user_id=self.user_id,
-                            invoice_number=analysis.get('invoice_number'),
-                            invoice_date=analysis.get('invoice_date'),
-                            due_date=analysis.get('due_date'),
-                            supplier=analysis.get('supplier', {}),
-                            client=analysis.get('client', {}),
-                            amounts=analysis.get('amounts', {}),
-                            category=analysis.get('category'),
-                            anomalies=analysis.get('anomalies', []),
-                            confidence_global=analysis.get('confidence_global', 0.0),
-                            file_path=file_info['file_path'],
-                            file_name=file_info['file_name'],
-                            email_id=email['id'],
-                            email_subject=email['subject'],
-                            invoice_type=invoice_type
-                        )
-                        
-                        self.db.add(new_invoice)
-                        self.db.commit()
-                        self.db.refresh(new_invoice)
-                        
-                        stats['invoices_saved'] += 1
-                    
-                    except Exception as e:
-                        stats['errors'].append(f"{filename}: {str(e)}")
-                        self.db.rollback()
+            # Seconde du dernier message traité et messages traités dans cette seconde
+            last_second, last_ids = None, []
+            
+            def resume_cursor() -> Optional[str]:
+                """Curseur de reprise juste après le dernier message traité"""
+                if last_second is None:
+                    return spec.cursor
+                ids = last_ids
+                if cursor and cursor['before'] == last_second + 1:
+                    ids = list(seen) + last_ids
+                return encode_scan_cursor(last_second + 1, ids)
+            
+            # Une page de plus que le budget : sait-on s'il reste des messages ?
+            for msg_id in self._iter_message_ids(service, query, page_size=min(budget + 1, 500)):
+                if msg_id in seen:
+                    continue
+                
+                if stats['emails_scanned'] >= budget or time.monotonic() >= deadline:
+                    stats['next_cursor'] = resume_cursor()
+                    break
+                
+                try:
+                    email = self._fetch_email(service, msg_id, spec.mime_types)
+                except Exception as e:
+                    # Arrêt de la tranche : le curseur reste avant ce message,
+                    # qui sera relu à la reprise au lieu d'être sauté
+                    stats['errors'].append(f"Message {msg_id}: {str(e)}")
+                    stats['interrupted_at'] = msg_id
+                    stats['next_cursor'] = resume_cursor()
+                    break
+                
+                stats['emails_scanned'] += 1
+                self._process_email(email, stats)
+                
+                if email['internal_date'] != last_second:
+                    last_second, last_ids = email['internal_date'], []
+                last_ids.append(msg_id)
             
             return stats
         
         except Exception as e:
             stats['errors'].append(f"Erreur globale: {str(e)}")
             return stats
-            return stats
-
+    
+    def _process_email(self, email: Dict, stats: Dict) -> None:
+        """Analyse et enregistre les factures PDF d'un email (stats mises à jour)"""
+        for attachment in email['attachments']:
+            stats['invoices_found'] += 1
+            filename = attachment['filename']
+            file_info = None
+            
+            try:
+                # Vérifier si déjà traité (via l'empreinte du contenu)
+                content_hash = compute_content_hash(attachment['data'])
+                
+                if self._is_duplicate(content_hash, email['id']):
+                    stats['duplicates_skipped'] += 1
+                    continue
+                
+                # Extraire le texte
+                invoice_text = self.extract_text_from_pdf(attachment['data'], content_hash)
+                
+                if not invoice_text:
+                    stats['errors'].append(f"{filename}: Extraction texte échouée")
+                    continue
+                
+                # Analyser avec LLM
+                analysis = self.analyze_invoice_text(invoice_text)
+                
+                if not analysis:
+                    stats['errors'].append(f"{filename}: Analyse LLM échouée")
+                    continue
+                
+                stats['invoices_processed'] += 1
+                
+                # Sauvegarder le PDF
+                import io
+                file_info = save_invoice_pdf(
+                    user_id=self.user_id,
+                    filename=filename,
+                    file_content=io.BytesIO(attachment['data'])
+                )
+                
+                # Créer l'entrée en base
+                invoice_type = email.get('type', 'entrante')
+                
+                new_invoice = Invoice(
+                    user_id=self.user_id,
+                    invoice_number=analysis.get('invoice_number'),
+                    invoice_date=analysis.get('invoice_date'),
+                    due_date=analysis.get('due_date'),
+                    supplier=analysis.get('supplier', {}),
+                    client=analysis.get('client', {}),
+                    amounts=analysis.get('amounts', {}),
+                    category=analysis.get('category'),
+                    anomalies=analysis.get('anomalies', []),
+                    confidence_global=analysis.get('confidence_global', 0.0),
+                    file_path=file_info['file_path'],
+                    file_name=file_info['file_name'],
+                    content_hash=content_hash,
+                    email_id=email['id'],
+                    email_subject=email['subject'],
+                    invoice_type=invoice_type
+                )
+                
+                self.db.add(new_invoice)
+                self.db.commit()
+                self.db.refresh(new_invoice)
+                
+                stats['invoices_saved'] += 1
+            
+            except IntegrityError:
+                # Même fichier enregistré entre-temps par un autre scan
+                self.db.rollback()
+                stats['duplicates_skipped'] += 1
+                if file_info:
+                    delete_invoice_pdf(file_info['file_path'])
+            except Exception as e:
+                stats['errors'].append(f"{filename}: {str(e)}")
+                self.db.rollback()
+                # PDF sans facture en base : supprimé
+                if file_info:
+                    delete_invoice_pdf(file_info['file_path'])
@@ -0,0 +1,220 @@
+"""
+File de tâches persistante, stockée dans la base (PostgreSQL ou SQLite)
+
+Les routes API ne font qu'enregistrer un Job ; des workers séparés
+(python -m app.worker) les réservent, les exécutent et enregistrent le
+résultat. Un échec est retenté avec un délai exponentiel.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import or_, and_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def get_active_job(db: Session, user_id: int, kind: str) -> Optional[Job]:
+    """Job en attente ou en cours pour cet utilisateur et ce type"""
+    return db.query(Job).filter(
+        Job.user_id == user_id,
+        Job.kind == kind,
+        Job.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+
+def enqueue_job(db: Session, user_id: int, kind: str, payload: Optional[Dict] = None) -> Job:
+    """
+    Ajoute une tâche à la file
+
+    Si une tâche du même type est déjà active pour l'utilisateur, elle est
+    retournée telle quelle (pas de scans concurrents pour un même compte).
+    """
+    existing = get_active_job(db, user_id, kind)
+    if existing:
+        return existing
+
+    job = Job(
+        user_id=user_id,
+        kind=kind,
+        payload=payload or {},
+        status=JOB_QUEUED,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_after=_utcnow()
+    )
+
+    try:
+        db.add(job)
+        db.commit()
+    except IntegrityError:
+        # Une autre requête a créé le job entre-temps (index unique partiel)
+        db.rollback()
+        return get_active_job(db, user_id, kind)
+
+    db.refresh(job)
+    return job
+
+
+def _expire_stale_jobs(db: Session, stale_before: datetime) -> None:
+    """Tâches au verrou expiré sans tentative restante : échec définitif"""
+    db.execute(
+        update(Job)
+        .where(
+            Job.status == JOB_RUNNING,
+            Job.locked_at < stale_before,
+            Job.attempts >= Job.max_attempts
+        )
+        .values(
+            status=JOB_FAILED,
+            error="Verrou expiré (worker arrêté) après la dernière tentative",
+            locked_by=None,
+            finished_at=_utcnow()
+        )
+        # Pas d'évaluation en Python sur les objets de la session : SQLite
+        # rend des dates naïves, non comparables à stale_before
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[Job]:
+    """
+    Réserve la prochaine tâche exécutable
+
+    Les tâches 'running' dont le verrou a expiré (worker arrêté en cours
+    de route, plus de heartbeat) sont reprises s'il leur reste une
+    tentative, sinon passées en échec. Le Job retourné est détaché de la
+    session et la transaction de réservation est close : rien ne reste
+    ouvert en base pendant l'exécution.
+    """
+    now = _utcnow()
+    stale_before = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    _expire_stale_jobs(db, stale_before)
+
+    claimable = or_(
+        and_(Job.status == JOB_QUEUED, Job.run_after <= now),
+        and_(Job.status == JOB_RUNNING, Job.locked_at < stale_before, Job.attempts < Job.max_attempts)
+    )
+
+    while True:
+        candidate = db.query(Job.id).filter(claimable).order_by(
+            Job.run_after, Job.id
+        ).with_for_update(skip_locked=True).first()
+
+        if candidate is None:
+            db.rollback()
+            return None
+
+        # Réservation atomique : échoue si un autre worker l'a prise entre-temps
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == candidate.id, claimable)
+            .values(
+                status=JOB_RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                started_at=now,
+                attempts=Job.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        if claimed.rowcount == 1:
+            job = db.get(Job, candidate.id)
+            db.expunge(job)
+            db.rollback()
+            return job
+
+
+def _owned(job: Job):
+    """Condition : la tâche est toujours réservée par ce worker"""
+    return and_(Job.id == job.id, Job.status == JOB_RUNNING, Job.locked_by == job.locked_by)
+
+
+def heartbeat_job(db: Session, job: Job) -> bool:
+    """
+    Prolonge le verrou de la tâche (locked_at)
+
+    Retourne False si la tâche n'appartient plus à ce worker (verrou
+    expiré puis repris ailleurs).
+    """
+    refreshed = db.execute(update(Job).where(_owned(job)).values(locked_at=_utcnow()))
+    db.commit()
+    return refreshed.rowcount == 1
+
+
+def complete_job(db: Session, job: Job, result: Dict) -> bool:
+    """
+    Marque la tâche comme réussie
+
+    Retourne False (rien n'est écrit) si le verrou a été perdu.
+    """
+    job.status = JOB_SUCCEEDED
+    job.result = result
+    job.error = None
+    job.finished_at = _utcnow()
+
+    completed = db.execute(
+        update(Job)
+        .where(_owned(job))
+        .values(status=job.status, result=result, error=None, locked_by=None, finished_at=job.finished_at)
+    )
+    db.commit()
+    return completed.rowcount == 1
+
+
+def retry_delay(attempts: int) -> float:
+    """Délai avant nouvelle tentative : exponentiel avec gigue, plafonné"""
+    base = settings.JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(base, settings.JOB_RETRY_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+
+def fail_job(
+    db: Session,
+    job: Job,
+    error: str,
+    result: Optional[Dict] = None,
+    retry: bool = True,
+    payload: Optional[Dict] = None
+) -> bool:
+    """
+    Enregistre l'échec ; la tâche est replanifiée tant qu'il reste des
+    tentatives (et si retry), avec payload s'il est fourni (reprise là où
+    la tentative s'est arrêtée)
+
+    Retourne False (rien n'est écrit) si le verrou a été perdu.
+    """
+    job.error = error
+    job.result = result
+    values = {"error": error, "result": result, "locked_by": None}
+
+    if retry and job.attempts < job.max_attempts:
+        job.status = JOB_QUEUED
+        values["run_after"] = _utcnow() + timedelta(seconds=retry_delay(job.attempts))
+        if payload is not None:
+            job.payload = payload
+            values["payload"] = payload
+    else:
+        job.status = JOB_FAILED
+        values["finished_at"] = _utcnow()
+    values["status"] = job.status
+
+    failed = db.execute(update(Job).where(_owned(job)).values(**values))
+    db.commit()
+    return failed.rowcount == 1
@@ -0,0 +1,364 @@
+"""
+Extraction locale des champs d'une facture (règles, expressions régulières, mise en page)
+
+Les PDF générés par logiciel ont une mise en page stable (ex:
+agent_generation/data/html_template) : numéro, dates, SIRET, TVA et
+montants HT/TVA/TTC se retrouvent derrière des libellés connus. Cette
+extraction prend quelques millisecondes, hors ligne ; le LLM n'est
+appelé que si la confiance obtenue est insuffisante.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.schemas.llm_output import InvoiceExtraction, coerce_amount
+
+
+# Version des règles (à incrémenter si l'extraction change)
+LOCAL_EXTRACTOR_VERSION = "rules-1"
+
+# Poids des champs dans la confiance globale
+FIELD_WEIGHTS = {
+    "invoice_number": 0.2,
+    "invoice_date": 0.1,
+    "supplier_name": 0.2,
+    "supplier_id": 0.1,
+    "amounts": 0.4,
+}
+
+# Fournisseur identifié : SIRET/TVA présent et nom pris derrière un libellé
+# (ou profil reconnu). Sans cela le LLM est toujours appelé, quel que soit
+# le score global.
+MIN_SUPPLIER_ID_CONFIDENCE = 0.5
+
+FRENCH_MONTHS = {
+    "janvier": 1, "février": 2, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6,
+    "juillet": 7, "août": 8, "aout": 8, "septembre": 9, "octobre": 10,
+    "novembre": 11, "décembre": 12, "decembre": 12,
+}
+
+DATE_PATTERN = (
+    r"(\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}|\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}\s+(?:" + "|".join(FRENCH_MONTHS) + r")\s+\d{4})"
+)
+AMOUNT_PATTERN = r"(-?(?:\d{1,3}(?:[ \u00a0\u202f.]\d{3})+|\d+)(?:[.,]\d{1,2})?)(?!\d)\s*(?:€|EUR)?"
+
+INVOICE_NUMBER_RE = re.compile(
+    r"(?:facture\s*(?:n[°o]|num[ée]ro|#)|n[°o]\s*(?:de\s*)?facture|invoice\s*(?:n[°o]|number|#))"
+    r"\s*:?\s*([A-Z0-9][A-Z0-9\-_/.]{2,})",
+    re.IGNORECASE
+)
+DUE_DATE_RE = re.compile(
+    r"(?:[ée]ch[ée]ance|date\s*limite|due\s*date|payable\s*(?:avant\s*)?le)\s*:?\s*" + DATE_PATTERN,
+    re.IGNORECASE
+)
+INVOICE_DATE_RE = re.compile(
+    r"(?<![ée]ch[ée]ance )(?:date\s*(?:de\s*(?:la\s*)?facture|d['’]\s*[ée]mission|de\s*facturation)?|invoice\s*date|[ée]mise?\s*le)"
+    r"\s*:?\s*" + DATE_PATTERN,
+    re.IGNORECASE
+)
+SIRET_RE = re.compile(r"SIRE[TN]\s*(?:n[°o])?\s*:?\s*(\d{3}\s?\d{3}\s?\d{3}(?:\s?\d{5})?)", re.IGNORECASE)
+VAT_RE = re.compile(r"\b(FR\s?[0-9A-Z]{2}\s?\d{3}\s?\d{3}\s?\d{3})\b", re.IGNORECASE)
+HT_RE = re.compile(
+    r"(?:sous[\s\-]total|total\s*h\.?t\.?|montant\s*h\.?t\.?|total\s*hors\s*taxes?)\s*(?:\(€\))?\s*:?\s*" + AMOUNT_PATTERN,
+    re.IGNORECASE
+)
+TVA_RE = re.compile(
+    r"\b(?:total\s*)?t\.?v\.?a\.?\s*(?:\(?\s*(\d{1,2}(?:[.,]\d{1,2})?)\s*%\s*\)?)?\s*:?\s*" + AMOUNT_PATTERN,
+    re.IGNORECASE
+)
+TTC_RE = re.compile(
+    r"(?:total\s*t\.?t\.?c\.?|montant\s*t\.?t\.?c\.?|total\s*[àa]\s*payer|net\s*[àa]\s*payer|montant\s*d[ûu])"
+    r"\s*(?:\(€\))?\s*:?\s*" + AMOUNT_PATTERN,
+    re.IGNORECASE
+)
+
+# Libellés de bloc (mise en page) : le nom suit le libellé
+SUPPLIER_LABELS = re.compile(
+    r"^(?:(?:[ée]metteur|fournisseur|vendeur|prestataire)\b|de\s*:)\s*:?\s*(.*)$", re.IGNORECASE
+)
+CLIENT_LABELS = re.compile(
+    r"^(?:(?:client|destinataire|acheteur)\b|factur[ée]\s*[àa]|adress[ée]\s*[àa])\s*:?\s*(.*)$", re.IGNORECASE
+)
+# Lignes qui ne peuvent pas être un nom d'entreprise
+NOT_A_NAME = re.compile(
+    r"^(?:facture|invoice|date|[ée]ch[ée]ance|paiement|conditions|siret|siren|tva|t[ée]l|tel|france|"
+    r"informations|d[ée]tails|page)\b|@|https?://|^\d",
+    re.IGNORECASE
+)
+
+# Catégorisation par mots-clés (les libellés de agent_factures/context.txt)
+CATEGORY_KEYWORDS = [
+    ("infrastructure / hosting / cloud", r"h[ée]bergement|serveur|cloud|hosting|datacenter|nom de domaine"),
+    ("SaaS / abonnement", r"abonnement|licence|saas|souscription"),
+    ("telecom", r"forfait mobile|t[ée]l[ée]phonie|fibre|internet|box|sms"),
+    ("marketing / publicité", r"publicit[ée]|campagne|marketing|annonce|seo"),
+    ("consulting / prestation", r"conseil|consulting|prestation|audit|accompagnement|d[ée]veloppement"),
+    ("formation", r"formation|atelier|s[ée]minaire"),
+    ("transport / mobilité", r"transport|livraison|taxi|vtc|billet|train|carburant"),
+    ("restauration / repas", r"restaurant|repas|traiteur|d[ée]jeuner"),
+    ("matériel / hardware", r"ordinateur|[ée]cran|mat[ée]riel|imprimante|clavier"),
+    ("energie", r"[ée]lectricit[ée]|gaz|[ée]nergie|kwh"),
+    ("assurance", r"assurance|cotisation|sinistre"),
+    ("maintenance", r"maintenance|r[ée]paration|entretien|d[ée]pannage"),
+]
+
+
+def luhn_valid(number: str) -> bool:
+    """Clé de Luhn (SIREN / SIRET)"""
+    total = 0
+    for i, char in enumerate(reversed(number)):
+        digit = int(char)
+        if i % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def vat_valid(vat: str) -> bool:
+    """Clé de contrôle d'un numéro de TVA intracommunautaire français"""
+    if not re.fullmatch(r"FR\d{11}", vat):
+        # Clés alphanumériques : non vérifiables simplement
+        return bool(re.fullmatch(r"FR[0-9A-Z]{2}\d{9}", vat))
+    siren = int(vat[4:])
+    return int(vat[2:4]) == (12 + 3 * (siren % 97)) % 97
+
+
+def parse_date(value: str) -> Optional[str]:
+    """Date texte ("15/03/2024", "2024-03-15", "15 mars 2024") -> YYYY-MM-DD"""
+    value = value.strip().lower()
+    match = re.fullmatch(r"(\d{1,2})\s+([a-zéû]+)\s+(\d{4})", value)
+    try:
+        if match:
+            month = FRENCH_MONTHS.get(match.group(2))
+            if not month:
+                return None
+            return datetime(int(match.group(3)), month, int(match.group(1))).date().isoformat()
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y"):
+            try:
+                return datetime.strptime(value, fmt).date().isoformat()
+            except ValueError:
+                continue
+    except ValueError:
+        return None
+    return None
+
+
+def _lines(text: str) -> List[str]:
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _name_after_label(lines: List[str], pattern: re.Pattern) -> Optional[str]:
+    """Nom d'entreprise sur la ligne du libellé ou la suivante"""
+    for i, line in enumerate(lines):
+        match = pattern.match(line)
+        if not match:
+            continue
+        candidates = [match.group(1)] + lines[i + 1:i + 3]
+        for candidate in candidates:
+            candidate = candidate.strip(" :")
+            if candidate and not NOT_A_NAME.search(candidate):
+                return candidate
+    return None
+
+
+def _client_section_start(text: str) -> int:
+    """Position du bloc client dans le texte (les identifiants après appartiennent au client)"""
+    for line_match in re.finditer(r"^.*$", text, re.MULTILINE):
+        if CLIENT_LABELS.match(line_match.group(0).strip()):
+            return line_match.start()
+    return -1
+
+
+def _split_parties(matches: List[Tuple[int, str]], client_start: int) -> Tuple[Optional[str], Optional[str]]:
+    """Répartit les identifiants trouvés entre fournisseur et client selon la mise en page"""
+    if client_start >= 0:
+        supplier = next((value for pos, value in matches if pos < client_start), None)
+        client = next((value for pos, value in matches if pos >= client_start), None)
+        return supplier, client
+    # Sans bloc client identifié : le premier est celui de l'émetteur
+    values = [value for _, value in matches]
+    return (values[0] if values else None), (values[1] if len(values) > 1 else None)
+
+
+def _last_amount(pattern: re.Pattern, text: str, group: int = 1) -> Optional[float]:
+    """Dernière occurrence (les totaux sont en bas de facture)"""
+    matches = list(pattern.finditer(text))
+    for match in reversed(matches):
+        try:
+            value = coerce_amount(match.group(group))
+        except ValueError:
+            continue
+        if value is not None:
+            return value
+    return None
+
+
+def categorize(text: str) -> Optional[str]:
+    """Catégorie métier par mots-clés (None si aucune ne ressort)"""
+    lowered = text.lower()
+    scores = [(len(re.findall(keywords, lowered)), category) for category, keywords in CATEGORY_KEYWORDS]
+    best = max(scores)
+    return best[1] if best[0] > 0 else None
+
+
+class LocalInvoiceExtractor:
+    """Extraction par règles, avec confiance par champ et globale"""
+
+    def extract(self, text: str) -> Dict:
+        """
+        Extrait les champs d'une facture à partir de son texte
+
+        Returns:
+            dict: {
+                "analysis": dict au format de l'analyse LLM (InvoiceExtraction),
+                "confidence": confiance globale (0 à 1),
+                "field_confidence": confiance par champ
+            }
+        """
+        lines = _lines(text)
+        anomalies: List[str] = []
+        confidence: Dict[str, float] = {}
+
+        # Numéro de facture
+        match = INVOICE_NUMBER_RE.search(text)
+        invoice_number = match.group(1).rstrip(".") if match else None
+        confidence["invoice_number"] = 1.0 if invoice_number else 0.0
+        if not invoice_number:
+            anomalies.append("absence de numéro de facture")
+
+        # Dates (l'échéance est cherchée d'abord pour ne pas la confondre)
+        match = DUE_DATE_RE.search(text)
+        due_date = parse_date(match.group(1)) if match else None
+        invoice_date = None
+        for match in INVOICE_DATE_RE.finditer(text):
+            candidate = parse_date(match.group(1))
+            if candidate and candidate != due_date:
+                invoice_date = candidate
+                break
+        confidence["invoice_date"] = 1.0 if invoice_date else 0.0
+        if invoice_date and due_date and due_date < invoice_date:
+            anomalies.append("date d'échéance antérieure à la date de facture")
+            confidence["invoice_date"] = 0.5
+
+        # Identifiants légaux, répartis selon la position du bloc client
+        client_start = _client_section_start(text)
+        sirets = [(m.start(), re.sub(r"\s", "", m.group(1))) for m in SIRET_RE.finditer(text)]
+        vats = [(m.start(), re.sub(r"\s", "", m.group(1)).upper()) for m in VAT_RE.finditer(text)]
+        supplier_siret, client_siret = _split_parties(sirets, client_start)
+        supplier_vat, client_vat = _split_parties(vats, client_start)
+
+        siret_ok = bool(supplier_siret) and luhn_valid(supplier_siret)
+        vat_ok = bool(supplier_vat) and vat_valid(supplier_vat)
+        if supplier_siret and not siret_ok:
+            anomalies.append("SIRET fournisseur invalide (clé de contrôle)")
+        if supplier_vat and not vat_ok:
+            anomalies.append("numéro de TVA fournisseur invalide")
+        mismatch = siret_ok and vat_ok and supplier_vat[4:] != supplier_siret[:9]
+        if mismatch:
+            anomalies.append("TVA intracommunautaire et SIRET fournisseur incohérents")
+        if not supplier_siret and not supplier_vat:
+            anomalies.append("absence de SIRET et de TVA intracommunautaire du fournisseur")
+
+        if (siret_ok or vat_ok) and not mismatch:
+            supplier_id = 1.0
+        elif supplier_siret or supplier_vat:
+            supplier_id = 0.5
+        else:
+            supplier_id = 0.0
+        confidence["supplier_id"] = supplier_id
+
+        # Noms : bloc libellé (Émetteur / Client), sinon première ligne d'en-tête
+        supplier_name = _name_after_label(lines, SUPPLIER_LABELS)
+        if not supplier_name:
+            supplier_name = next((line for line in lines[:5] if not NOT_A_NAME.search(line)), None)
+            confidence["supplier_name"] = 0.8 if supplier_name else 0.0
+        else:
+            confidence["supplier_name"] = 1.0
+        client_name = _name_after_label(lines, CLIENT_LABELS)
+
+        # Montants
+        ht = _last_amount(HT_RE, text)
+        ttc = _last_amount(TTC_RE, text)
+        tva_rate = None
+        tva = None
+        for match in reversed(list(TVA_RE.finditer(text))):
+            try:
+                tva = coerce_amount(match.group(2))
+            except ValueError:
+                continue
+            tva_rate = coerce_amount(match.group(1)) if match.group(1) else None
+            # "TVA 20 %" sans montant : le taux a été pris pour le montant
+            if tva is not None:
+                break
+
+        amounts_confidence = 0.0
+        if ht is not None and tva is not None and ttc is not None:
+            if abs(ht + tva - ttc) <= 0.02:
+                amounts_confidence = 1.0
+            else:
+                anomalies.append("incohérence : HT + TVA ≠ TTC")
+                amounts_confidence = 0.3
+        elif ttc is not None:
+            # Montant manquant déduit des deux autres
+            if ht is not None:
+                tva = round(ttc - ht, 2)
+                amounts_confidence = 0.7
+            elif tva is not None:
+                ht = round(ttc - tva, 2)
+                amounts_confidence = 0.7
+            else:
+                amounts_confidence = 0.5
+        elif ht is not None and tva is not None:
+            ttc = round(ht + tva, 2)
+            amounts_confidence = 0.6
+        if tva_rate is None and ht and tva is not None:
+            tva_rate = round(tva / ht * 100, 1)
+        if tva_rate is not None and ht and tva is not None and abs(ht * tva_rate / 100 - tva) > 0.05:
+            anomalies.append("taux de TVA incohérent avec les montants")
+            amounts_confidence = min(amounts_confidence, 0.5)
+        confidence["amounts"] = amounts_confidence
+
+        global_confidence = sum(FIELD_WEIGHTS[field] * confidence[field] for field in FIELD_WEIGHTS)
+
+        analysis = InvoiceExtraction.model_validate({
+            "invoice_number": invoice_number,
+            "invoice_date": invoice_date,
+            "due_date": due_date,
+            "supplier": {"name": supplier_name, "siret": supplier_siret, "vat": supplier_vat},
+            "client": {"name": client_name, "siret": client_siret, "vat": client_vat},
+            "amounts": {"ht": ht, "tva": tva, "tva_rate": tva_rate, "ttc": ttc, "currency": "EUR"},
+            "category": categorize(text),
+            "anomalies": anomalies,
+            "confidence_global": round(global_confidence, 2),
+        }).model_dump()
+
+        return {
+            "analysis": analysis,
+            "confidence": round(global_confidence, 2),
+            "field_confidence": confidence,
+        }
+
+
+def supplier_identified(result: Dict) -> bool:
+    """Le fournisseur est-il identifié avec assez de certitude pour se passer du LLM ?"""
+    confidence = result["field_confidence"]
+    return confidence["supplier_id"] >= MIN_SUPPLIER_ID_CONFIDENCE and confidence["supplier_name"] >= 1.0
+
+
+def fill_missing(analysis: Dict, local_analysis: Dict) -> Dict:
+    """Complète les champs laissés à null par le LLM avec ceux trouvés localement"""
+    for key, value in local_analysis.items():
+        if isinstance(value, dict) and isinstance(analysis.get(key), dict):
+            for sub_key, sub_value in value.items():
+                if analysis[key].get(sub_key) is None and sub_value is not None:
+                    analysis[key][sub_key] = sub_value
+        elif analysis.get(key) is None and value is not None:
+            analysis[key] = value
+    return analysis
+
+
+# Extracteur partagé (sans état)
+local_extractor = LocalInvoiceExtractor()
@@ -3,12 +3,13 @@ Service d'optimisation fiscale et analyse comptable intégré
 """
 import json
 from typing import Dict, List, Optional
-from pathlib import Path
 from datetime import datetime
-from groq import Groq
 from sqlalchemy.orm import Session
 
-from app.core.config import settings
+from app.core.llm import llm_gateway
+from app.core.prompts import prompt_store
+from app.core.structured_output import parse_structured, reask_with
+from app.schemas.llm_output import OptimisationResult
 from app.models.invoice import Invoice
 from app.models.transaction import Transaction
 
@@ -16,40 +17,32 @@ from app.models.transaction import Transaction
 class OptimisationService:
     """Service d'analyse et d'optimisation comptable"""
     
-    def __init__(self):
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        
-        self.context = self._load_context()
-        self.prompt_template = self._load_prompt_template()
+    @property
+    def context(self) -> str:
+        """Contexte pour l'analyse (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "Agent_optimisation/context.txt",
+            default="Tu es un agent d'optimisation comptable."
+        )
     
-    def _load_context(self) -> str:
-        """Charge le contexte pour l'analyse"""
-        context_path = Path(__file__).parent.parent.parent.parent / "Agent_optimisation" / "context.txt"
-        try:
-            with open(context_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            return "Tu es un agent d'optimisation comptable."
-    
-    def _load_prompt_template(self) -> str:
-        """Charge le template de prompt"""
-        prompt_path = Path(__file__).parent.parent.parent.parent / "Agent_optimisation" / "prompt.txt"
-        try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            return "Factures: {{factures_json}}\n\nRapprochements: {{rapprochements_json}}"
+    @property
+    def prompt_template(self) -> str:
+        """Template de prompt (préchargé, rechargé à chaud)"""
+        return prompt_store.get(
+            "Agent_optimisation/prompt.txt",
+            default="Factures: {{factures_json}}\n\nRapprochements: {{rapprochements_json}}"
+        )
     
     def _prepare_facture_data(self, invoice: Invoice) -> Dict:
         """Prépare les données d'une facture pour l'analyse"""
         return {
             "id": str(invoice.id),
             "numero": invoice.invoice_number or "N/A",
-            "fournisseur": invoice.supplier.get('name') if isinstance(invoice.supplier, dict) else str(invoice.supplier),
+            "fournisseur": invoice.supplier_name,
             "date": str(invoice.invoice_date) if invoice.invoice_date else None,
             "date_echeance": str(invoice.due_date) if invoice.due_date else None,
-            "montant_ttc": invoice.amounts.get('ttc') if isinstance(invoice.amounts, dict) else 0,
-            "devise": invoice.amounts.get('currency', 'EUR') if isinstance(invoice.amounts, dict) else 'EUR',
+            "montant_ttc": invoice.amount_ttc or 0,
+            "devise": invoice.currency or 'EUR',
             "categorie": invoice.category or "non catégorisé",
             "invoice_type": "reçue" if invoice.invoice_type == "entrante" else "envoyée" if invoice.invoice_type == "sortante" else None,
             "anomalies": invoice.anomalies or [],
@@ -63,7 +56,7 @@ class OptimisationService:
                 "facture_id": str(invoice.id),
                 "rapprochee": True,
                 "date_paiement": str(transaction.date)[:7] if transaction.date else None,  # YYYY-MM
-                "ecart_montant": abs(invoice.amounts.get('ttc', 0) - abs(transaction.amount)) if isinstance(invoice.amounts, dict) else 0,
+                "ecart_montant": abs((invoice.amount_ttc or 0) - abs(transaction.amount)),
                 "ecart_jours": (transaction.date - invoice.invoice_date).days if transaction.date and invoice.invoice_date else 0,
                 "niveau_confiance": transaction.reconciliation_confidence or 0.0
             }
@@ -142,59 +135,57 @@ class OptimisationService:
             prompt = prompt.replace("{{factures_json}}", factures_json)
             prompt = prompt.replace("{{rapprochements_json}}", rapprochements_json)
             
-            # Appel à Groq
-            response = self.groq_client.chat.completions.create(
-                model=settings.MODEL_NAME_analyse,
-                messages=[
-                    {"role": "system", "content": self.context},
-                    {"role": "user", "content": prompt}
-                ],
+            # Appel au LLM (passerelle partagée)
+            messages = [
+                {"role": "system", "content": self.context},
+                {"role": "user", "content": prompt}
+            ]
+            response = llm_gateway.chat_completion(
+                agent="optimisation",
+                messages=messages,
                 response_format={"type": "json_object"}
             )
             
-            raw_content = response.choices[0].message.content
-            result = json.loads(raw_content)
-            
-            return result
+            # Validation + réparation locale, relance ciblée si des champs manquent
+            return parse_structured(
+                response.choices[0].message.content,
+                OptimisationResult,
+                agent="optimisation",
+                reask=reask_with(llm_gateway, "optimisation", response_format={"type": "json_object"}),
+                messages=messages
+            )
         
         except Exception:
             return None
     
-    def get_tva_analysis(self, user_id: int, db: Session) -> Dict:
+    def tva_summary(self, tva_collectee: float, tva_deductible: float) -> Dict:
         """
-        Analyse spécifique de la TVA
+        Analyse de la TVA à partir des totaux (calculés par la base)
+        
+        Args:
+            tva_collectee: TVA sur factures émises
+            tva_deductible: TVA sur factures reçues
         
         Returns:
             dict: Analyse de la TVA
         """
-        try:
-            invoices = db.query(Invoice).filter(Invoice.user_id == user_id).all()
-            
-            tva_collectee = 0.0  # TVA sur factures émises
-            tva_deductible = 0.0  # TVA sur factures reçues
-            
-            for invoice in invoices:
-                if isinstance(invoice.amounts, dict):
-                    tva = invoice.amounts.get('tva', 0)
-                    if invoice.invoice_type == "sortante":
-                        tva_collectee += tva
-                    elif invoice.invoice_type == "entrante":
-                        tva_deductible += tva
-            
-            tva_a_payer = tva_collectee - tva_deductible
-            
-            return {
-                "tva_collectee": round(tva_collectee, 2),
-                "tva_deductible": round(tva_deductible, 2),
-                "tva_a_payer": round(tva_a_payer, 2),
-                "conseil": "Pensez à déclarer votre TVA avant la date limite." if tva_a_payer > 0 else "Vous êtes en crédit de TVA."
-            }
+        tva_a_payer = tva_collectee - tva_deductible
         
-        except Exception:
-            return {
-                "tva_collectee": 0.0,
-                "tva_deductible": 0.0,
-                "tva_a_payer": 0.0,
-                "conseil": "Erreur lors du calcul de la TVA"
-            }
+        return {
+            "tva_collectee": round(tva_collectee, 2),
+            "tva_deductible": round(tva_deductible, 2),
+            "tva_a_payer": round(tva_a_payer, 2),
+            "conseil": "Pensez à déclarer votre TVA avant la date limite." if tva_a_payer > 0 else "Vous êtes en crédit de TVA."
+        }
+    
+    def tva_error(self) -> Dict:
+        return {
+            "tva_collectee": 0.0,
+            "tva_deductible": 0.0,
+            "tva_a_payer": 0.0,
+            "conseil": "Erreur lors du calcul de la TVA"
+        }
+
 
+# Service partagé (sans état propre à une requête)
+optimisation_service = OptimisationService()
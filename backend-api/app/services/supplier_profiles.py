@@ -0,0 +1,472 @@
+"""
+Profils fournisseurs appris à partir des factures validées
+
+Pour chaque fournisseur (SIRET ou TVA intracommunautaire) d'une facture
+validée, on repère dans le texte extrait du PDF le libellé qui précède
+chaque valeur validée (numéro, dates, montants). Les factures suivantes
+du même fournisseur sont lues à partir de ces ancres, sans LLM : la part
+d'appels LLM baisse à mesure que la base fournisseurs se stabilise.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.logger import logger
+from app.core.storage import get_invoice_pdf_path
+from app.models.invoice import Invoice
+from app.models.supplier_profile import SupplierProfile
+from app.models.user import User
+from app.schemas.llm_output import coerce_amount
+from app.services.local_extractor import FIELD_WEIGHTS, FRENCH_MONTHS, AMOUNT_PATTERN, DATE_PATTERN, parse_date
+
+
+# Champs appris : chemin dans l'analyse -> type de valeur
+PROFILE_FIELDS = {
+    "invoice_number": "text",
+    "invoice_date": "date",
+    "due_date": "date",
+    "amounts.ht": "amount",
+    "amounts.tva": "amount",
+    "amounts.ttc": "amount",
+}
+
+# Longueur maximale d'un libellé (fin de ligne précédant la valeur)
+MAX_LABEL_LENGTH = 40
+
+# Factures validées récentes lues pour connaître les identifiants de l'utilisateur
+# (présents sur chacune de ses factures : un échantillon suffit)
+OWN_KEYS_SAMPLE = 200
+
+# Recouvrement du repère d'apprentissage : une facture validée dans une
+# transaction encore ouverte au début de l'apprentissage n'est pas manquée
+LEARN_WATERMARK_OVERLAP = timedelta(minutes=1)
+
+_TEXT_VALUE_RE = re.compile(r"[A-Z0-9][A-Z0-9\-_/.]*", re.IGNORECASE)
+_DATE_VALUE_RE = re.compile(DATE_PATTERN, re.IGNORECASE)
+_AMOUNT_VALUE_RE = re.compile(AMOUNT_PATTERN)
+
+
+def _label(text: str) -> str:
+    """Libellé normalisé ; les nombres (taux, autres valeurs) deviennent #"""
+    text = re.sub(r"\d[\d.,]*", "#", text)
+    return re.sub(r"\s+", " ", text).strip().lower()[-MAX_LABEL_LENGTH:].strip()
+
+
+def _label_pattern(label: str) -> re.Pattern:
+    """Libellé recherché sans tenir compte de la casse, des espaces ni des nombres"""
+    words = [re.escape(word).replace(r"\#", r"[\d.,]+") for word in label.split()]
+    return re.compile(r"\s*".join(words), re.IGNORECASE)
+
+
+def supplier_keys(supplier: Optional[Dict]) -> List[str]:
+    """Clés d'identification d'un fournisseur (SIRET puis TVA)"""
+    if not isinstance(supplier, dict):
+        return []
+    keys = []
+    siret = re.sub(r"\s", "", str(supplier.get("siret") or ""))
+    vat = re.sub(r"\s", "", str(supplier.get("vat") or "")).upper()
+    if siret:
+        keys.append(f"siret:{siret}")
+    if vat:
+        keys.append(f"vat:{vat}")
+    return keys
+
+
+def _get_field(analysis: Dict, path: str):
+    value = analysis
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _set_field(analysis: Dict, path: str, value) -> None:
+    parts = path.split(".")
+    target = analysis
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def _value_variants(value, kind: str) -> List[str]:
+    """Représentations possibles d'une valeur validée dans le texte du PDF"""
+    if value in (None, ""):
+        return []
+    if kind == "text":
+        return [str(value)]
+
+    if kind == "date":
+        if isinstance(value, str):
+            try:
+                value = datetime.strptime(value[:10], "%Y-%m-%d").date()
+            except ValueError:
+                return [value]
+        if not isinstance(value, date):
+            return []
+        month_name = next(name for name, number in FRENCH_MONTHS.items() if number == value.month)
+        return [
+            value.strftime("%d/%m/%Y"), value.isoformat(), value.strftime("%d.%m.%Y"),
+            value.strftime("%d-%m-%Y"), f"{value.day} {month_name} {value.year}",
+            value.strftime("%d/%m/%y"),
+        ]
+
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return []
+    plain = f"{amount:.2f}"
+    grouped = f"{amount:,.2f}".replace(",", " ")
+    variants = [
+        grouped, grouped.replace(".", ","), plain, plain.replace(".", ","),
+        f"{amount:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+    ]
+    if amount == int(amount):
+        variants.append(str(int(amount)))
+    # Les plus longues d'abord ("1 200,00" avant "1200")
+    return sorted(set(variants), key=len, reverse=True)
+
+
+def learn_anchors(text: str, analysis: Dict) -> Dict[str, Dict]:
+    """
+    Repère le libellé qui précède chaque valeur validée
+
+    Returns:
+        dict: {champ: {"label": ..., "next_line": bool, "index": n}}
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    anchors: Dict[str, Dict] = {}
+
+    for path, kind in PROFILE_FIELDS.items():
+        variants = _value_variants(_get_field(analysis, path), kind)
+        found = None
+        for variant in variants:
+            pattern = re.compile(r"(?<![\w.,])" + re.escape(variant) + r"(?![\w]|[.,]\d)", re.IGNORECASE)
+            for i, line in enumerate(lines):
+                match = pattern.search(line)
+                if not match:
+                    continue
+                label = _label(line[:match.start()])
+                next_line = False
+                if not label and i > 0:
+                    label = _label(lines[i - 1])
+                    next_line = True
+                if any(char.isalpha() for char in label):
+                    found = (label, next_line, i)
+                    break
+            if found:
+                break
+        if not found:
+            continue
+
+        label, next_line, line_index = found
+        # Rang du libellé parmi ses occurrences (ex: "total" apparaît plusieurs fois)
+        label_re = _label_pattern(label)
+        label_lines = [i for i, line in enumerate(lines) if label_re.search(line)]
+        source_line = line_index - 1 if next_line else line_index
+        index = label_lines.index(source_line) if source_line in label_lines else 0
+        anchors[path] = {"label": label, "next_line": next_line, "index": index}
+
+    return anchors
+
+
+def _parse_value(raw: str, kind: str):
+    if kind == "text":
+        match = _TEXT_VALUE_RE.search(raw)
+        return match.group(0).rstrip(".") if match else None
+    if kind == "date":
+        match = _DATE_VALUE_RE.search(raw)
+        return parse_date(match.group(1)) if match else None
+    match = _AMOUNT_VALUE_RE.search(raw)
+    if not match:
+        return None
+    try:
+        return coerce_amount(match.group(1))
+    except ValueError:
+        return None
+
+
+def apply_anchors(text: str, anchors: Dict[str, Dict]) -> Dict[str, object]:
+    """Lit les champs d'une facture à partir des ancres d'un profil"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    values: Dict[str, object] = {}
+
+    for path, anchor in anchors.items():
+        kind = PROFILE_FIELDS.get(path)
+        if not kind:
+            continue
+        label_re = _label_pattern(anchor["label"])
+        matches = [(i, m) for i, line in enumerate(lines) for m in [label_re.search(line)] if m]
+        if not matches:
+            continue
+        index = anchor.get("index", 0)
+        i, match = matches[index] if index < len(matches) else matches[-1]
+
+        if anchor.get("next_line"):
+            raw = lines[i + 1] if i + 1 < len(lines) else ""
+        else:
+            raw = lines[i][match.end():]
+        value = _parse_value(raw, kind)
+        if value is not None:
+            values[path] = value
+
+    return values
+
+
+def own_keys(db: Session, user_id: int) -> Set[str]:
+    """
+    Identifiants (SIRET, TVA) de l'utilisateur lui-même, d'après ses factures
+    validées les plus récentes : client des factures reçues, émetteur des
+    factures émises
+    """
+    keys: Set[str] = set()
+    rows = db.query(Invoice.invoice_type, Invoice.supplier, Invoice.client).filter(
+        Invoice.user_id == user_id,
+        Invoice.is_validated == True
+    ).order_by(Invoice.id.desc()).limit(OWN_KEYS_SAMPLE).all()
+    for invoice_type, supplier, client in rows:
+        keys.update(supplier_keys(supplier if invoice_type == "sortante" else client))
+    return keys
+
+
+def load_profiles(db: Session, user_id: int, excluded: Optional[Set[str]] = None) -> Dict[str, Dict]:
+    """
+    Profils de l'utilisateur indexés par SIRET et TVA (données détachées de la session)
+
+    Les identifiants de l'utilisateur (excluded, calculés si absents) ne
+    désignent jamais un fournisseur : ils sont présents sur toutes ses factures.
+    """
+    if excluded is None:
+        excluded = own_keys(db, user_id)
+    profiles: Dict[str, Dict] = {}
+    for profile in db.query(SupplierProfile).filter(SupplierProfile.user_id == user_id).all():
+        data = {
+            "id": profile.id,
+            "supplier": profile.supplier,
+            "category": profile.category,
+            "anchors": profile.anchors,
+        }
+        for key in supplier_keys(profile.supplier) or [profile.supplier_key]:
+            if key not in excluded:
+                profiles[key] = data
+    return profiles
+
+
+def apply_profile(text: str, local: Dict, profiles: Dict[str, Dict]) -> Dict:
+    """
+    Complète une extraction locale avec le profil du fournisseur reconnu
+
+    Le fournisseur est reconnu par un SIRET ou un numéro de TVA présent
+    dans le texte ; les champs lus via les ancres remplacent ceux des règles
+    génériques et la confiance est recalculée.
+    """
+    if not profiles:
+        return local
+
+    # Fournisseur identifié par les règles, sinon tout identifiant connu présent
+    # dans le texte (hors identifiants du client : l'utilisateur lui-même)
+    profile = next((profiles[key] for key in supplier_keys(local["analysis"].get("supplier")) if key in profiles), None)
+    matched_by_rules = profile is not None
+    if not profile:
+        compact = re.sub(r"\s", "", text).upper()
+        client_keys = set(supplier_keys(local["analysis"].get("client")))
+        profile = next(
+            (
+                data for key, data in profiles.items()
+                if key not in client_keys and key.split(":", 1)[1].upper() in compact
+            ),
+            None
+        )
+    if not profile:
+        return local
+
+    analysis = local["analysis"]
+    confidence = dict(local["field_confidence"])
+    values = apply_anchors(text, profile["anchors"])
+    for path, value in values.items():
+        _set_field(analysis, path, value)
+
+    analysis["supplier"] = {**analysis.get("supplier", {}), **profile["supplier"]}
+    if profile.get("category"):
+        analysis["category"] = profile["category"]
+    confidence["supplier_name"] = 1.0
+    # Identifiant connu trouvé ailleurs qu'à la place du fournisseur : le profil
+    # aide à lire les champs, mais la confiance d'identification reste celle des règles
+    if matched_by_rules:
+        confidence["supplier_id"] = 1.0
+    resolved = ["SIRET et de TVA intracommunautaire du fournisseur"]
+    if "invoice_number" in values:
+        confidence["invoice_number"] = 1.0
+        resolved.append("numéro de facture")
+    if "invoice_date" in values:
+        confidence["invoice_date"] = 1.0
+
+    amounts = analysis.get("amounts", {})
+    ht, tva, ttc = amounts.get("ht"), amounts.get("tva"), amounts.get("ttc")
+    if ht is not None and tva is not None and ttc is not None and abs(ht + tva - ttc) <= 0.02:
+        confidence["amounts"] = 1.0
+        if ht:
+            amounts["tva_rate"] = round(tva / ht * 100, 1)
+        resolved += ["HT + TVA", "taux de TVA"]
+    # Anomalies des règles génériques levées par la lecture du profil
+    analysis["anomalies"] = [
+        anomaly for anomaly in analysis.get("anomalies", [])
+        if not any(fragment in anomaly for fragment in resolved)
+    ]
+
+    global_confidence = round(sum(FIELD_WEIGHTS[field] * confidence[field] for field in FIELD_WEIGHTS), 2)
+    analysis["confidence_global"] = global_confidence
+    return {
+        "analysis": analysis,
+        "confidence": global_confidence,
+        "field_confidence": confidence,
+        "profile_id": profile["id"],
+    }
+
+
+class SupplierProfileLearner:
+    """Apprentissage des profils à partir des factures validées d'un utilisateur"""
+
+    def __init__(self, user_id: int, db: Session, scanner=None, excluded: Optional[Set[str]] = None):
+        self.user_id = user_id
+        self.db = db
+        self.excluded = excluded
+        if scanner is None:
+            from app.services.invoice_scanner import InvoiceScanner
+            scanner = InvoiceScanner(user_id=user_id, db=db)
+        self.scanner = scanner
+
+    def run(self) -> Dict:
+        """
+        Crée ou met à jour les profils des fournisseurs des factures validées
+
+        Seules les factures reçues (entrantes) sont apprises, jamais sous un
+        identifiant de l'utilisateur, et seulement celles modifiées depuis le
+        dernier apprentissage (users.profiles_learned_at). La facture validée
+        la plus récente de chaque fournisseur est relue, et seulement si elle
+        n'a pas déjà servi.
+
+        Returns:
+            dict: Statistiques d'apprentissage
+        """
+        stats = {"profiles_created": 0, "profiles_updated": 0, "skipped": 0}
+
+        started_at = self.db.query(func.now()).scalar()
+        learned_at = self.db.query(User.profiles_learned_at).filter(User.id == self.user_id).scalar()
+
+        changed_at = func.coalesce(Invoice.updated_at, Invoice.created_at)
+        query = self.db.query(Invoice.id, Invoice.supplier).filter(
+            Invoice.user_id == self.user_id,
+            Invoice.is_validated == True,
+            Invoice.invoice_type == "entrante"
+        )
+        if learned_at is not None:
+            query = query.filter(changed_at > learned_at - LEARN_WATERMARK_OVERLAP)
+        candidates = query.order_by(changed_at.desc(), Invoice.id.desc()).all()
+
+        existing = {
+            profile.supplier_key: profile
+            for profile in self.db.query(SupplierProfile).filter(SupplierProfile.user_id == self.user_id).all()
+        } if candidates else {}
+
+        excluded = self.excluded if self.excluded is not None else own_keys(self.db, self.user_id)
+        seen = set()
+        for invoice_id, supplier in candidates:
+            keys = [key for key in supplier_keys(supplier) if key not in excluded]
+            if not keys or keys[0] in seen:
+                continue
+            seen.add(keys[0])
+
+            profile = existing.get(keys[0])
+            if profile and profile.source_invoice_id == invoice_id:
+                continue
+
+            invoice = self.db.get(Invoice, invoice_id)
+            anchors = self._learn(invoice)
+            if not anchors:
+                stats["skipped"] += 1
+                continue
+
+            if profile:
+                profile.anchors = anchors
+                profile.supplier = invoice.supplier
+                profile.category = invoice.category
+                profile.source_invoice_id = invoice.id
+                profile.samples_count += 1
+                stats["profiles_updated"] += 1
+            else:
+                self.db.add(SupplierProfile(
+                    user_id=self.user_id,
+                    supplier_key=keys[0],
+                    supplier=invoice.supplier,
+                    category=invoice.category,
+                    anchors=anchors,
+                    source_invoice_id=invoice.id
+                ))
+                stats["profiles_created"] += 1
+
+        self.db.query(User).filter(User.id == self.user_id).update(
+            {User.profiles_learned_at: started_at}, synchronize_session=False
+        )
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Apprentissage concurrent (autre worker) : ses profils sont conservés,
+            # le repère n'avance pas (les factures seront relues la prochaine fois)
+            self.db.rollback()
+        return stats
+
+    def _learn(self, invoice: Invoice) -> Optional[Dict]:
+        """Ancres d'une facture validée, conservées seulement si elles la relisent correctement"""
+        try:
+            pdf_data = get_invoice_pdf_path(invoice.file_path).read_bytes()
+        except OSError as e:
+            logger.warning(f"Profil fournisseur: PDF illisible pour la facture {invoice.id}: {e}")
+            return None
+
+        text = self.scanner.extract_text_from_pdf(pdf_data, invoice.content_hash)
+        if not text:
+            return None
+
+        validated = {
+            "invoice_number": invoice.invoice_number,
+            "invoice_date": invoice.invoice_date,
+            "due_date": invoice.due_date,
+            "amounts": invoice.amounts if isinstance(invoice.amounts, dict) else {},
+        }
+        anchors = learn_anchors(text, validated)
+
+        # Vérification : relire la facture d'origine avec ses propres ancres
+        values = apply_anchors(text, anchors)
+        checked = {}
+        for path, anchor in anchors.items():
+            expected = _value_variants(_get_field(validated, path), PROFILE_FIELDS[path])
+            got = _value_variants(values.get(path), PROFILE_FIELDS[path])
+            if expected and set(expected) & set(got):
+                checked[path] = anchor
+
+        # Sans numéro ni TTC relus, le profil n'apporte rien
+        if "invoice_number" not in checked or "amounts.ttc" not in checked:
+            return None
+        return checked
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.core.database import SessionLocal
+    from app.models.user import User
+
+    parser = argparse.ArgumentParser(description="Apprentissage des profils fournisseurs")
+    parser.add_argument("--user-id", type=int, help="Utilisateur à traiter (tous par défaut)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_ids = [args.user_id] if args.user_id else [u.id for u in db.query(User.id).all()]
+        for user_id in user_ids:
+            stats = SupplierProfileLearner(user_id=user_id, db=db).run()
+            logger.info(f"Supplier profiles user {user_id}: {stats}")
+    finally:
+        db.close()
@@ -0,0 +1,191 @@
+"""
+Worker de la file de tâches
+
+Lancement : python -m app.worker (depuis backend-api/)
+Plusieurs processus peuvent tourner en parallèle, sur une ou plusieurs
+machines : la capacité de scan augmente avec le nombre de workers.
+"""
+import os
+import signal
+import socket
+import threading
+from typing import Callable, Dict, List
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import logger
+from app.core.metrics import current_endpoint
+from app.schemas.scan import ScanSpec
+from app.services.agent_runner import run_invoice_scan
+from app.services.invoice_reanalysis import InvoiceReanalyzer
+from app.services.job_queue import claim_next_job, complete_job, enqueue_job, fail_job, heartbeat_job
+
+
+def _run_gmail_scan(user_id: int, payload: Dict) -> Dict:
+    spec = ScanSpec(**payload)
+    result = run_invoice_scan(user_id, spec)
+
+    # Budget atteint : la tranche suivante est planifiée comme une nouvelle tâche
+    if spec.auto_continue and result.get("success") and result.get("next_cursor"):
+        result["continuation"] = spec.model_copy(update={"cursor": result["next_cursor"]}).model_dump(mode="json")
+    # Scan interrompu : la nouvelle tentative reprend au message en échec
+    elif not result.get("success") and result.get("next_cursor"):
+        result["retry_payload"] = spec.model_copy(update={"cursor": result["next_cursor"]}).model_dump(mode="json")
+    return result
+
+
+def _run_reanalysis(user_id: int, payload: Dict) -> Dict:
+    db = SessionLocal()
+    try:
+        stats = InvoiceReanalyzer(
+            user_id=user_id,
+            db=db,
+            include_validated=payload.get("include_validated", False)
+        ).run(invoice_ids=payload.get("invoice_ids"))
+    finally:
+        db.close()
+    return {"success": True, "stats": stats}
+
+
+# Type de tâche -> fonction d'exécution (retourne un dict avec "success",
+# "continuation" : payload d'une tâche de suite à planifier, et
+# "retry_payload" : payload de la nouvelle tentative après un échec)
+JOB_HANDLERS: Dict[str, Callable[[int, Dict], Dict]] = {
+    "gmail_scan": _run_gmail_scan,
+    "invoice_reanalysis": _run_reanalysis,
+}
+
+
+class _Heartbeat:
+    """Prolonge le verrou d'une tâche tant que son handler s'exécute"""
+
+    def __init__(self, job, interval: float):
+        self.job = job
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-heartbeat-{job.id}", daemon=True)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                if not heartbeat_job(db, self.job):
+                    logger.warning(f"Job {self.job.id} ({self.job.kind}) lock lost")
+                    return
+            except Exception as e:
+                logger.error(f"Job {self.job.id} ({self.job.kind}) heartbeat error: {e}")
+            finally:
+                db.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class Worker:
+    """Boucle de traitement des tâches (un thread par slot)"""
+
+    def __init__(self, concurrency: int = 1, poll_seconds: float = 2.0):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+    def run_once(self) -> bool:
+        """Exécute une tâche si disponible. Retourne False si la file est vide."""
+        db = SessionLocal()
+        try:
+            job = claim_next_job(db, self._worker_id())
+            if job is None:
+                return False
+
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                fail_job(db, job, f"Type de tâche inconnu: {job.kind}", retry=False)
+                return True
+
+            logger.info(f"Job {job.id} ({job.kind}) started for user {job.user_id}, attempt {job.attempts}")
+
+            token = current_endpoint.set(f"job:{job.kind}")
+            try:
+                with _Heartbeat(job, settings.JOB_HEARTBEAT_SECONDS):
+                    result = handler(job.user_id, job.payload or {})
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) raised: {e}")
+                if not fail_job(db, job, str(e)):
+                    logger.warning(f"Job {job.id} ({job.kind}) lock lost, failure not recorded")
+                return True
+            finally:
+                current_endpoint.reset(token)
+
+            if result.get("success", True):
+                if not complete_job(db, job, result):
+                    # Verrou expiré et tâche reprise ailleurs : c'est l'autre worker qui conclut
+                    logger.warning(f"Job {job.id} ({job.kind}) lock lost, result discarded")
+                    return True
+                logger.info(f"Job {job.id} ({job.kind}) succeeded")
+                if result.get("continuation"):
+                    follow_up = enqueue_job(db, job.user_id, job.kind, result["continuation"])
+                    logger.info(f"Job {job.id} ({job.kind}) continued as job {follow_up.id}")
+            elif fail_job(db, job, result.get("error") or "Échec", result, payload=result.get("retry_payload")):
+                logger.warning(f"Job {job.id} ({job.kind}) failed: {job.error}")
+            else:
+                logger.warning(f"Job {job.id} ({job.kind}) lock lost, failure not recorded")
+            return True
+        finally:
+            db.close()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                logger.error(f"Worker loop error: {e}")
+                worked = False
+
+            if not worked:
+                self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        """Démarre les threads de traitement"""
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def request_stop(self) -> None:
+        """Demande l'arrêt : les tâches en cours se terminent"""
+        self._stop.set()
+
+    def join(self, timeout: float = None) -> None:
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stop(self, timeout: float = None) -> None:
+        self.request_stop()
+        self.join(timeout)
+
+
+if __name__ == "__main__":
+    worker = Worker(
+        concurrency=settings.SCAN_WORKERS,
+        poll_seconds=settings.WORKER_POLL_SECONDS
+    )
+
+    def _handle_signal(signum, frame):
+        logger.info("Worker stopping, waiting for running jobs...")
+        worker.request_stop()
+
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+
+    logger.info(f"Worker started ({worker.concurrency} slot(s))")
+    worker.start()
+    worker.join()
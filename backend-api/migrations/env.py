@@ -0,0 +1,74 @@
+"""
+Environnement Alembic
+
+Utilisé par la commande `alembic` (depuis backend-api/) et par
+app.core.migrations.upgrade_database au démarrage de l'API : dans ce cas
+la connexion est fournie via config.attributes["connection"].
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+from app.core.config import settings
+from app.core.database import Base
+import app.models  # noqa: F401  (enregistre les tables dans Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("connection") is None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Ignore les index propres à un autre SGBD (info={"dialect": ...})"""
+    if type_ == "index" and not reflected:
+        dialect = object.info.get("dialect")
+        return dialect is None or dialect == context.get_context().dialect.name
+    return True
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=include_object,
+        compare_type=True,
+        # Une transaction par révision (les index CONCURRENTLY s'exécutent hors transaction)
+        transaction_per_migration=True,
+        # SQLite ne sait pas modifier une colonne : recréation de la table
+        render_as_batch=True,
+        **kwargs
+    )
+
+
+def run_migrations_offline() -> None:
+    """Génère le SQL sans connexion (alembic upgrade head --sql)"""
+    _configure(url=settings.DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(settings.DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            _configure(connection=connection)
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
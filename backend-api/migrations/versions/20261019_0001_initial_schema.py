@@ -0,0 +1,100 @@
+"""Schéma initial (tables créées jusqu'ici par Base.metadata.create_all)
+
+Schéma d'origine (users, invoices, transactions), avant la déduplication,
+la file de tâches et les profils fournisseurs (révision 0001a). Les bases
+existantes créées par create_all sont marquées à cette révision (alembic
+stamp 0001) par app.core.migrations.upgrade_database.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+
+    op.create_table('invoices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('invoice_number', sa.String(), nullable=True),
+    sa.Column('invoice_date', sa.Date(), nullable=True),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('supplier', sa.JSON(), nullable=False),
+    sa.Column('client', sa.JSON(), nullable=False),
+    sa.Column('amounts', sa.JSON(), nullable=False),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('anomalies', sa.JSON(), nullable=True),
+    sa.Column('confidence_global', sa.Float(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('file_name', sa.String(), nullable=False),
+    sa.Column('email_id', sa.String(), nullable=True),
+    sa.Column('email_subject', sa.String(), nullable=True),
+    sa.Column('invoice_type', sa.String(), nullable=True),
+    sa.Column('is_validated', sa.Boolean(), nullable=True),
+    sa.Column('is_paid', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_invoices_id', 'invoices', ['id'], unique=False)
+    op.create_index('ix_invoices_invoice_number', 'invoices', ['invoice_number'], unique=False)
+
+    op.create_table('transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('vendor', sa.String(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('is_reconciled', sa.Boolean(), nullable=True),
+    sa.Column('invoice_id', sa.Integer(), nullable=True),
+    sa.Column('reconciliation_confidence', sa.Float(), nullable=True),
+    sa.Column('reconciliation_details', sa.JSON(), nullable=True),
+    sa.Column('source_file', sa.String(), nullable=True),
+    sa.Column('import_batch_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_transactions_date', 'transactions', ['date'], unique=False)
+    op.create_index('ix_transactions_id', 'transactions', ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_id', table_name='transactions')
+    op.drop_index('ix_transactions_date', table_name='transactions')
+
+    op.drop_table('transactions')
+    op.drop_index('ix_invoices_invoice_number', table_name='invoices')
+    op.drop_index('ix_invoices_id', table_name='invoices')
+
+    op.drop_table('invoices')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+
+    op.drop_table('users')
@@ -0,0 +1,104 @@
+"""Déduplication des factures, file de tâches et profils fournisseurs
+
+Objets ajoutés au modèle après le schéma d'origine (révision 0001) :
+invoices.content_hash et sa contrainte d'unicité par utilisateur, tables
+jobs et supplier_profiles. Une base créée par create_all entre-temps peut
+déjà en contenir une partie : seuls les objets absents sont créés.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+ACTIVE_JOB = sa.text("status IN ('queued', 'running')")
+
+
+def _existing() -> tuple:
+    """(tables, colonnes de invoices, contraintes uniques de invoices) ; tout vide en mode --sql"""
+    if op.get_context().as_sql:
+        return set(), set(), set()
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    columns = {column['name'] for column in inspector.get_columns('invoices')}
+    uniques = {constraint['name'] for constraint in inspector.get_unique_constraints('invoices')}
+    return tables, columns, uniques
+
+
+def upgrade() -> None:
+    tables, invoice_columns, invoice_uniques = _existing()
+
+    with op.batch_alter_table('invoices') as batch_op:
+        if 'content_hash' not in invoice_columns:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        if 'uq_invoices_user_content_hash' not in invoice_uniques:
+            batch_op.create_unique_constraint('uq_invoices_user_content_hash', ['user_id', 'content_hash'])
+
+    if 'jobs' not in tables:
+        op.create_table('jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_jobs_id', 'jobs', ['id'], unique=False)
+        op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'], unique=False)
+        op.create_index('ix_jobs_user_id', 'jobs', ['user_id'], unique=False)
+        op.create_index('uq_jobs_active_per_user', 'jobs', ['user_id', 'kind'], unique=True, postgresql_where=ACTIVE_JOB, sqlite_where=ACTIVE_JOB)
+
+    if 'supplier_profiles' not in tables:
+        op.create_table('supplier_profiles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('supplier_key', sa.String(), nullable=False),
+        sa.Column('supplier', sa.JSON(), nullable=False),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('anchors', sa.JSON(), nullable=False),
+        sa.Column('source_invoice_id', sa.Integer(), nullable=True),
+        sa.Column('samples_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['source_invoice_id'], ['invoices.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'supplier_key', name='uq_supplier_profiles_user_key')
+        )
+        op.create_index('ix_supplier_profiles_id', 'supplier_profiles', ['id'], unique=False)
+        op.create_index('ix_supplier_profiles_user_id', 'supplier_profiles', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_supplier_profiles_user_id', table_name='supplier_profiles')
+    op.drop_index('ix_supplier_profiles_id', table_name='supplier_profiles')
+    op.drop_table('supplier_profiles')
+
+    op.drop_index('uq_jobs_active_per_user', table_name='jobs', postgresql_where=ACTIVE_JOB, sqlite_where=ACTIVE_JOB)
+    op.drop_index('ix_jobs_user_id', table_name='jobs')
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_index('ix_jobs_id', table_name='jobs')
+    op.drop_table('jobs')
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_constraint('uq_invoices_user_content_hash', type_='unique')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,55 @@
+"""Index composites et partiels sur les filtres par utilisateur
+
+Sous PostgreSQL les index sont créés en CONCURRENTLY (hors transaction)
+pour ne pas bloquer les écritures sur des tables déjà volumineuses.
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+
+# (nom, table, colonnes, options)
+INDEXES = [
+    ('ix_transactions_user_reconciled', 'transactions', ['user_id', 'is_reconciled'], {}),
+    ('ix_transactions_user_invoice', 'transactions', ['user_id', 'invoice_id'], {}),
+    ('ix_transactions_user_unreconciled', 'transactions', ['user_id', 'date'], {
+        'postgresql_where': sa.text('is_reconciled = false'),
+        'sqlite_where': sa.text('is_reconciled = 0'),
+    }),
+    ('ix_invoices_user_email', 'invoices', ['user_id', 'email_id'], {'postgresql_include': ['content_hash']}),
+    ('ix_invoices_user_created', 'invoices', ['user_id', 'created_at'], {}),
+    ('ix_invoices_user_type', 'invoices', ['user_id', 'invoice_type'], {}),
+]
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade() -> None:
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, columns, options in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+    else:
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, _, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,158 @@
+"""Colonnes typées fournisseur / montants, JSONB et index GIN
+
+supplier_name, amount_ttc, amount_tva et currency sont extraits des
+documents JSON supplier / amounts (remplis par app.models.invoice à
+chaque enregistrement, calculés ici pour les factures existantes avec une
+copie figée de la conversion : la révision ne dépend pas du code de
+l'application, qui peut évoluer).
+Sous PostgreSQL, les colonnes JSON des factures passent en JSONB.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+JSON_COLUMNS = ['supplier', 'client', 'amounts', 'anomalies']
+BATCH_SIZE = 1000
+
+invoices = sa.table(
+    'invoices',
+    sa.column('id', sa.Integer),
+    sa.column('supplier', sa.JSON),
+    sa.column('amounts', sa.JSON),
+    sa.column('supplier_name', sa.String),
+    sa.column('amount_ttc', sa.Float),
+    sa.column('amount_tva', sa.Float),
+    sa.column('currency', sa.String),
+)
+
+
+def _amount(value):
+    """Montant JSON en float (copie figée de app.schemas.llm_output.coerce_amount)"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+
+    text = re.sub(r"[^\d,.\-]", "", value.replace("−", "-"))
+    if not text or text in {"-", ".", ","}:
+        return None
+
+    # Le dernier séparateur est le séparateur décimal, les autres sont des milliers
+    last_sep = max(text.rfind(","), text.rfind("."))
+    if last_sep != -1:
+        integer = re.sub(r"[,.]", "", text[:last_sep])
+        decimals = text[last_sep + 1:]
+        # "1.234" / "1,234" sans autre séparateur : groupe de milliers
+        if len(decimals) == 3 and text.count(",") + text.count(".") == 1 and re.fullmatch(r"-?[1-9]\d{0,2}", integer):
+            text = integer + decimals
+        else:
+            text = f"{integer}.{decimals}"
+
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def typed_columns(supplier, amounts) -> dict:
+    """Colonnes typées d'une facture (copie figée de app.models.invoice.typed_columns)"""
+    supplier = supplier if isinstance(supplier, dict) else {}
+    amounts = amounts if isinstance(amounts, dict) else {}
+
+    name = str(supplier.get("name") or "").strip()
+    currency = str(amounts.get("currency") or "EUR").strip().upper().replace("€", "EUR")
+
+    return {
+        "supplier_name": name or None,
+        "amount_ttc": _amount(amounts.get("ttc")),
+        "amount_tva": _amount(amounts.get("tva")),
+        "currency": currency[:3] or "EUR",
+    }
+
+
+def _backfill() -> None:
+    """Calcule les colonnes typées des factures existantes, par lots"""
+    bind = op.get_bind()
+    last_id = 0
+
+    while True:
+        rows = bind.execute(
+            sa.select(invoices.c.id, invoices.c.supplier, invoices.c.amounts)
+            .where(invoices.c.id > last_id)
+            .order_by(invoices.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        for row in rows:
+            bind.execute(
+                invoices.update()
+                .where(invoices.c.id == row.id)
+                .values(**typed_columns(row.supplier, row.amounts))
+            )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('invoices', sa.Column('supplier_name', sa.String(), nullable=True))
+    op.add_column('invoices', sa.Column('amount_ttc', sa.Float(), nullable=True))
+    op.add_column('invoices', sa.Column('amount_tva', sa.Float(), nullable=True))
+    op.add_column('invoices', sa.Column('currency', sa.String(length=3), nullable=True))
+
+    # En mode --sql (pas de connexion), les factures existantes ne sont pas lues
+    if not op.get_context().as_sql:
+        _backfill()
+
+    op.create_index('ix_invoices_user_supplier', 'invoices', ['user_id', 'supplier_name'])
+    op.create_index('ix_invoices_user_ttc', 'invoices', ['user_id', 'amount_ttc'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in JSON_COLUMNS:
+            op.alter_column(
+                'invoices', column,
+                type_=postgresql.JSONB(),
+                existing_type=sa.JSON(),
+                postgresql_using=f'{column}::jsonb'
+            )
+        op.create_index(
+            'ix_invoices_supplier_gin', 'invoices', ['supplier'],
+            postgresql_using='gin',
+            postgresql_ops={'supplier': 'jsonb_path_ops'}
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_invoices_supplier_gin', table_name='invoices')
+        for column in JSON_COLUMNS:
+            op.alter_column(
+                'invoices', column,
+                type_=sa.JSON(),
+                existing_type=postgresql.JSONB(),
+                postgresql_using=f'{column}::json'
+            )
+
+    op.drop_index('ix_invoices_user_ttc', table_name='invoices')
+    op.drop_index('ix_invoices_user_supplier', table_name='invoices')
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_column('currency')
+        batch_op.drop_column('amount_tva')
+        batch_op.drop_column('amount_ttc')
+        batch_op.drop_column('supplier_name')
@@ -0,0 +1,67 @@
+"""Index de pagination par curseur (date, id) et (created_at, id)
+
+Les listes de transactions et de factures sont paginées sur (date, id) et
+(created_at, id) décroissants : les index (user_id, tri, id) servent
+directement le tri et la borne du curseur, sans tri en mémoire.
+Remplacent ix_invoices_user_created et ix_transactions_user_unreconciled
+(l'index partiel des transactions à rapprocher gagne la colonne id).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+UNRECONCILED = {
+    'postgresql_where': sa.text('is_reconciled = false'),
+    'sqlite_where': sa.text('is_reconciled = 0'),
+}
+
+# (nom, table, colonnes, options)
+NEW_INDEXES = [
+    ('ix_invoices_user_created_id', 'invoices', ['user_id', 'created_at', 'id'], {}),
+    ('ix_transactions_user_date_id', 'transactions', ['user_id', 'date', 'id'], {}),
+    ('ix_transactions_user_unreconciled_id', 'transactions', ['user_id', 'date', 'id'], UNRECONCILED),
+]
+
+OLD_INDEXES = [
+    ('ix_invoices_user_created', 'invoices', ['user_id', 'created_at'], {}),
+    ('ix_transactions_user_unreconciled', 'transactions', ['user_id', 'date'], UNRECONCILED),
+]
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _swap(create, drop) -> None:
+    """Crée les nouveaux index avant de supprimer les anciens (les listes restent servies)"""
+    concurrently = {'postgresql_concurrently': True} if _is_postgresql() else {}
+    for name, table, columns, options in create:
+        op.create_index(name, table, columns, if_not_exists=True, **concurrently, **options)
+    for name, table, _, _ in drop:
+        op.drop_index(name, table_name=table, if_exists=True, **concurrently)
+
+
+def upgrade() -> None:
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            _swap(NEW_INDEXES, OLD_INDEXES)
+    else:
+        _swap(NEW_INDEXES, OLD_INDEXES)
+
+
+def downgrade() -> None:
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            _swap(OLD_INDEXES, NEW_INDEXES)
+    else:
+        _swap(OLD_INDEXES, NEW_INDEXES)
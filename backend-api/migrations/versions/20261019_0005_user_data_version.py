@@ -0,0 +1,28 @@
+"""Version des données par utilisateur (ETag / Last-Modified)
+
+users.data_version est incrémenté à chaque écriture de factures ou de
+transactions de l'utilisateur (voir app.models.data_version).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('data_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('data_updated_at')
+        batch_op.drop_column('data_version')
@@ -0,0 +1,27 @@
+"""Repère d'apprentissage des profils fournisseurs
+
+users.profiles_learned_at : l'apprentissage ne relit que les factures
+validées modifiées depuis (au lieu de toutes les factures de l'utilisateur
+à chaque scan et chaque ré-analyse).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('profiles_learned_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('profiles_learned_at')
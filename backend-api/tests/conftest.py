@@ -0,0 +1,60 @@
+"""
+Fixtures communes : base SQLite temporaire migrée (alembic upgrade head)
+
+Lancement : python -m pytest (depuis backend-api/)
+"""
+import os
+import tempfile
+import uuid
+
+# Configuration de test, avant tout import de app (settings lus à l'import)
+_TEST_DIR = tempfile.mkdtemp(prefix="billz-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_TEST_DIR}/test.db",
+    "AUTO_MIGRATE": "false",
+    "EXTRACTION_CACHE_DIR": f"{_TEST_DIR}/cache",
+    "AUTH_CACHE_TTL_SECONDS": "0",
+    "BCRYPT_ROUNDS": "4",
+})
+for name, value in {
+    "APP_NAME": "billz-tests",
+    "DEBUG": "false",
+    "SECRET_KEY": "test",
+    "JWT_SECRET_KEY": "test",
+    "JWT_ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_SERVICE_KEY": "test",
+    "GROQ_API_KEY": "test",
+    "MODEL_NAME_analyse": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+
+from app.core.database import SessionLocal, engine
+from app.core.migrations import upgrade_database
+from app.models.user import User
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    upgrade_database(engine)
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db) -> User:
+    user = User(email=f"{uuid.uuid4().hex}@billz.fr", hashed_password="x", full_name="Test")
+    db.add(user)
+    db.commit()
+    return user
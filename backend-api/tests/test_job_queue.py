@@ -0,0 +1,182 @@
+"""
+File de tâches : réservation, heartbeat, verrou perdu, continuation
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app import worker
+from app.core.config import settings
+from app.models.job import Job
+from app.services.job_queue import (
+    JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED,
+    claim_next_job, complete_job, enqueue_job, fail_job, heartbeat_job
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(db):
+    """Chaque test part d'une file vide (claim_next_job prend toute tâche exécutable)"""
+    db.query(Job).delete()
+    db.commit()
+    yield
+    db.rollback()
+    db.query(Job).delete()
+    db.commit()
+
+
+def _reload(db, job_id: int) -> Job:
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def _expire_lock(db, job_id: int) -> None:
+    """Simule un worker arrêté : verrou plus vieux que JOB_LOCK_TIMEOUT_SECONDS"""
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS + 60)
+    db.execute(update(Job).where(Job.id == job_id).values(locked_at=stale))
+    db.commit()
+
+
+def test_claim_heartbeat_complete(db, user):
+    queued = enqueue_job(db, user.id, "test_kind", {"a": 1})
+
+    job = claim_next_job(db, "worker-1")
+    assert job.id == queued.id
+    assert job.status == JOB_RUNNING
+    assert job.locked_by == "worker-1"
+    assert job.attempts == 1
+    # Transaction de réservation close, Job détaché : rien d'ouvert pendant le handler
+    assert not db.in_transaction()
+    assert job not in db
+
+    # Une seconde réservation ne reprend pas une tâche verrouillée
+    assert claim_next_job(db, "worker-2") is None
+
+    old = datetime.now(timezone.utc) - timedelta(minutes=5)
+    db.execute(update(Job).where(Job.id == job.id).values(locked_at=old))
+    db.commit()
+    assert heartbeat_job(db, job)
+    assert _reload(db, job.id).locked_at.replace(tzinfo=None) > old.replace(tzinfo=None)
+
+    assert complete_job(db, job, {"success": True, "n": 3})
+    stored = _reload(db, job.id)
+    assert stored.status == JOB_SUCCEEDED
+    assert stored.result == {"success": True, "n": 3}
+    assert stored.locked_by is None
+    assert stored.finished_at is not None
+
+
+def test_lost_lock_is_not_overwritten(db, user):
+    enqueue_job(db, user.id, "test_kind")
+    job = claim_next_job(db, "worker-1")
+
+    # Plus de heartbeat : la tâche est reprise par un autre worker
+    _expire_lock(db, job.id)
+    reclaimed = claim_next_job(db, "worker-2")
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+    # Le premier worker ne peut plus ni prolonger, ni conclure, ni faire échouer la tâche
+    assert not heartbeat_job(db, job)
+    assert not complete_job(db, job, {"success": True})
+    assert not fail_job(db, job, "boom")
+    stored = _reload(db, job.id)
+    assert stored.status == JOB_RUNNING
+    assert stored.locked_by == "worker-2"
+    assert stored.result is None
+
+    assert complete_job(db, reclaimed, {"success": True})
+    assert _reload(db, job.id).status == JOB_SUCCEEDED
+
+
+def test_stale_job_without_attempts_left_fails(db, user):
+    enqueue_job(db, user.id, "test_kind")
+    job = claim_next_job(db, "worker-1")
+    db.execute(update(Job).where(Job.id == job.id).values(attempts=Job.max_attempts))
+    db.commit()
+    _expire_lock(db, job.id)
+
+    assert claim_next_job(db, "worker-2") is None
+    stored = _reload(db, job.id)
+    assert stored.status == JOB_FAILED
+    assert stored.attempts == stored.max_attempts
+    assert stored.locked_by is None
+
+
+def test_fail_job_retries_with_replacement_payload(db, user):
+    enqueue_job(db, user.id, "test_kind", {"cursor": None})
+    job = claim_next_job(db, "worker-1")
+
+    assert fail_job(db, job, "interrompu", {"success": False}, payload={"cursor": "abc"})
+    stored = _reload(db, job.id)
+    assert stored.status == JOB_QUEUED
+    assert stored.payload == {"cursor": "abc"}
+    assert stored.locked_by is None
+    assert stored.run_after.replace(tzinfo=None) > datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_worker_enqueues_continuation_after_completion(db, user, monkeypatch):
+    calls = []
+
+    def handler(user_id, payload):
+        calls.append(payload)
+        if payload.get("step", 0) < 1:
+            return {"success": True, "continuation": {"step": payload.get("step", 0) + 1}}
+        return {"success": True}
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, "test_chain", handler)
+    monkeypatch.setattr(settings, "JOB_HEARTBEAT_SECONDS", 0.01)
+    first = enqueue_job(db, user.id, "test_chain", {"step": 0})
+
+    slot = worker.Worker()
+    assert slot.run_once()
+
+    # La suite est créée après la fin de la tâche : l'index unique des tâches
+    # actives (uq_jobs_active_per_user) ne la confond pas avec la première
+    db.expire_all()
+    jobs = db.query(Job).filter(Job.user_id == user.id).order_by(Job.id).all()
+    assert [(job.status, job.payload) for job in jobs] == [
+        (JOB_SUCCEEDED, {"step": 0}),
+        (JOB_QUEUED, {"step": 1}),
+    ]
+    assert jobs[0].id == first.id
+
+    assert slot.run_once()
+    assert not slot.run_once()
+    assert calls == [{"step": 0}, {"step": 1}]
+    db.expire_all()
+    assert [job.status for job in db.query(Job).filter(Job.user_id == user.id)] == [JOB_SUCCEEDED, JOB_SUCCEEDED]
+
+
+def test_heartbeat_keeps_long_job_locked(db, user, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def handler(user_id, payload):
+        started.set()
+        release.wait(5)
+        return {"success": True}
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, "test_long", handler)
+    monkeypatch.setattr(settings, "JOB_HEARTBEAT_SECONDS", 0.05)
+    job = enqueue_job(db, user.id, "test_long")
+
+    runner = threading.Thread(target=worker.Worker().run_once)
+    runner.start()
+    assert started.wait(5)
+
+    # Verrou vieilli artificiellement : le heartbeat le rafraîchit avant toute reprise
+    _expire_lock(db, job.id)
+    deadline = datetime.now(timezone.utc) + timedelta(seconds=5)
+    while _reload(db, job.id).locked_at.replace(tzinfo=None) < (
+        datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    ).replace(tzinfo=None):
+        assert datetime.now(timezone.utc) < deadline, "heartbeat absent"
+        time.sleep(0.01)
+    assert claim_next_job(db, "worker-2") is None
+
+    release.set()
+    runner.join(5)
+    assert _reload(db, job.id).status == JOB_SUCCEEDED
@@ -0,0 +1,117 @@
+"""
+Pagination par curseur : pas de trou ni de doublon entre les pages, même
+quand plusieurs lignes partagent la même clé de tri ; curseur altéré refusé
+"""
+import uuid
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.main import app
+from app.models.invoice import Invoice
+from app.models.transaction import Transaction
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def account(client):
+    """(id utilisateur, en-têtes d'authentification) d'un compte créé par l'API"""
+    response = client.post("/api/auth/signup", json={
+        "email": f"{uuid.uuid4().hex}@billz.fr",
+        "password": "secret123",
+        "full_name": "Test"
+    })
+    assert response.status_code == 201, response.text
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return client.get("/api/auth/me", headers=headers).json()["id"], headers
+
+
+def _walk(client, headers, url):
+    """Suit X-Next-Cursor jusqu'à la dernière page ; retourne les pages"""
+    pages, cursor = [], None
+    while True:
+        params = {"cursor": cursor} if cursor else {}
+        response = client.get(url, headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+
+def _invoice(user_id: int, **values) -> Invoice:
+    return Invoice(user_id=user_id, supplier={}, client={}, amounts={}, file_path="x", file_name="x", **values)
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor(datetime(2024, 1, 1, 12, 0, 0, 250000), 42)
+    assert decode_cursor(cursor, datetime.fromisoformat, int) == (datetime(2024, 1, 1, 12, 0, 0, 250000), 42)
+    assert decode_cursor(encode_cursor(date(2024, 1, 1), 7), date.fromisoformat, int) == (date(2024, 1, 1), 7)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor("2024-01-01", 1)[:-4],
+    encode_cursor("pas une date", 1),
+    encode_cursor(date(2024, 1, 1)),
+    encode_cursor(date(2024, 1, 1), 1, 2),
+])
+def test_tampered_cursor_is_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, date.fromisoformat, int)
+
+
+def test_invoices_with_equal_created_at_page_without_gaps(client, account, db):
+    user_id, headers = account
+    # Mêmes created_at : valeur par défaut du serveur (même transaction)
+    # puis valeurs explicites, à la seconde et à la microseconde
+    db.add_all(_invoice(user_id) for _ in range(5))
+    db.commit()
+    db.add_all(_invoice(user_id, created_at=datetime(2024, 1, 1, 12, 0, 0)) for _ in range(4))
+    db.add_all(_invoice(user_id, created_at=datetime(2024, 1, 1, 12, 0, 0, 500000)) for _ in range(4))
+    db.commit()
+
+    expected = [
+        invoice_id for invoice_id, in db.query(Invoice.id).filter(Invoice.user_id == user_id)
+        .order_by(Invoice.created_at.desc(), Invoice.id.desc())
+    ]
+    assert len(expected) == 13
+
+    for limit in (1, 2, 3, 5):
+        pages = _walk(client, headers, f"/api/invoices/?limit={limit}&fields=id")
+        ids = [invoice["id"] for page in pages for invoice in page]
+        assert ids == expected
+        assert all(len(page) <= limit for page in pages)
+
+
+def test_transactions_with_equal_dates_page_without_gaps(client, account, db):
+    user_id, headers = account
+    db.add_all(
+        Transaction(user_id=user_id, date=date(2024, 1, 1 + i // 4), amount=-i)
+        for i in range(11)
+    )
+    db.commit()
+
+    expected = [
+        transaction_id for transaction_id, in db.query(Transaction.id).filter(Transaction.user_id == user_id)
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+    ]
+    assert len(expected) == 11
+
+    for limit in (1, 3, 4):
+        pages = _walk(client, headers, f"/api/transactions/?limit={limit}&fields=id")
+        assert [transaction["id"] for page in pages for transaction in page] == expected
+
+
+@pytest.mark.parametrize("url", ["/api/invoices/", "/api/transactions/"])
+@pytest.mark.parametrize("cursor", ["zzz", encode_cursor("hier", 1), encode_cursor(1)])
+def test_tampered_cursor_is_rejected(client, account, url, cursor):
+    _, headers = account
+    response = client.get(url, headers=headers, params={"cursor": cursor})
+    assert response.status_code == 400
@@ -31,8 +31,8 @@ function Dashboard({ setAuth }) {
       
       const [statsRes, invoicesRes, transactionsRes] = await Promise.all([
         api.get('/api/optimisation/stats'),
-        api.get('/api/invoices/'),
-        api.get('/api/transactions/')
+        api.get('/api/invoices/', { params: { limit: 5 } }),
+        api.get('/api/transactions/', { params: { limit: 5 } })
       ]);
       
       setStats(statsRes.data);
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import DashboardLayout from '../components/DashboardLayout';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { FileText, Download, Trash2, AlertCircle, CheckCircle, RefreshCw, Mail, Link as LinkIcon } from 'lucide-react';
 
 function Factures({ setAuth }) {
@@ -24,8 +24,8 @@ function Factures({ setAuth }) {
   const loadInvoices = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/api/invoices/');
-      setInvoices(response.data);
+      const invoices = await getAllPages('/api/invoices/', { limit: 500 });
+      setInvoices(invoices);
       setError(null);
     } catch (err) {
       setError('Erreur lors du chargement des factures');
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import DashboardLayout from '../components/DashboardLayout';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { 
   Receipt, 
   Calculator, 
@@ -26,13 +26,13 @@ function TVA({ setAuth }) {
       setLoading(true);
       setError(null);
       
-      const [tvaRes, invoicesRes] = await Promise.all([
+      const [tvaRes, invoiceList] = await Promise.all([
         api.get('/api/optimisation/tva'),
-        api.get('/api/invoices/')
+        getAllPages('/api/invoices/', { limit: 500 })
       ]);
       
       setTvaData(tvaRes.data);
-      setInvoices(invoicesRes.data);
+      setInvoices(invoiceList);
     } catch (err) {
       setError('Erreur lors du chargement des données TVA');
     } finally {
@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import DashboardLayout from '../components/DashboardLayout';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { 
   CreditCard, 
   Upload, 
@@ -30,9 +30,9 @@ function Transactions({ setAuth }) {
   const loadTransactions = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/api/transactions/');
-      setTransactions(response.data);
-      calculateStats(response.data);
+      const transactions = await getAllPages('/api/transactions/', { limit: 500 });
+      setTransactions(transactions);
+      calculateStats(transactions);
       setError(null);
     } catch (err) {
       setError('Erreur lors du chargement des transactions');
@@ -35,5 +35,18 @@ api.interceptors.response.use(
   }
 )
 
+// Listes paginées par curseur : le curseur de la page suivante est dans
+// l'en-tête X-Next-Cursor (absent sur la dernière page)
+export async function getAllPages(url, params = {}) {
+  const items = []
+  let cursor = null
+  do {
+    const response = await api.get(url, { params: { ...params, ...(cursor && { cursor }) } })
+    items.push(...response.data)
+    cursor = response.headers['x-next-cursor']
+  } while (cursor)
+  return items
+}
+
 export default api
 